@@ -3,23 +3,38 @@ Chat System Admin Configuration
 Provides Django admin interface for managing chat functionality:
 - Chat rooms between language exchange partners
 - Messages within chat rooms
-- Read status tracking for notifications
+- Per-user unread counters and read watermarks
+- Archived message segments (cold storage)
 """
 
 from django.contrib import admin
-from .models import ChatRoom, Message
+from .models import ChatRoom, Message, MessageArchiveSegment, ChatParticipant
 
 @admin.register(ChatRoom)
 class ChatRoomAdmin(admin.ModelAdmin):
     """Admin interface for managing chat rooms between language partners"""
-    list_display = ['id', 'post', 'partner_request', 'is_active', 'created_at']
+    list_display = ['id', 'post', 'partner_request', 'is_active', 'archived_up_to_id', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['post__japanese_user__username', 'partner_request__requester__username']
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     """Admin interface for managing messages within chat rooms"""
-    list_display = ['sender', 'chat_room', 'content', 'timestamp', 'is_read']
-    list_filter = ['timestamp', 'is_read', 'sender__nationality']
+    list_display = ['sender', 'chat_room', 'content', 'timestamp']
+    list_filter = ['timestamp', 'sender__nationality']
     search_fields = ['content', 'sender__username']
-    date_hierarchy = 'timestamp'  # Provides date-based filtering
\ No newline at end of file
+    date_hierarchy = 'timestamp'  # Provides date-based filtering
+
+@admin.register(ChatParticipant)
+class ChatParticipantAdmin(admin.ModelAdmin):
+    """Admin interface for inspecting per-user unread counters"""
+    list_display = ['chat_room', 'user', 'unread_count', 'last_read_message_id']
+    search_fields = ['user__username']
+    list_select_related = ['chat_room', 'user']
+
+@admin.register(MessageArchiveSegment)
+class MessageArchiveSegmentAdmin(admin.ModelAdmin):
+    """Admin interface for inspecting archived message segments"""
+    list_display = ['chat_room', 'first_message_id', 'last_message_id', 'message_count', 'created_at']
+    exclude = ['data']  # Compressed payload, not editable
+    list_select_related = ['chat_room']
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class ChatSystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'chat_system'
\ No newline at end of file
+    name = 'chat_system'
+    
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal handlers)
@@ -0,0 +1,13 @@
+"""
+Cache namespaces for chat_system data (see vietnam_japan_connect.caching)
+Each one is dropped whenever one of its models changes (hooked up in chat_system.signals)
+"""
+
+from vietnam_japan_connect.caching import CacheNamespace
+
+# Rooms decide who may enter them: kept short so a missed invalidation cannot linger
+ROOMS = CacheNamespace('chat_system:rooms', timeout=60)
+# Per-room participant id sets and per-user unread totals: never bumped as a whole,
+# single entries are deleted when the participants or the counters change
+PARTICIPANTS = CacheNamespace('chat_system:participants', timeout=60)
+UNREAD_TOTALS = CacheNamespace('chat_system:unread_totals', timeout=300)
@@ -0,0 +1,134 @@
+"""
+Chat System WebSocket Consumers
+Pushes new messages to the participants of a chat room as soon as they are saved,
+replacing the 2-second polling of get_messages for clients with an open socket.
+The HTTP endpoints in chat_system.views remain available as a fallback.
+Presence (online / typing) travels over the same connection, see chat_system.presence.
+"""
+
+import time
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from . import presence
+from .models import ChatRoom
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    One connection per open chat room tab
+    Joins the room's channel layer group after the same access check used by the views
+    """
+    
+    async def connect(self):
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        self.user = self.scope['user']
+        
+        chat_room = await self.get_accessible_room()
+        if chat_room is None:
+            await self.close()
+            return
+        
+        self.group_name = chat_room.group_name
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        
+        self.last_heartbeat = time.monotonic()
+        if await sync_to_async(presence.mark_online)(self.room_id, self.user.id, self.channel_name):
+            await self.send_presence(online=True)
+        await self.send_json({
+            'type': 'presence_snapshot',
+            'online': sorted(await sync_to_async(presence.online_users)(self.room_id)),
+            'typing': sorted(await sync_to_async(presence.typing_users)(self.room_id)),
+        })
+    
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            if await sync_to_async(presence.set_typing)(self.room_id, self.user.id, False):
+                await self.send_typing(False)
+            if await sync_to_async(presence.mark_offline)(self.room_id, self.user.id, self.channel_name):
+                await self.send_presence(online=False)
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content):
+        """
+        Client events: heartbeat (keeps the connection online and sweeps expired presence)
+        and typing start/stop
+        """
+        event_type = content.get('type')
+        if event_type == 'heartbeat':
+            # Coalesce heartbeats: the store entry outlives HEARTBEAT_COALESCE, so closer ones are skipped
+            now = time.monotonic()
+            if now - self.last_heartbeat < presence.HEARTBEAT_COALESCE:
+                return
+            self.last_heartbeat = now
+            if await sync_to_async(presence.mark_online)(self.room_id, self.user.id, self.channel_name):
+                await self.send_presence(online=True)
+            # Connections that vanished without a close frame only expire: announce them
+            offline, stopped_typing = await sync_to_async(presence.sweep_room)(self.room_id)
+            for user_id in stopped_typing:
+                await self.send_typing(False, user_id)
+            for user_id in offline:
+                await self.send_presence(online=False, user_id=user_id)
+        elif event_type == 'typing':
+            is_typing = bool(content.get('is_typing'))
+            # Only state changes are broadcast, refreshes just extend the TTL
+            if await sync_to_async(presence.set_typing)(self.room_id, self.user.id, is_typing):
+                await self.send_typing(is_typing)
+    
+    async def send_presence(self, online, user_id=None):
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'chat.presence',
+            'user_id': self.user.id if user_id is None else user_id,
+            'online': online,
+        })
+    
+    async def send_typing(self, is_typing, user_id=None):
+        await self.channel_layer.group_send(self.group_name, {
+            'type': 'chat.typing',
+            'user_id': self.user.id if user_id is None else user_id,
+            'is_typing': is_typing,
+        })
+    
+    async def chat_message(self, event):
+        """Forward a message pushed by chat_system.signals to this client"""
+        message = dict(event['message'])
+        message['is_own'] = message['sender_id'] == self.user.id
+        await self.send_json({'type': 'message', 'message': message})
+        if not message['is_own']:
+            # The recipient has the room open, so the message is read on delivery
+            if await self.mark_read(message['id']):
+                await self.channel_layer.group_send(self.group_name, {
+                    'type': 'chat.read',
+                    'user_id': self.user.id,
+                    'message_id': message['id'],
+                })
+    
+    async def chat_read(self, event):
+        """Forward another participant's read watermark so the sender's check icons update"""
+        if event['user_id'] != self.user.id:
+            await self.send_json({'type': 'read', 'read_up_to': event['message_id']})
+    
+    async def chat_presence(self, event):
+        """Forward another participant coming online or going offline"""
+        if event['user_id'] != self.user.id:
+            await self.send_json({'type': 'presence', 'user_id': event['user_id'], 'online': event['online']})
+    
+    async def chat_typing(self, event):
+        """Forward another participant's typing state"""
+        if event['user_id'] != self.user.id:
+            await self.send_json({'type': 'typing', 'user_id': event['user_id'], 'is_typing': event['is_typing']})
+    
+    @database_sync_to_async
+    def mark_read(self, message_id):
+        return ChatRoom.objects.get(id=self.room_id).mark_read(self.user, message_id)
+    
+    @database_sync_to_async
+    def get_accessible_room(self):
+        """Return the chat room if the connected user may join it, otherwise None"""
+        if not self.user.is_authenticated:
+            return None
+        chat_room = ChatRoom.objects.filter(id=self.room_id).first()
+        if chat_room is None or not chat_room.has_participant(self.user.id):
+            return None
+        return chat_room
@@ -0,0 +1,126 @@
+"""
+Chat System Inbox
+Builds a user's chat room list (partner, last message, unread count) from a
+single annotated query over ChatParticipant, ordered by last activity in SQL
+and paginated with a keyset cursor instead of per-room lookups in Python.
+"""
+
+from django.db.models import DateTimeField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from .models import ChatParticipant, Message
+
+INBOX_PAGE_SIZE = 20
+
+
+def encode_cursor(last_activity, room_id):
+    return f"{last_activity.isoformat()}_{room_id}"
+
+
+def decode_cursor(cursor):
+    """Return (last_activity, room_id) from a cursor string, or None if it is malformed"""
+    try:
+        timestamp, room_id = cursor.rsplit('_', 1)
+        last_activity = parse_datetime(timestamp)
+        room_id = int(room_id)
+    except (AttributeError, ValueError):
+        return None
+    if last_activity is None:
+        return None
+    return last_activity, room_id
+
+
+def inbox_queryset(user):
+    """Every active-match chat room of the user, annotated with its newest message"""
+    last_message = Message.objects.filter(chat_room=OuterRef('chat_room')).order_by('-id')
+    return ChatParticipant.in_matched_rooms(user.id).select_related(
+        'chat_room',
+        'chat_room__post__phrase',
+        'chat_room__post__cafe_location',
+        'chat_room__post__japanese_user',
+        'chat_room__post__vietnamese_user',
+        'chat_room__post__japanese_partner',
+        'chat_room__post__vietnamese_partner',
+        'chat_room__partner_request__requester',
+        'chat_room__partner_request__accepted_by',
+    ).annotate(
+        last_message_id=Subquery(last_message.values('id')[:1]),
+        last_message_content=Subquery(last_message.values('content')[:1]),
+        last_message_timestamp=Subquery(last_message.values('timestamp')[:1]),
+        last_message_sender_username=Subquery(last_message.values('sender__username')[:1]),
+        last_message_sender_full_name=Subquery(last_message.values('sender__full_name')[:1]),
+    ).annotate(
+        last_activity=Coalesce('last_message_timestamp', 'chat_room__created_at', output_field=DateTimeField()),
+    ).order_by('-last_activity', '-chat_room_id')
+
+
+def room_partner(chat_room, user):
+    """The other side of the conversation, using only already-loaded relations"""
+    if chat_room.post:
+        post = chat_room.post
+        candidates = [post.creator, post.partner, post.japanese_user, post.vietnamese_user]
+    else:
+        request = chat_room.partner_request
+        candidates = [request.requester, request.accepted_by]
+    for candidate in candidates:
+        if candidate and candidate.id != user.id:
+            return candidate
+    return None
+
+
+def inbox_entry(participant, user):
+    """Dictionary consumed by chat_system/my_chats.html"""
+    chat_room = participant.chat_room
+    partner = room_partner(chat_room, user)
+    last_message = None
+    if participant.last_message_id:
+        last_message = {
+            'content': participant.last_message_content,
+            'timestamp': participant.last_message_timestamp,
+            'sender_name': participant.last_message_sender_full_name or participant.last_message_sender_username,
+        }
+    
+    entry = {
+        'chat_room': chat_room,
+        'partner': partner,
+        'last_message': last_message,
+        'unread_count': participant.unread_count,
+    }
+    if chat_room.post:
+        post = chat_room.post
+        entry.update({
+            'type': 'post',
+            'subtitle': post.phrase.vietnamese_text if post.phrase else '',
+            'meeting_info': f"{post.cafe_location.name} - {post.meeting_date.strftime('%d/%m/%Y %H:%M')}",
+        })
+    else:
+        partner_request = chat_room.partner_request
+        entry.update({
+            'type': 'partner_request',
+            'subtitle': f"Loại: {partner_request.get_request_type_display()}",
+        })
+    return entry
+
+
+def build_inbox(user, cursor=None, limit=INBOX_PAGE_SIZE):
+    """
+    One page of the user's inbox, newest activity first
+    Returns (entries, next_cursor); next_cursor is None on the last page
+    """
+    queryset = inbox_queryset(user)
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        last_activity, room_id = position
+        queryset = queryset.filter(
+            Q(last_activity__lt=last_activity) |
+            Q(last_activity=last_activity, chat_room_id__lt=room_id)
+        )
+    
+    participants = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(participants) > limit:
+        participants = participants[:limit]
+        last = participants[-1]
+        next_cursor = encode_cursor(last.last_activity, last.chat_room_id)
+    
+    return [inbox_entry(participant, user) for participant in participants], next_cursor
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Q
+from django.utils import timezone
+from chat_system.models import ChatRoom
+
+FINISHED_STATUSES = ['completed', 'cancelled']
+
+
+class Command(BaseCommand):
+    help = 'Move messages of inactive or completed chat rooms into compressed archive segments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=30,
+                            help='Only archive rooms whose newest message is older than this')
+        parser.add_argument('--room', type=int, help='Archive (or restore) a single room regardless of activity')
+        parser.add_argument('--restore', action='store_true', help='Move archived messages back into the hot table')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if options['restore']:
+            rooms = ChatRoom.objects.filter(archived_up_to_id__gt=0)
+            if options['room']:
+                rooms = rooms.filter(id=options['room'])
+            restored = 0
+            for chat_room in rooms:
+                self.stdout.write(f'Room {chat_room.id}: restoring archive')
+                if not dry_run:
+                    restored += chat_room.restore_archived_messages()
+            self.stdout.write(self.style.SUCCESS(f"Restored: messages={restored}"))
+            return
+
+        rooms = ChatRoom.objects.annotate(last_message_at=Max('messages__timestamp')).filter(last_message_at__isnull=False)
+        if options['room']:
+            rooms = rooms.filter(id=options['room'])
+        else:
+            cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+            rooms = rooms.filter(
+                Q(is_active=False)
+                | Q(post__status__in=FINISHED_STATUSES)
+                | Q(partner_request__status__in=FINISHED_STATUSES),
+                last_message_at__lt=cutoff,
+            )
+
+        archived_rooms = 0
+        archived_messages = 0
+        for chat_room in rooms:
+            self.stdout.write(f'Room {chat_room.id}: last message {chat_room.last_message_at:%Y-%m-%d}')
+            if dry_run:
+                continue
+            archived_messages += chat_room.archive_messages()
+            archived_rooms += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived: rooms={archived_rooms}, messages={archived_messages}"
+        ))
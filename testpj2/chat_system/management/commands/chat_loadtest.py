@@ -0,0 +1,205 @@
+import json
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from chat_system.models import ChatRoom
+from event_creation.models import PartnerRequest
+
+USERNAME_PREFIX = 'loadtest_'
+# Any 32 allowed characters work as a CSRF secret when cookie and header match
+CSRF_TOKEN = 'loadtestloadtestloadtestloadtest'
+
+
+class Command(BaseCommand):
+    help = 'Load-test the chat hot path (get_messages polling and send_message) and report latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10, help='Number of concurrent chat rooms (one worker each)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per room')
+        parser.add_argument('--send-ratio', type=float, default=0.2, help='Fraction of requests that send a message')
+        parser.add_argument('--think-time', type=float, default=0, help='Milliseconds to wait between requests')
+        parser.add_argument('--base-url', help='Hit a running server (runserver / daphne) instead of the in-process test client')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, keeps runs reproducible')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated users and rooms')
+        parser.add_argument('--allow-writes', action='store_true',
+                            help=f'Required: the run creates (and afterwards deletes) {USERNAME_PREFIX}* users, '
+                                 'partner requests, rooms and messages in the configured database')
+
+    def handle(self, *args, **options):
+        if not options['allow_writes']:
+            raise CommandError(
+                f'The load test writes {USERNAME_PREFIX}* users and their rooms to the configured database '
+                f'and deletes every {USERNAME_PREFIX}* user afterwards; pass --allow-writes to run it'
+            )
+        results = {'get_messages': [], 'send_message': []}
+        errors = {'lock': 0, 'other': 0}
+        lock = threading.Lock()
+
+        try:
+            rooms = self.create_rooms(options['rooms'])
+            # One generator per worker: the global one is shared between threads, which
+            # would make the request mix depend on scheduling instead of the seed
+            workers = [
+                threading.Thread(
+                    target=self.run_room,
+                    args=(chat_room, users, random.Random(options['seed'] + i), options, results, errors, lock),
+                )
+                for i, (chat_room, users) in enumerate(rooms)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+        self.report(results, errors, elapsed, in_process=not options['base_url'])
+
+    def create_rooms(self, count):
+        """One matched partner request (and its chat room) per simulated room"""
+        User = get_user_model()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        rooms = []
+        for i in range(count):
+            users = [
+                User.objects.create_user(
+                    f'{USERNAME_PREFIX}{nationality}_{i}', password=None, nationality=nationality,
+                    city='hanoi', gender='other', date_of_birth=date(1995, 1, 1),
+                )
+                for nationality in ('japanese', 'vietnamese')
+            ]
+            partner_request = PartnerRequest.objects.create(
+                requester=users[0], accepted_by=users[1], request_type='both',
+                title='Load test', description='Load test', preferred_city='hanoi',
+                meeting_preference='online', frequency='flexible', status='matched',
+            )
+            rooms.append((ChatRoom.objects.create(partner_request=partner_request), users))
+        return rooms
+
+    def run_room(self, chat_room, users, rng, options, results, errors, lock):
+        """Alternate the two participants between polling and sending, like two open tabs"""
+        clients = [self.make_client(user, options['base_url']) for user in users]
+        get_url = reverse('get_messages', args=[chat_room.id])
+        send_url = reverse('send_message', args=[chat_room.id])
+        last_ids = [0, 0]
+        try:
+            for i in range(options['requests']):
+                side = i % 2
+                if rng.random() < options['send_ratio']:
+                    name, method, url, data = 'send_message', 'POST', send_url, {'content': f'load test {i}'}
+                else:
+                    name, method, url, data = 'get_messages', 'GET', get_url, {'since_id': last_ids[side]}
+                sample = self.timed_request(clients[side], options['base_url'], method, url, data)
+                with lock:
+                    if sample['error']:
+                        errors[sample['error']] += 1
+                    else:
+                        results[name].append(sample)
+                if name == 'get_messages' and sample.get('latest_id'):
+                    last_ids[side] = sample['latest_id']
+                if options['think_time']:
+                    time.sleep(options['think_time'] / 1000)
+        finally:
+            connection.close()
+
+    def make_client(self, user, base_url):
+        client = Client()
+        client.force_login(user)
+        if base_url:
+            # Reuse the session created by force_login against the live server
+            return {
+                'Cookie': f"sessionid={client.cookies['sessionid'].value}; csrftoken={CSRF_TOKEN}",
+                'X-CSRFToken': CSRF_TOKEN,
+            }
+        return client
+
+    def timed_request(self, client, base_url, method, url, data):
+        if base_url:
+            return self.timed_http_request(client, base_url, method, url, data)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            try:
+                if method == 'POST':
+                    response = client.post(url, data)
+                else:
+                    response = client.get(url, data)
+            except OperationalError as e:
+                return {'error': 'lock' if 'locked' in str(e) else 'other'}
+            latency = time.perf_counter() - started
+        if response.status_code >= 400:
+            return {'error': 'other'}
+        return {
+            'error': None,
+            'latency': latency,
+            'queries': len(queries),
+            'latest_id': response.json().get('latest_id') if response.status_code == 200 else None,
+        }
+
+    def timed_http_request(self, headers, base_url, method, url, data):
+        body = None
+        full_url = base_url.rstrip('/') + url
+        if method == 'POST':
+            body = urllib.parse.urlencode(data).encode()
+        else:
+            full_url += '?' + urllib.parse.urlencode(data)
+        request = urllib.request.Request(full_url, data=body, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                payload = response.read()
+        except urllib.error.HTTPError as e:
+            # A locked SQLite database surfaces as a 500 from the server
+            return {'error': 'lock' if e.code == 500 and b'locked' in e.read() else 'other'}
+        except urllib.error.URLError:
+            return {'error': 'other'}
+        latency = time.perf_counter() - started
+        return {
+            'error': None,
+            'latency': latency,
+            'queries': None,
+            'latest_id': json.loads(payload).get('latest_id'),
+        }
+
+    def report(self, results, errors, elapsed, in_process):
+        # In-process runs interleave the chat views' DEBUG prints above; the report starts here
+        self.stdout.write(self.style.MIGRATE_HEADING('Chat load test'))
+        total = sum(len(samples) for samples in results.values())
+        self.stdout.write(f'Requests: {total} in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} req/s)')
+        for name, samples in results.items():
+            if not samples:
+                self.stdout.write(f'{name}: no samples')
+                continue
+            latencies = sorted(sample['latency'] * 1000 for sample in samples)
+            line = (
+                f'{name}: n={len(samples)} '
+                f'p50={percentile(latencies, 50):.1f}ms '
+                f'p95={percentile(latencies, 95):.1f}ms '
+                f'p99={percentile(latencies, 99):.1f}ms'
+            )
+            if in_process:
+                line += f" queries/request={statistics.mean(sample['queries'] for sample in samples):.1f}"
+            self.stdout.write(line)
+
+        style = self.style.SUCCESS if not any(errors.values()) else self.style.ERROR
+        self.stdout.write(style(f"Errors: sqlite_locked={errors['lock']}, other={errors['other']}"))
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
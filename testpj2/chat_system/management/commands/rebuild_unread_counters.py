@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat_system.models import ChatRoom, ChatParticipant
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user unread counters (ChatParticipant) from the read watermarks and hot (unarchived) messages'
+
+    def handle(self, *args, **options):
+        rooms = ChatRoom.objects.select_related('post', 'partner_request')
+        rebuilt = 0
+
+        for chat_room in rooms.iterator():
+            with transaction.atomic():
+                chat_room.sync_participants()
+                for participant in chat_room.participants.all():
+                    # Only hot messages count: archiving a room clears its counters
+                    # (ChatRoom.archive_messages), a rebuild must not bring them back
+                    participant.unread_count = chat_room.messages.filter(
+                        id__gt=participant.last_read_message_id,
+                    ).exclude(sender_id=participant.user_id).count()
+                    participant.save(update_fields=['unread_count'])
+                    rebuilt += 1
+
+        ChatParticipant.invalidate_totals(
+            list(ChatParticipant.objects.values_list('user_id', flat=True).distinct())
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt unread counters: participants={rebuilt}"))
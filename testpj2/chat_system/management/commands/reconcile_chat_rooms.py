@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat_system.models import ChatRoom, Message
+from event_creation.models import LanguageExchangePost, PartnerRequest
+
+
+class Command(BaseCommand):
+    help = 'Create missing chat rooms for matched posts / partner requests and resync their participants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be repaired')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        posts = LanguageExchangePost.objects.filter(
+            status='matched', chatroom__isnull=True,
+        ).select_related('japanese_user', 'vietnamese_user', 'japanese_partner', 'vietnamese_partner')
+        partner_requests = PartnerRequest.objects.filter(status='matched', chatroom__isnull=True)
+
+        created_rooms = 0
+        for post in posts:
+            self.stdout.write(f'Post {post.id}: missing chat room')
+            if dry_run:
+                continue
+            with transaction.atomic():
+                chat_room = ChatRoom.objects.create(post=post)
+                # Same welcome message accept_post sends, from the user who accepted
+                if post.partner:
+                    Message.objects.create(
+                        chat_room=chat_room,
+                        sender=post.partner,
+                        content="Xin chào! Tôi đã chấp nhận bài đăng của bạn. Hãy cùng trò chuyện và học tiếng Việt nhé!",
+                    )
+            created_rooms += 1
+
+        for partner_request in partner_requests:
+            self.stdout.write(f'Partner request {partner_request.id}: missing chat room')
+            if dry_run:
+                continue
+            ChatRoom.objects.create(partner_request=partner_request)
+            created_rooms += 1
+
+        synced_rooms = 0
+        if not dry_run:
+            for chat_room in ChatRoom.objects.select_related('post', 'partner_request').iterator():
+                chat_room.sync_participants()
+                synced_rooms += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled: created_rooms={created_rooms}, synced_rooms={synced_rooms}"
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_system', '0003_alter_chatroom_created_at_alter_chatroom_is_active_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['chat_room', 'id'], name='chat_message_room_id_idx'),
+        ),
+    ]
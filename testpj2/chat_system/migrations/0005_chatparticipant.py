@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('chat_system', '0004_message_room_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0, help_text='Messages from others not yet read by this user')),
+                ('last_read_message_id', models.PositiveBigIntegerField(default=0, help_text='Newest message id this user has read')),
+                ('chat_room', models.ForeignKey(help_text='The chat room', on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='chat_system.chatroom')),
+                ('user', models.ForeignKey(help_text='A user allowed into the chat room', on_delete=django.db.models.deletion.CASCADE, related_name='chat_participations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='chatparticipant',
+            constraint=models.UniqueConstraint(fields=('user', 'chat_room'), name='unique_chat_participant'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:10
+
+from django.db import migrations
+from django.db.models import Max, Q
+
+
+def fold_is_read_into_watermarks(apps, schema_editor):
+    """
+    Create the participant rows and derive each user's read watermark from Message.is_read
+    before the flag is dropped
+    """
+    ChatRoom = apps.get_model('chat_system', 'ChatRoom')
+    ChatParticipant = apps.get_model('chat_system', 'ChatParticipant')
+    
+    for chat_room in ChatRoom.objects.select_related('post', 'partner_request'):
+        if chat_room.post_id:
+            post = chat_room.post
+            user_ids = {post.japanese_user_id, post.vietnamese_user_id, post.japanese_partner_id, post.vietnamese_partner_id}
+        elif chat_room.partner_request_id:
+            partner_request = chat_room.partner_request
+            user_ids = {partner_request.requester_id, partner_request.accepted_by_id}
+        else:
+            user_ids = set()
+        user_ids.discard(None)
+        
+        for user_id in user_ids:
+            from_others = chat_room.messages.exclude(sender_id=user_id)
+            last_read = from_others.aggregate(last_read=Max('id', filter=Q(is_read=True)))['last_read'] or 0
+            ChatParticipant.objects.update_or_create(
+                chat_room=chat_room,
+                user_id=user_id,
+                defaults={
+                    'last_read_message_id': last_read,
+                    'unread_count': from_others.filter(id__gt=last_read).count(),
+                },
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_system', '0005_chatparticipant'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_is_read_into_watermarks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+    ]
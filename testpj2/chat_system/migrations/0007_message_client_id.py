@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_system', '0006_read_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='client_id',
+            field=models.CharField(blank=True, help_text="Id generated by the sender's outbox, makes retries idempotent", max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_id__isnull', False)), fields=('chat_room', 'sender', 'client_id'), name='unique_message_client_id'),
+        ),
+    ]
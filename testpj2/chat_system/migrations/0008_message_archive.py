@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_system', '0007_message_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='archived_up_to_id',
+            field=models.PositiveBigIntegerField(default=0, help_text='Messages up to this id live in archive segments (0 = none)'),
+        ),
+        migrations.CreateModel(
+            name='MessageArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.PositiveBigIntegerField(help_text='Id of the oldest message in the segment')),
+                ('last_message_id', models.PositiveBigIntegerField(help_text='Id of the newest message in the segment')),
+                ('message_count', models.PositiveIntegerField(help_text='Number of messages in the segment')),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON lines, one message per line')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the segment was written')),
+                ('chat_room', models.ForeignKey(help_text='The chat room the messages belong to', on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='chat_system.chatroom')),
+            ],
+            options={
+                'ordering': ['chat_room', 'first_message_id'],
+            },
+        ),
+    ]
@@ -4,9 +4,17 @@ This module handles real-time messaging between language exchange partners.
 Manages chat rooms and messages for both language exchange posts and partner requests.
 """
 
-from django.db import models
+import json
+import zlib
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q, Sum
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caches
 
 class ChatRoom(models.Model):
     """
@@ -19,9 +27,18 @@ class ChatRoom(models.Model):
     partner_request = models.OneToOneField('event_creation.PartnerRequest', on_delete=models.CASCADE, 
                                           null=True, blank=True, help_text="Associated partner request")
     
+    # Page sizes for cursor-based message sync (get_messages and the room page)
+    MESSAGE_PAGE_SIZE = 50
+    MAX_MESSAGE_PAGE_SIZE = 100
+    
+    # Largest batch accepted by send_messages
+    MAX_SEND_BATCH_SIZE = 20
+    
     # Chat room metadata
     created_at = models.DateTimeField(auto_now_add=True, help_text="When the chat room was created")
     is_active = models.BooleanField(default=True, help_text="Whether the chat room is still active")
+    archived_up_to_id = models.PositiveBigIntegerField(default=0,
+                                                       help_text="Messages up to this id live in archive segments (0 = none)")
     
     def __str__(self):
         if self.post:
@@ -29,11 +46,242 @@ class ChatRoom(models.Model):
         elif self.partner_request:
             return f"Chat for {self.partner_request}"
         return f"Chat Room {self.id}"
+    
+    @property
+    def group_name(self):
+        """Channel layer group that receives pushes for this room"""
+        return f"chat_{self.id}"
+    
+    def participant_ids(self):
+        """
+        IDs of users allowed into this room, derived from the post / partner request
+        Post rooms: creator and partner fields on both sides; partner request rooms: requester and accepter
+        Used to (re)build the ChatParticipant rows; access checks go through has_participant()
+        """
+        user_ids = set()
+        if self.post:
+            for user_id in (self.post.japanese_user_id, self.post.vietnamese_user_id,
+                            self.post.japanese_partner_id, self.post.vietnamese_partner_id):
+                if user_id:
+                    user_ids.add(user_id)
+        elif self.partner_request:
+            for user_id in (self.partner_request.requester_id, self.partner_request.accepted_by_id):
+                if user_id:
+                    user_ids.add(user_id)
+        return user_ids
+    
+    def participant_set(self):
+        """
+        Frozen set of participant user ids, read from the ChatParticipant rows and cached per room
+        Invalidated by sync_participants() whenever the post / partner request changes
+        """
+        user_ids = caches.PARTICIPANTS.get(self.id)
+        if user_ids is None:
+            user_ids = frozenset(self.participants.values_list('user_id', flat=True))
+            if not user_ids:
+                # Room created without signals (e.g. bulk loads): build the rows once
+                self.sync_participants()
+                user_ids = frozenset(self.participant_ids())
+            caches.PARTICIPANTS.set((self.id,), user_ids)
+        return user_ids
+    
+    def has_participant(self, user_id):
+        """Check whether the given user may read and post in this room"""
+        return user_id in self.participant_set()
+    
+    def sync_participants(self):
+        """
+        Make the ChatParticipant rows match participant_ids()
+        Called when the room is created and whenever its post / partner request changes
+        """
+        user_ids = self.participant_ids()
+        existing = set(self.participants.values_list('user_id', flat=True))
+        missing = user_ids - existing
+        stale = existing - user_ids
+        if missing:
+            ChatParticipant.objects.bulk_create(
+                [ChatParticipant(chat_room=self, user_id=user_id) for user_id in missing],
+                ignore_conflicts=True,
+            )
+        if stale:
+            self.participants.filter(user_id__in=stale).delete()
+        caches.PARTICIPANTS.delete(self.id)
+        # The room's status decides whether it counts towards the badge totals, which may just have changed
+        ChatParticipant.invalidate_totals(user_ids | stale)
+    
+    def record_new_messages(self, sender_id, count=1):
+        """Bump the unread counter of every participant except the sender"""
+        recipient_ids = self.participant_set() - {sender_id}
+        self.participants.filter(user_id__in=recipient_ids).update(unread_count=F('unread_count') + count)
+        ChatParticipant.invalidate_totals(recipient_ids)
+    
+    def add_messages(self, sender, items):
+        """
+        Store a batch of (client_id, content) pairs from one sender in a single transaction
+        Idempotent: client ids already stored for this sender are returned, not inserted again
+        Returns (messages in the order given, newly created messages)
+        """
+        client_ids = [client_id for client_id, content in items]
+        with transaction.atomic():
+            existing = {
+                message.client_id: message
+                for message in self.messages.filter(sender=sender, client_id__in=client_ids).select_related('sender')
+            }
+            new_messages = [
+                Message(chat_room=self, sender=sender, client_id=client_id, content=content)
+                for client_id, content in dict(items).items()
+                if client_id not in existing
+            ]
+            if new_messages:
+                try:
+                    with transaction.atomic():
+                        # bulk_create skips post_save, so counters are bumped here and pushes sent on commit
+                        created = Message.objects.bulk_create(new_messages)
+                        self.record_new_messages(sender.id, len(created))
+                except IntegrityError:
+                    # A concurrent retry of the same batch won the race; return what it stored
+                    created = []
+                    existing.update({
+                        message.client_id: message
+                        for message in self.messages.filter(sender=sender, client_id__in=client_ids).select_related('sender')
+                    })
+                stored = {message.client_id: message for message in created}
+                stored.update(existing)
+            else:
+                created, stored = [], existing
+        return [stored[client_id] for client_id in client_ids if client_id in stored], created
+    
+    def mark_read(self, user, up_to_id=None):
+        """
+        Advance the user's read watermark to up_to_id (default: newest message)
+        Writes a single row, and only when the watermark actually moves; returns whether it did
+        """
+        if up_to_id is None:
+            up_to_id = self.latest_message_id()
+        updated = self.participants.filter(user=user, last_read_message_id__lt=up_to_id).update(
+            unread_count=0,
+            last_read_message_id=up_to_id,
+        )
+        if updated:
+            ChatParticipant.invalidate_totals([user.id])
+        return bool(updated)
+    
+    def read_watermarks(self):
+        """Map of participant user id -> newest message id that user has read"""
+        return dict(self.participants.values_list('user_id', 'last_read_message_id'))
+    
+    def read_up_to_for(self, user, read_watermarks=None):
+        """How far the other participants have read; the user's messages up to this id show as read"""
+        if read_watermarks is None:
+            read_watermarks = self.read_watermarks()
+        return max(
+            [last_read_id for user_id, last_read_id in read_watermarks.items() if user_id != user.id],
+            default=0,
+        )
+    
+    def latest_message_id(self):
+        """ID of the newest message in the room (0 if empty), served by the (chat_room, id) index"""
+        return self.messages.order_by('-id').values_list('id', flat=True).first() or self.archived_up_to_id
+    
+    def message_page(self, since_id=None, before_id=None, limit=MESSAGE_PAGE_SIZE):
+        """
+        One page of messages in chronological order, plus whether more remain
+        - since_id: messages newer than the cursor (incremental sync)
+        - before_id: messages older than the cursor (loading history)
+        - neither: the newest page
+        Archived messages are merged in only when the cursor reaches below archived_up_to_id
+        """
+        queryset = self.messages.select_related('sender')
+        if since_id is not None:
+            page = list(queryset.filter(id__gt=since_id).order_by('id')[:limit + 1])
+            if since_id < self.archived_up_to_id:
+                archived = [message for message in self.archived_messages() if message.id > since_id]
+                page = archived + page
+            has_more = len(page) > limit
+            return page[:limit], has_more
+        
+        if before_id is not None:
+            queryset = queryset.filter(id__lt=before_id)
+        page = list(queryset.order_by('-id')[:limit + 1])
+        if len(page) <= limit and self.archived_up_to_id:
+            archived = [
+                message for message in reversed(self.archived_messages())
+                if before_id is None or message.id < before_id
+            ]
+            page += archived
+        has_more = len(page) > limit
+        page = page[:limit]
+        page.reverse()
+        return page, has_more
+    
+    def archived_messages(self):
+        """Messages moved to cold storage, oldest first, as unsaved Message instances"""
+        if not self.archived_up_to_id:
+            return []
+        messages_list = []
+        for segment in self.archive_segments.order_by('first_message_id'):
+            messages_list.extend(segment.decode(self))
+        senders = get_user_model().objects.in_bulk({message.sender_id for message in messages_list})
+        for message in messages_list:
+            message.sender = senders.get(message.sender_id)
+        return messages_list
+    
+    def archive_messages(self):
+        """
+        Move every message of this room into compressed archive segments and deactivate the room
+        Returns the number of messages moved
+        """
+        with transaction.atomic():
+            messages_list = list(self.messages.order_by('id'))
+            if not messages_list:
+                return 0
+            size = MessageArchiveSegment.SEGMENT_SIZE
+            for start in range(0, len(messages_list), size):
+                MessageArchiveSegment.encode(self, messages_list[start:start + size]).save()
+            self.messages.filter(id__lte=messages_list[-1].id).delete()
+            self.archived_up_to_id = messages_list[-1].id
+            self.is_active = False
+            self.save(update_fields=['archived_up_to_id', 'is_active'])
+            # Archived rooms are finished: drop their unread counts so no badge points at archived messages
+            user_ids = set(self.participants.filter(unread_count__gt=0).values_list('user_id', flat=True))
+            self.participants.filter(user_id__in=user_ids).update(unread_count=0)
+            ChatParticipant.invalidate_totals(user_ids)
+        return len(messages_list)
+    
+    def restore_archived_messages(self):
+        """Move archived messages back into the hot table (ids are kept) and reactivate the room"""
+        with transaction.atomic():
+            messages_list = self.archived_messages()
+            timestamps = [message.timestamp for message in messages_list]
+            # bulk_create skips post_save: restored messages must not bump unread counters or be pushed
+            Message.objects.bulk_create(messages_list)
+            # ...but it does apply auto_now_add, which stamps every message with now(): put the sent times back
+            for message, timestamp in zip(messages_list, timestamps):
+                message.timestamp = timestamp
+            Message.objects.bulk_update(messages_list, ['timestamp'], batch_size=500)
+            self.archive_segments.all().delete()
+            self.archived_up_to_id = 0
+            self.is_active = True
+            self.save(update_fields=['archived_up_to_id', 'is_active'])
+        return len(messages_list)
+
+class MessageManager(models.Manager):
+    """Default manager for Message; also backs the chat_room.messages accessor"""
+    
+    def including_archived(self):
+        """
+        Hot and archived messages of one room, oldest first
+        Only available through the related accessor, e.g. chat_room.messages.including_archived()
+        """
+        chat_room = getattr(self, 'instance', None)
+        if chat_room is None:
+            raise TypeError('including_archived() must be called on chat_room.messages')
+        return chat_room.archived_messages() + list(self.select_related('sender').order_by('id'))
 
 class Message(models.Model):
     """
     Individual messages within a chat room
-    Supports read status tracking for notification purposes
+    Read status is derived from the participants' read watermarks (ChatParticipant.last_read_message_id)
     """
     # Message relationships
     chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='messages',
@@ -44,10 +292,156 @@ class Message(models.Model):
     # Message content and metadata
     content = models.TextField(help_text="The message text content")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="When the message was sent")
-    is_read = models.BooleanField(default=False, help_text="Whether the recipient has read the message")
+    client_id = models.CharField(max_length=64, null=True, blank=True,
+                                 help_text="Id generated by the sender's outbox, makes retries idempotent")
+    
+    objects = MessageManager()
     
     class Meta:
         ordering = ['timestamp']  # Order messages chronologically
+        indexes = [
+            # Cursor-based sync: WHERE chat_room_id = ? AND id > ? ORDER BY id
+            models.Index(fields=['chat_room', 'id'], name='chat_message_room_id_idx'),
+        ]
+        constraints = [
+            # A retried outbox batch must not store the same message twice
+            models.UniqueConstraint(fields=['chat_room', 'sender', 'client_id'],
+                                    condition=Q(client_id__isnull=False),
+                                    name='unique_message_client_id'),
+        ]
     
     def __str__(self):
-        return f"{self.sender.username}: {self.content[:50]}"
\ No newline at end of file
+        return f"{self.sender.username}: {self.content[:50]}"
+    
+    def is_read_by_recipient(self, read_watermarks):
+        """Whether any participant other than the sender has read up to this message"""
+        return any(
+            last_read_id >= self.id
+            for user_id, last_read_id in read_watermarks.items()
+            if user_id != self.sender_id
+        )
+    
+    def to_dict(self, user=None, read_watermarks=None):
+        """
+        JSON-ready representation shared by the AJAX endpoints and the WebSocket consumer
+        `is_own` is only included when the viewing user is known; without watermarks
+        (a message that was just sent) `is_read` is False
+        """
+        data = {
+            'id': self.id,
+            'content': self.content,
+            'sender': self.sender.username,
+            'sender_id': self.sender_id,
+            'sender_name': self.sender.full_name or self.sender.username,
+            'timestamp': self.timestamp.strftime('%H:%M'),
+            'client_id': self.client_id,
+            'is_read': self.is_read_by_recipient(read_watermarks) if read_watermarks else False,
+        }
+        if user is not None:
+            data['is_own'] = self.sender_id == user.id
+        return data
+
+
+class MessageArchiveSegment(models.Model):
+    """
+    Cold storage for the messages of inactive or completed rooms
+    Each segment holds up to SEGMENT_SIZE messages as zlib-compressed JSON lines,
+    which keeps the hot Message table small for polling and unread queries
+    """
+    SEGMENT_SIZE = 1000
+    
+    chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='archive_segments',
+                                  help_text="The chat room the messages belong to")
+    first_message_id = models.PositiveBigIntegerField(help_text="Id of the oldest message in the segment")
+    last_message_id = models.PositiveBigIntegerField(help_text="Id of the newest message in the segment")
+    message_count = models.PositiveIntegerField(help_text="Number of messages in the segment")
+    data = models.BinaryField(help_text="zlib-compressed JSON lines, one message per line")
+    created_at = models.DateTimeField(auto_now_add=True, help_text="When the segment was written")
+    
+    class Meta:
+        ordering = ['chat_room', 'first_message_id']
+    
+    def __str__(self):
+        return f"Room {self.chat_room_id}: messages {self.first_message_id}-{self.last_message_id}"
+    
+    @classmethod
+    def encode(cls, chat_room, messages_list):
+        """Build an unsaved segment from consecutive messages of one room"""
+        lines = [
+            json.dumps({
+                'id': message.id,
+                'sender_id': message.sender_id,
+                'content': message.content,
+                'timestamp': message.timestamp.isoformat(),
+                'client_id': message.client_id,
+            }, ensure_ascii=False)
+            for message in messages_list
+        ]
+        return cls(
+            chat_room=chat_room,
+            first_message_id=messages_list[0].id,
+            last_message_id=messages_list[-1].id,
+            message_count=len(messages_list),
+            data=zlib.compress('\n'.join(lines).encode('utf-8')),
+        )
+    
+    def decode(self, chat_room=None):
+        """Unsaved Message instances for this segment, oldest first"""
+        chat_room = chat_room or self.chat_room
+        messages_list = []
+        for line in zlib.decompress(bytes(self.data)).decode('utf-8').splitlines():
+            record = json.loads(line)
+            messages_list.append(Message(
+                id=record['id'],
+                chat_room=chat_room,
+                sender_id=record['sender_id'],
+                content=record['content'],
+                timestamp=parse_datetime(record['timestamp']),
+                client_id=record['client_id'],
+            ))
+        return messages_list
+
+
+class ChatParticipant(models.Model):
+    """
+    Per-(room, user) read state, kept up to date as messages are sent and read
+    Lets the unread badge be a single indexed lookup instead of a COUNT per room
+    """
+    chat_room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='participants',
+                                  help_text="The chat room")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_participations',
+                             help_text="A user allowed into the chat room")
+    unread_count = models.PositiveIntegerField(default=0, help_text="Messages from others not yet read by this user")
+    last_read_message_id = models.PositiveBigIntegerField(default=0, help_text="Newest message id this user has read")
+    
+    class Meta:
+        constraints = [
+            # Also serves as the index for per-user lookups
+            models.UniqueConstraint(fields=['user', 'chat_room'], name='unique_chat_participant'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} in room {self.chat_room_id}: {self.unread_count} unread"
+    
+    @classmethod
+    def in_matched_rooms(cls, user_id):
+        """The user's participations in rooms whose post / partner request is matched (the rooms the inbox lists)"""
+        return cls.objects.filter(
+            Q(chat_room__post__status='matched') | Q(chat_room__partner_request__status='matched'),
+            user_id=user_id,
+        )
+    
+    @classmethod
+    def total_unread(cls, user_id):
+        """
+        Total unread messages across the user's inbox rooms, cached until the counters change
+        Completed or cancelled rooms are left out: the user can no longer open them to read
+        """
+        return caches.UNREAD_TOTALS.get_or_set(
+            (user_id,), lambda: cls.in_matched_rooms(user_id).aggregate(total=Sum('unread_count'))['total'] or 0,
+        )
+    
+    @classmethod
+    def invalidate_totals(cls, user_ids):
+        if user_ids:
+            caches.UNREAD_TOTALS.delete_many([(user_id,) for user_id in user_ids])
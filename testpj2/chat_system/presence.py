@@ -0,0 +1,179 @@
+"""
+Chat Presence
+Per-room online users and typing state for the WebSocket consumer.
+Entries are kept in a TTL store, never in the database:
+- LocalTTLStore: in-process stand-in, enough for a single server process
+- RedisTTLStore: sorted sets scored by expiry time, shared between processes
+Set CHAT_PRESENCE_REDIS_URL in settings to use Redis.
+Reads skip expired entries but leave them in place: expire() removes them and reports
+which ones it removed, so the connection that sweeps (see sweep_room) can broadcast
+"offline" for users whose tab died without closing the socket.
+"""
+
+import threading
+import time
+from django.conf import settings
+
+ONLINE_TTL = 60  # Seconds a connection stays online without a heartbeat
+TYPING_TTL = 6  # Seconds a typing flag lives without being refreshed
+HEARTBEAT_COALESCE = 20  # Heartbeats closer together than this skip the store
+# Expired entries wait this long for a sweep before the whole key may go (Redis key TTL)
+SWEEP_GRACE = 2 * ONLINE_TTL
+
+
+class LocalTTLStore:
+    """In-process store of {key: {member: expires_at}}"""
+    
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+    
+    def _live(self, key, now):
+        return {member for member, expires_at in self._data.get(key, {}).items() if expires_at > now}
+    
+    def touch(self, key, member, ttl):
+        """Add or refresh a member, return the live members before the call"""
+        now = time.monotonic()
+        with self._lock:
+            before = self._live(key, now)
+            entries = self._data.setdefault(key, {})
+            # Entries no sweep claimed within the grace period go quietly, like the Redis key TTL
+            for stale in [m for m, expires_at in entries.items() if expires_at <= now - SWEEP_GRACE]:
+                del entries[stale]
+            entries[member] = now + ttl
+        return before
+    
+    def remove(self, key, member):
+        """Drop a member, return the live members before the call"""
+        with self._lock:
+            before = self._live(key, time.monotonic())
+            entries = self._data.get(key, {})
+            entries.pop(member, None)
+            if not entries:
+                self._data.pop(key, None)
+        return before
+    
+    def members(self, key):
+        with self._lock:
+            return self._live(key, time.monotonic())
+    
+    def expire(self, key):
+        """Remove the expired members and return them (each one is reported to a single caller)"""
+        now = time.monotonic()
+        with self._lock:
+            entries = self._data.get(key, {})
+            expired = {member for member, expires_at in entries.items() if expires_at <= now}
+            for member in expired:
+                del entries[member]
+            if not entries:
+                self._data.pop(key, None)
+        return expired
+
+
+class RedisTTLStore:
+    """Same interface as LocalTTLStore on top of Redis sorted sets"""
+    
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed when CHAT_PRESENCE_REDIS_URL is set
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+    
+    def _live(self, pipe, key, now):
+        pipe.zrangebyscore(key, f'({now}', '+inf')
+    
+    def touch(self, key, member, ttl):
+        now = time.time()
+        pipe = self._client.pipeline()
+        self._live(pipe, key, now)
+        pipe.zadd(key, {member: now + ttl})
+        pipe.expire(key, int(ttl) + SWEEP_GRACE)
+        return set(pipe.execute()[0])
+    
+    def remove(self, key, member):
+        pipe = self._client.pipeline()
+        self._live(pipe, key, time.time())
+        pipe.zrem(key, member)
+        return set(pipe.execute()[0])
+    
+    def members(self, key):
+        pipe = self._client.pipeline()
+        self._live(pipe, key, time.time())
+        return set(pipe.execute()[0])
+    
+    def expire(self, key):
+        # MULTI: read and removal happen together, so concurrent sweeps never report a member twice
+        now = time.time()
+        pipe = self._client.pipeline(transaction=True)
+        pipe.zrangebyscore(key, '-inf', now)
+        pipe.zremrangebyscore(key, '-inf', now)
+        return set(pipe.execute()[0])
+
+
+_store = None
+
+
+def get_store():
+    """The configured presence store, created on first use"""
+    global _store
+    if _store is None:
+        redis_url = getattr(settings, 'CHAT_PRESENCE_REDIS_URL', None)
+        _store = RedisTTLStore(redis_url) if redis_url else LocalTTLStore()
+    return _store
+
+
+def online_key(room_id):
+    return f'chat_system:online:{room_id}'
+
+
+def typing_key(room_id):
+    return f'chat_system:typing:{room_id}'
+
+
+def connection_member(user_id, channel_name):
+    # One entry per connection, so closing one of several tabs keeps the user online
+    return f'{user_id}|{channel_name}'
+
+
+def user_ids(members):
+    return {int(member.split('|', 1)[0]) for member in members}
+
+
+def mark_online(room_id, user_id, channel_name):
+    """Register or refresh a connection, return True if the user just came online"""
+    before = get_store().touch(online_key(room_id), connection_member(user_id, channel_name), ONLINE_TTL)
+    return user_id not in user_ids(before)
+
+
+def mark_offline(room_id, user_id, channel_name):
+    """Drop a connection, return True if it was the user's last one in the room"""
+    member = connection_member(user_id, channel_name)
+    before = get_store().remove(online_key(room_id), member)
+    return user_id not in user_ids(before - {member})
+
+
+def online_users(room_id):
+    return user_ids(get_store().members(online_key(room_id)))
+
+
+def sweep_room(room_id):
+    """
+    Drop the room's expired connections and typing flags
+    Returns (user ids that went offline, user ids that stopped typing) for the caller to broadcast
+    """
+    store = get_store()
+    expired = user_ids(store.expire(online_key(room_id)))
+    offline = expired - online_users(room_id)
+    stopped_typing = {int(member) for member in store.expire(typing_key(room_id))} - typing_users(room_id)
+    return offline, stopped_typing
+
+
+def set_typing(room_id, user_id, is_typing):
+    """Start, refresh or stop typing, return True if the user's typing state changed"""
+    store = get_store()
+    member = str(user_id)
+    if is_typing:
+        return member not in store.touch(typing_key(room_id), member, TYPING_TTL)
+    return member in store.remove(typing_key(room_id), member)
+
+
+def typing_users(room_id):
+    return {int(member) for member in get_store().members(typing_key(room_id))}
@@ -0,0 +1,84 @@
+"""
+Chat System Signals
+- Broadcasts newly created messages to the room's WebSocket group once the
+  surrounding transaction has committed, and read receipts when a watermark moves
+- Keeps the per-user unread counters (ChatParticipant) in step with rooms,
+  their posts / partner requests, and new messages
+- Deactivates a room once its post / partner request is completed or cancelled,
+  which makes it a candidate for the archive_messages command
+- Drops the ROOMS cache namespace (chat_system.caches) whenever a room changes
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from event_creation.models import LanguageExchangePost, PartnerRequest
+from . import caches
+from .models import ChatRoom, Message
+
+FINISHED_STATUSES = ('completed', 'cancelled')
+
+
+def broadcast_message(message):
+    """Push a message to everyone connected to its chat room"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        message.chat_room.group_name,
+        {'type': 'chat.message', 'message': message.to_dict()},
+    )
+
+
+def broadcast_read(chat_room, user_id, message_id):
+    """Tell the room that a participant's read watermark moved (read receipts)"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        chat_room.group_name,
+        {'type': 'chat.read', 'user_id': user_id, 'message_id': message_id},
+    )
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if created:
+        instance.chat_room.record_new_messages(instance.sender_id)
+        transaction.on_commit(lambda: broadcast_message(instance))
+
+
+@receiver(post_save, sender=ChatRoom)
+def create_participants(sender, instance, created, **kwargs):
+    if created:
+        instance.sync_participants()
+
+
+@receiver(post_save, sender=LanguageExchangePost)
+def sync_post_participants(sender, instance, **kwargs):
+    chat_room = ChatRoom.objects.filter(post=instance).first()
+    if chat_room:
+        chat_room.post = instance
+        chat_room.sync_participants()
+        deactivate_finished_room(chat_room, instance.status)
+
+
+@receiver(post_save, sender=PartnerRequest)
+def sync_partner_request_participants(sender, instance, **kwargs):
+    chat_room = ChatRoom.objects.filter(partner_request=instance).first()
+    if chat_room:
+        chat_room.partner_request = instance
+        chat_room.sync_participants()
+        deactivate_finished_room(chat_room, instance.status)
+
+
+def deactivate_finished_room(chat_room, status):
+    if status in FINISHED_STATUSES and chat_room.is_active:
+        ChatRoom.objects.filter(pk=chat_room.pk).update(is_active=False)
+        # update() sends no post_save
+        transaction.on_commit(caches.ROOMS.invalidate)
+
+
+caches.ROOMS.invalidate_on(ChatRoom)
@@ -1,3 +1,355 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from user_profile.models import CustomUser
+from event_creation.models import CafeLocation, VietnamesePhrase, LanguageExchangePost, PartnerRequest
+from . import presence
+from .consumers import ChatConsumer
+from .models import ChatRoom, ChatParticipant, Message
 
-# Create your tests here.
+
+def make_user(username, nationality):
+    return CustomUser.objects.create_user(username, password='pw', nationality=nationality, city='hanoi',
+                                          gender='male', date_of_birth=date(1990, 1, 1))
+
+
+class ChatRoomFixture:
+    """A matched post between a Japanese and a Vietnamese user, with its chat room"""
+
+    def setUp(self):
+        cache.clear()
+        self.japanese = make_user('jp', 'japanese')
+        self.vietnamese = make_user('vn', 'vietnamese')
+        cafe = CafeLocation.objects.create(name='Cafe', address='Street', city='hanoi', latitude=21.03, longitude=105.85)
+        phrase = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                                                 japanese_translation='こんにちは', english_translation='Hello')
+        self.post = LanguageExchangePost.objects.create(
+            user_type='japanese', japanese_user=self.japanese, vietnamese_partner=self.vietnamese,
+            phrase=phrase, cafe_location=cafe, meeting_date=timezone.now() + timedelta(days=1), status='matched',
+        )
+        self.room = ChatRoom.objects.create(post=self.post)
+
+    def send(self, sender, count=1):
+        return [Message.objects.create(chat_room=self.room, sender=sender, content=f'message {i}') for i in range(count)]
+
+    def participant(self, user):
+        return ChatParticipant.objects.get(chat_room=self.room, user=user)
+
+
+class ChatTestCase(ChatRoomFixture, TestCase):
+    pass
+
+
+class UnreadCounterTests(ChatTestCase):
+    def test_badge_counts_matched_rooms(self):
+        self.send(self.japanese, 3)
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 3)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 3)
+        self.assertEqual(ChatParticipant.total_unread(self.japanese.id), 0)
+
+    def test_badge_leaves_out_finished_rooms(self):
+        self.send(self.japanese, 2)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 2)
+        self.post.status = 'completed'
+        self.post.save()
+        # The cached total is dropped by the status change
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 0)
+
+
+class ReadWatermarkTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sent = self.send(self.japanese, 5)
+        self.client.force_login(self.vietnamese)
+
+    def get_messages(self, **params):
+        response = self.client.get(reverse('get_messages', args=[self.room.id]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_history_page_does_not_mark_read(self):
+        data = self.get_messages(before_id=self.sent[-1].id)
+        self.assertEqual(len(data['messages']), 4)
+        participant = self.participant(self.vietnamese)
+        self.assertEqual(participant.unread_count, 5)
+        self.assertEqual(participant.last_read_message_id, 0)
+
+    def test_page_cut_short_does_not_mark_read(self):
+        data = self.get_messages(since_id=0, limit=2)
+        self.assertTrue(data['has_more'])
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 5)
+
+    def test_opening_room_marks_read(self):
+        response = self.client.get(reverse('chat_room', args=[self.room.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 0)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 0)
+        # The page's first poll starts from the newest rendered message and gets nothing back
+        data = self.get_messages(since_id=self.sent[-1].id)
+        self.assertEqual(data['messages'], [])
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 0)
+
+    def test_empty_poll_from_head_marks_read(self):
+        # The client already holds the newest message (e.g. pushed over the WebSocket)
+        self.get_messages(since_id=self.sent[-1].id)
+        participant = self.participant(self.vietnamese)
+        self.assertEqual(participant.unread_count, 0)
+        self.assertEqual(participant.last_read_message_id, self.sent[-1].id)
+
+    def test_head_page_marks_read(self):
+        self.get_messages(since_id=self.sent[1].id)
+        participant = self.participant(self.vietnamese)
+        self.assertEqual(participant.unread_count, 0)
+        self.assertEqual(participant.last_read_message_id, self.sent[-1].id)
+
+
+class ArchiveTests(ChatTestCase):
+    def test_round_trip_keeps_messages(self):
+        sent = self.send(self.japanese, 3) + self.send(self.vietnamese, 2)
+        sent_at = timezone.now() - timedelta(days=400)
+        Message.objects.filter(chat_room=self.room).update(timestamp=sent_at)
+        before = list(self.room.messages.order_by('id').values_list('id', 'sender_id', 'content', 'timestamp'))
+
+        self.assertEqual(self.room.archive_messages(), 5)
+        self.assertFalse(self.room.messages.exists())
+        self.assertEqual([message.id for message in self.room.messages.including_archived()], [m.id for m in sent])
+
+        self.assertEqual(self.room.restore_archived_messages(), 5)
+        after = list(self.room.messages.order_by('id').values_list('id', 'sender_id', 'content', 'timestamp'))
+        self.assertEqual(after, before)
+        self.assertEqual(self.room.archived_up_to_id, 0)
+
+    def test_archive_clears_unread_counters(self):
+        self.send(self.japanese, 3)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 3)
+        self.room.archive_messages()
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 0)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 0)
+
+    def test_rebuild_leaves_archived_messages_read(self):
+        self.send(self.japanese, 3)
+        self.room.archive_messages()
+        call_command('rebuild_unread_counters', stdout=StringIO())
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 0)
+        self.assertEqual(ChatParticipant.total_unread(self.vietnamese.id), 0)
+
+        # Restored messages are hot again and count once more
+        self.room.restore_archived_messages()
+        call_command('rebuild_unread_counters', stdout=StringIO())
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 3)
+
+
+class PresenceStoreTests(SimpleTestCase):
+    def setUp(self):
+        store = presence.LocalTTLStore()
+        patcher = mock.patch.object(presence, '_store', store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = store
+
+    def test_expired_members_are_hidden_until_swept(self):
+        self.store.touch('k', 'live', 60)
+        self.store.touch('k', 'gone', -1)
+        self.assertEqual(self.store.members('k'), {'live'})
+        # Each expired member is reported once, to one sweeper
+        self.assertEqual(self.store.expire('k'), {'gone'})
+        self.assertEqual(self.store.expire('k'), set())
+
+    def test_sweep_reports_users_whose_last_connection_expired(self):
+        presence.mark_online(1, 7, 'tab-a')
+        presence.get_store().touch(presence.online_key(1), presence.connection_member(7, 'tab-b'), -1)
+        presence.get_store().touch(presence.online_key(1), presence.connection_member(8, 'tab-c'), -1)
+        presence.set_typing(1, 8, True)
+        presence.get_store().touch(presence.typing_key(1), '8', -1)
+        # User 7 still has a live tab; user 8 went silent
+        self.assertEqual(presence.sweep_room(1), ({8}, {8}))
+        self.assertEqual(presence.online_users(1), {7})
+        self.assertEqual(presence.sweep_room(1), (set(), set()))
+
+
+class ChatConsumerTests(ChatRoomFixture, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(presence, '_store', presence.LocalTTLStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(ChatConsumer.as_asgi(), f'/ws/chat/{self.room.id}/')
+        communicator.scope['user'] = user
+        communicator.scope['url_route'] = {'kwargs': {'room_id': self.room.id}}
+        return communicator
+
+    def test_outsider_is_refused(self):
+        outsider = make_user('other', 'japanese')
+
+        async def run():
+            connected, _ = await self.communicator(outsider).connect()
+            self.assertFalse(connected)
+        async_to_sync(run)()
+
+    def test_delivery_marks_read(self):
+        async def run():
+            japanese, vietnamese = self.communicator(self.japanese), self.communicator(self.vietnamese)
+            await japanese.connect()
+            self.assertEqual((await japanese.receive_json_from())['online'], [self.japanese.id])
+            await vietnamese.connect()
+            await vietnamese.receive_json_from()
+            self.assertEqual(await japanese.receive_json_from(),
+                             {'type': 'presence', 'user_id': self.vietnamese.id, 'online': True})
+
+            message = await database_sync_to_async(self.send)(self.japanese)
+            self.assertTrue((await japanese.receive_json_from())['message']['is_own'])
+            self.assertFalse((await vietnamese.receive_json_from())['message']['is_own'])
+            # The open tab reads the message on delivery and tells the sender
+            self.assertEqual(await japanese.receive_json_from(), {'type': 'read', 'read_up_to': message[0].id})
+            await japanese.disconnect()
+            await vietnamese.disconnect()
+        async_to_sync(run)()
+        participant = self.participant(self.vietnamese)
+        self.assertEqual((participant.unread_count, participant.last_read_message_id),
+                         (0, Message.objects.get().id))
+
+    def test_expired_connection_goes_offline(self):
+        async def run():
+            japanese, vietnamese = self.communicator(self.japanese), self.communicator(self.vietnamese)
+            await japanese.connect()
+            await japanese.receive_json_from()
+            await vietnamese.connect()
+            await vietnamese.receive_json_from()
+            await japanese.receive_json_from()
+
+            # The Vietnamese tab dies without a close frame: its entry just runs out
+            key = presence.online_key(self.room.id)
+            for member in presence.get_store().members(key):
+                if member.startswith(f'{self.vietnamese.id}|'):
+                    presence.get_store().touch(key, member, -1)
+            with mock.patch.object(presence, 'HEARTBEAT_COALESCE', 0):
+                await japanese.send_json_to({'type': 'heartbeat'})
+                self.assertEqual(await japanese.receive_json_from(),
+                                 {'type': 'presence', 'user_id': self.vietnamese.id, 'online': False})
+            await japanese.disconnect()
+            await vietnamese.disconnect()
+        async_to_sync(run)()
+        self.assertEqual(presence.online_users(self.room.id), set())
+
+
+class LoadTestCommandTests(ChatTestCase):
+    def test_refuses_without_allow_writes(self):
+        with self.assertRaises(CommandError):
+            call_command('chat_loadtest', rooms=1, requests=1, stdout=StringIO())
+        self.assertFalse(CustomUser.objects.filter(username__startswith='loadtest_').exists())
+
+
+class MessageSyncTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.sent = self.send(self.japanese, 5)
+        self.client.force_login(self.vietnamese)
+        self.url = reverse('get_messages', args=[self.room.id])
+
+    def test_poll_returns_only_newer_messages(self):
+        data = self.client.get(self.url, {'since_id': self.sent[2].id}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [m.id for m in self.sent[3:]])
+        self.assertEqual(data['latest_id'], self.sent[-1].id)
+
+    def test_history_pages_backwards(self):
+        data = self.client.get(self.url, {'before_id': self.sent[-1].id, 'limit': 2}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [self.sent[2].id, self.sent[3].id])
+        self.assertTrue(data['has_more'])
+        data = self.client.get(self.url, {'before_id': self.sent[2].id, 'limit': 2}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [self.sent[0].id, self.sent[1].id])
+        self.assertFalse(data['has_more'])
+
+    def test_unchanged_poll_is_not_modified(self):
+        etag = self.client.get(self.url, {'since_id': self.sent[-1].id})['ETag']
+        response = self.client.get(self.url, {'since_id': self.sent[-1].id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # A new message changes the ETag
+        self.send(self.japanese)
+        response = self.client.get(self.url, {'since_id': self.sent[-1].id}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['messages']), 1)
+
+    def test_malformed_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(self.url, {'since_id': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'before_id': 'x'}).status_code, 400)
+
+    def test_outsider_is_refused(self):
+        self.client.force_login(make_user('other', 'vietnamese'))
+        self.assertFalse(self.client.get(self.url).json()['success'])
+        self.assertEqual(self.client.get(reverse('chat_room', args=[self.room.id])).status_code, 302)
+
+
+class SendMessageTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.vietnamese)
+
+    def post_batch(self, messages):
+        url = reverse('send_messages', args=[self.room.id])
+        return self.client.post(url, json.dumps({'messages': messages}), content_type='application/json')
+
+    def test_message_counts_as_unread_for_the_partner(self):
+        response = self.client.post(reverse('send_message', args=[self.room.id]), {'content': 'Xin chào'})
+        self.assertEqual(response.json()['message']['content'], 'Xin chào')
+        self.assertEqual(self.participant(self.japanese).unread_count, 1)
+        self.assertEqual(self.participant(self.vietnamese).unread_count, 0)
+
+    def test_blank_message_is_rejected(self):
+        response = self.client.post(reverse('send_message', args=[self.room.id]), {'content': '   '})
+        self.assertFalse(response.json()['success'])
+        self.assertFalse(self.room.messages.exists())
+
+    def test_retried_batch_is_not_duplicated(self):
+        batch = [{'client_id': f'c{i}', 'content': f'batch {i}'} for i in range(5)]
+        first = self.post_batch(batch).json()
+        # The retry also carries one message the first attempt never sent
+        retry = self.post_batch(batch + [{'client_id': 'c5', 'content': 'batch 5'}]).json()
+        self.assertEqual([m['id'] for m in retry['messages'][:5]], [m['id'] for m in first['messages']])
+        self.assertEqual(self.room.messages.count(), 6)
+        self.assertEqual(self.participant(self.japanese).unread_count, 6)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.post_batch([]).status_code, 400)
+        oversized = [{'client_id': f'c{i}', 'content': 'x'} for i in range(ChatRoom.MAX_SEND_BATCH_SIZE + 1)]
+        self.assertEqual(self.post_batch(oversized).status_code, 400)
+        self.assertEqual(self.post_batch([{'client_id': 'c0', 'content': ''}]).status_code, 400)
+        self.assertFalse(self.room.messages.exists())
+
+
+class InboxTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        partner_request = PartnerRequest.objects.create(
+            requester=self.japanese, accepted_by=self.vietnamese, request_type='both', title='Partner',
+            description='Looking for a partner', preferred_city='hanoi', meeting_preference='online',
+            frequency='flexible', status='matched',
+        )
+        self.request_room = ChatRoom.objects.create(partner_request=partner_request)
+        self.client.force_login(self.vietnamese)
+
+    def inbox(self):
+        return self.client.get(reverse('my_chats')).context['chat_rooms']
+
+    def test_newest_activity_first(self):
+        self.send(self.japanese, 2)
+        Message.objects.create(chat_room=self.request_room, sender=self.japanese, content='latest')
+        entries = self.inbox()
+        self.assertEqual([entry['chat_room'].id for entry in entries], [self.request_room.id, self.room.id])
+        self.assertEqual([entry['unread_count'] for entry in entries], [1, 2])
+        self.assertEqual(entries[0]['last_message']['content'], 'latest')
+        self.assertEqual(entries[0]['partner'], self.japanese)
+
+    def test_finished_rooms_are_left_out(self):
+        self.post.status = 'completed'
+        self.post.save()
+        self.assertEqual([entry['chat_room'].id for entry in self.inbox()], [self.request_room.id])
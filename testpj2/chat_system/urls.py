@@ -5,5 +5,6 @@ urlpatterns = [
     path('chat/<int:room_id>/', views.chat_room, name='chat_room'),
     path('my-chats/', views.my_chats, name='my_chats'),
     path('send-message/<int:room_id>/', views.send_message, name='send_message'),
+    path('send-messages/<int:room_id>/', views.send_messages, name='send_messages'),
     path('get-messages/<int:room_id>/', views.get_messages, name='get_messages'),
 ]
@@ -2,98 +2,70 @@
 Chat System Views
 Handles real-time messaging between language exchange partners:
 - Chat room display and access control
-- AJAX-based message sending and receiving
+- AJAX-based message sending (single and batched outbox) and receiving (polling fallback for WebSocket push)
 - Message read status tracking
 - User chat room listing
 """
 
-from django.shortcuts import render, redirect, get_object_or_404
+import json
+
+from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, HttpResponseNotModified
+from django.db import transaction
 from django.utils import timezone
-from django.db.models import Q
+from .caches import ROOMS
 from .models import ChatRoom, Message
-from event_creation.models import LanguageExchangePost, PartnerRequest
+from .inbox import build_inbox
+from .signals import broadcast_message, broadcast_read
+from vietnam_japan_connect.metrics import query_budget
+
+def get_room_or_404(room_id):
+    """The chat room, read through the ROOMS cache namespace (the polling endpoints hit it constantly)"""
+    chat_room = ROOMS.get_or_set(('room', room_id), lambda: ChatRoom.objects.filter(id=room_id).first())
+    if chat_room is None:
+        raise Http404('No ChatRoom matches the given query.')
+    return chat_room
 
+@query_budget(14)
 @login_required
 def chat_room(request, room_id):
     """
     Display chat room interface with access control
     Ensures only authorized users can access each chat room
     """
-    chat_room = get_object_or_404(ChatRoom, id=room_id)
+    chat_room = get_room_or_404(room_id)
     
-    # Debug logging
     print(f"DEBUG: User {request.user.username} (nationality: {request.user.nationality}) trying to access chat room {room_id}")
-    print(f"DEBUG: Chat room post: {chat_room.post}")
-    print(f"DEBUG: Chat room partner_request: {chat_room.partner_request}")
     
-    if chat_room.post:
-        print(f"DEBUG: Post japanese_user: {chat_room.post.japanese_user}")
-        print(f"DEBUG: Post vietnamese_user: {chat_room.post.vietnamese_user}")
-        print(f"DEBUG: Post japanese_partner: {chat_room.post.japanese_partner}")
-        print(f"DEBUG: Post vietnamese_partner: {chat_room.post.vietnamese_partner}")
-        print(f"DEBUG: Current user ID: {request.user.id}")
-        
-        # Check all possible user fields in the post
-        post_user_ids = []
-        if chat_room.post.japanese_user:
-            post_user_ids.append(chat_room.post.japanese_user.id)
-        if chat_room.post.vietnamese_user:
-            post_user_ids.append(chat_room.post.vietnamese_user.id)
-        if chat_room.post.japanese_partner:
-            post_user_ids.append(chat_room.post.japanese_partner.id)
-        if chat_room.post.vietnamese_partner:
-            post_user_ids.append(chat_room.post.vietnamese_partner.id)
-        
-        print(f"DEBUG: Post user IDs: {post_user_ids}")
-        print(f"DEBUG: Current user in post users: {request.user.id in post_user_ids}")
-        
-        if request.user.id not in post_user_ids:
-            print(f"DEBUG: Access denied - user not in post users")
-            messages.error(request, 'You do not have access to this chat room.')
-            return redirect('dashboard')
-    elif chat_room.partner_request:
-        print(f"DEBUG: Partner request requester: {chat_room.partner_request.requester}")
-        print(f"DEBUG: Partner request accepted_by: {chat_room.partner_request.accepted_by}")
-        print(f"DEBUG: Current user ID: {request.user.id}")
-        
-        # For partner requests, both the requester and the person who accepted can access
-        partner_request_user_ids = []
-        if chat_room.partner_request.requester:
-            partner_request_user_ids.append(chat_room.partner_request.requester.id)
-        if chat_room.partner_request.accepted_by:
-            partner_request_user_ids.append(chat_room.partner_request.accepted_by.id)
-        
-        print(f"DEBUG: Partner request user IDs: {partner_request_user_ids}")
-        print(f"DEBUG: Current user in partner request users: {request.user.id in partner_request_user_ids}")
-        
-        if request.user.id not in partner_request_user_ids:
-            print(f"DEBUG: Access denied - user not in partner request users")
-            messages.error(request, 'You do not have access to this chat room.')
-            return redirect('dashboard')
+    # Only the users linked to the post / partner request may enter
+    if not chat_room.has_participant(request.user.id):
+        print(f"DEBUG: Access denied - user not in chat room participants")
+        messages.error(request, 'You do not have access to this chat room.')
+        return redirect('dashboard')
     
     print(f"DEBUG: Access granted - proceeding to chat room")
     
-    # Additional debug info for template
-    if chat_room.post:
-        print(f"DEBUG: Template context - post: {chat_room.post}")
-        print(f"DEBUG: Template context - japanese_user: {chat_room.post.japanese_user}")
-        print(f"DEBUG: Template context - vietnamese_user: {chat_room.post.vietnamese_user}")
-        print(f"DEBUG: Template context - japanese_partner: {chat_room.post.japanese_partner}")
-        print(f"DEBUG: Template context - vietnamese_partner: {chat_room.post.vietnamese_partner}")
-        print(f"DEBUG: Template context - current user: {request.user}")
+    # Only the newest page is rendered; older history is fetched with get_messages?before_id=
+    messages_list, has_older_messages = chat_room.message_page()
+    read_up_to = chat_room.read_up_to_for(request.user)
     
-    messages_list = chat_room.messages.all()
+    # The rendered page is the head of the room: the user has now received every message
+    if messages_list and chat_room.mark_read(request.user, messages_list[-1].id):
+        broadcast_read(chat_room, request.user.id, messages_list[-1].id)
     
     context = {
         'chat_room': chat_room,
         'chat_messages': messages_list,
+        'has_older_messages': has_older_messages,
+        'read_up_to': read_up_to,
+        'max_send_batch_size': ChatRoom.MAX_SEND_BATCH_SIZE,
     }
     
     return render(request, 'chat_system/chat_room.html', context)
 
+@query_budget(8)
 @login_required
 def send_message(request, room_id):
     """Send a message via AJAX"""
@@ -102,43 +74,15 @@ def send_message(request, room_id):
     print(f"DEBUG: Request POST data: {request.POST}")
     
     if request.method == 'POST':
-        chat_room = get_object_or_404(ChatRoom, id=room_id)
+        chat_room = get_room_or_404(room_id)
         content = request.POST.get('content', '').strip()
         
-        print(f"DEBUG: Chat room found: {chat_room}")
         print(f"DEBUG: Content: '{content}'")
         
         # Check if user has access to this chat room
-        if chat_room.post:
-            print(f"DEBUG: Chat room has post: {chat_room.post}")
-            print(f"DEBUG: Post japanese_user: {chat_room.post.japanese_user}")
-            print(f"DEBUG: Post vietnamese_user: {chat_room.post.vietnamese_user}")
-            print(f"DEBUG: Post japanese_partner: {chat_room.post.japanese_partner}")
-            print(f"DEBUG: Post vietnamese_partner: {chat_room.post.vietnamese_partner}")
-            print(f"DEBUG: Current user: {request.user} (ID: {request.user.id})")
-            
-            # Check all possible user fields in the post
-            post_user_ids = []
-            if chat_room.post.japanese_user:
-                post_user_ids.append(chat_room.post.japanese_user.id)
-            if chat_room.post.vietnamese_user:
-                post_user_ids.append(chat_room.post.vietnamese_user.id)
-            if chat_room.post.japanese_partner:
-                post_user_ids.append(chat_room.post.japanese_partner.id)
-            if chat_room.post.vietnamese_partner:
-                post_user_ids.append(chat_room.post.vietnamese_partner.id)
-            
-            print(f"DEBUG: Post user IDs: {post_user_ids}")
-            print(f"DEBUG: Current user in post users: {request.user.id in post_user_ids}")
-            
-            if request.user.id not in post_user_ids:
-                print(f"DEBUG: Access denied - user not in post users")
-                return JsonResponse({'success': False, 'error': 'Access denied'})
-        elif chat_room.partner_request:
-            print(f"DEBUG: Chat room has partner request: {chat_room.partner_request}")
-            if request.user != chat_room.partner_request.requester and request.user != chat_room.partner_request.accepted_by:
-                print(f"DEBUG: Access denied - user not in partner request users")
-                return JsonResponse({'success': False, 'error': 'Access denied'})
+        if not chat_room.has_participant(request.user.id):
+            print(f"DEBUG: Access denied - user not in chat room participants")
+            return JsonResponse({'success': False, 'error': 'Access denied'})
         
         if content:
             print(f"DEBUG: Creating message with content: '{content}'")
@@ -151,12 +95,7 @@ def send_message(request, room_id):
             
             return JsonResponse({
                 'success': True,
-                'message': {
-                    'id': message.id,
-                    'content': message.content,
-                    'sender': message.sender.username,
-                    'timestamp': message.timestamp.strftime('%H:%M'),
-                }
+                'message': message.to_dict(request.user),
             })
         else:
             print(f"DEBUG: Content is empty")
@@ -164,217 +103,125 @@ def send_message(request, room_id):
     print(f"DEBUG: Returning failure response")
     return JsonResponse({'success': False, 'error': 'Invalid request or empty content'})
 
+@query_budget(11)
+@login_required
+def send_messages(request, room_id):
+    """
+    Send a batch of messages from the client outbox via AJAX
+    Body: {"messages": [{"client_id": "...", "content": "..."}, ...]}
+    Retrying a batch is safe: client ids already stored are acknowledged, not duplicated
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'}, status=405)
+    
+    chat_room = get_room_or_404(room_id)
+    if not chat_room.has_participant(request.user.id):
+        return JsonResponse({'success': False, 'error': 'Access denied'})
+    
+    try:
+        payload = json.loads(request.body)
+        items = [(str(item['client_id']), str(item['content']).strip()) for item in payload['messages']]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request body'}, status=400)
+    if not items or len(items) > ChatRoom.MAX_SEND_BATCH_SIZE:
+        return JsonResponse({'success': False, 'error': 'Invalid batch size'}, status=400)
+    if any(not client_id or len(client_id) > 64 or not content for client_id, content in items):
+        return JsonResponse({'success': False, 'error': 'Invalid request or empty content'}, status=400)
+    
+    stored, created = chat_room.add_messages(request.user, items)
+    transaction.on_commit(lambda: [broadcast_message(message) for message in created])
+    
+    return JsonResponse({
+        'success': True,
+        'messages': [message.to_dict(request.user) for message in stored],
+    })
+
+def parse_cursor(value):
+    """Parse an optional non-negative integer query parameter, raising ValueError if malformed"""
+    if value in (None, ''):
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+@query_budget(8)
 @login_required
 def get_messages(request, room_id):
-    """Get messages via AJAX for real-time updates"""
-    chat_room = get_object_or_404(ChatRoom, id=room_id)
+    """
+    Incremental message sync via AJAX
+    Fallback for clients that cannot keep a WebSocket open (see chat_system.consumers)
+    
+    Query parameters:
+    - since_id: only messages newer than this id (polling for the delta)
+    - before_id: only messages older than this id (loading history)
+    - limit: page size, capped at ChatRoom.MAX_MESSAGE_PAGE_SIZE
+    Answers 304 Not Modified when the client's ETag still matches the room's newest message.
+    """
+    chat_room = get_room_or_404(room_id)
     
     # Check access
-    if chat_room.post:
-        # Check all possible user fields in the post
-        post_user_ids = []
-        if chat_room.post.japanese_user:
-            post_user_ids.append(chat_room.post.japanese_user.id)
-        if chat_room.post.vietnamese_user:
-            post_user_ids.append(chat_room.post.vietnamese_user.id)
-        if chat_room.post.japanese_partner:
-            post_user_ids.append(chat_room.post.japanese_partner.id)
-        if chat_room.post.vietnamese_partner:
-            post_user_ids.append(chat_room.post.vietnamese_partner.id)
-        
-        if request.user.id not in post_user_ids:
-            return JsonResponse({'success': False, 'error': 'Access denied'})
-    elif chat_room.partner_request:
-        if request.user != chat_room.partner_request.requester and request.user != chat_room.partner_request.accepted_by:
-            return JsonResponse({'success': False, 'error': 'Access denied'})
-    
-    # Mark messages as read
-    chat_room.messages.filter(is_read=False).exclude(sender=request.user).update(is_read=True)
-    
-    # Get messages with better ordering and prefetch related
-    messages_list = chat_room.messages.select_related('sender').order_by('timestamp')
-    messages_data = []
-    
-    for message in messages_list:
-        messages_data.append({
-            'id': message.id,
-            'content': message.content,
-            'sender': message.sender.username,
-            'sender_name': message.sender.full_name or message.sender.username,
-            'timestamp': message.timestamp.strftime('%H:%M'),
-            'is_own': message.sender == request.user,
-            'is_read': message.is_read,
-        })
-    
-    return JsonResponse({
+    if not chat_room.has_participant(request.user.id):
+        return JsonResponse({'success': False, 'error': 'Access denied'})
+    
+    try:
+        since_id = parse_cursor(request.GET.get('since_id'))
+        before_id = parse_cursor(request.GET.get('before_id'))
+        limit = parse_cursor(request.GET.get('limit')) or ChatRoom.MESSAGE_PAGE_SIZE
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+    limit = min(limit, ChatRoom.MAX_MESSAGE_PAGE_SIZE)
+    
+    latest_id = chat_room.latest_message_id()
+    read_watermarks = chat_room.read_watermarks()
+    # How far the other side has read the user's messages (drives the double-check icons)
+    read_up_to = chat_room.read_up_to_for(request.user, read_watermarks)
+    
+    # Nothing new since the client's last response: skip the read UPDATE and serialization
+    etag = f'"{room_id}-{request.user.id}-{latest_id}-{read_up_to}-{since_id}-{before_id}-{limit}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    messages_list, has_more = chat_room.message_page(since_id=since_id, before_id=before_id, limit=limit)
+    
+    # Advance the read watermark only when the client now holds the room's newest message:
+    # this page delivers it, or it had it already (an empty poll from the head, since_id = latest).
+    # History pages (before_id) and pages cut short by limit leave unreceived messages unread
+    newest_delivered = messages_list[-1].id if messages_list else (since_id or 0)
+    if (before_id is None and not has_more and newest_delivered >= latest_id
+            and read_watermarks.get(request.user.id, latest_id) < latest_id):
+        chat_room.mark_read(request.user, latest_id)
+        read_watermarks[request.user.id] = latest_id
+        broadcast_read(chat_room, request.user.id, latest_id)
+    
+    messages_data = [message.to_dict(request.user, read_watermarks) for message in messages_list]
+    
+    response = JsonResponse({
         'success': True,
         'messages': messages_data,
+        'has_more': has_more,
+        'latest_id': latest_id,
+        'read_up_to': read_up_to,
         'room_id': room_id,
         'timestamp': timezone.now().isoformat()
     })
+    response['ETag'] = etag
+    return response
 
+@query_budget(5)
 @login_required
 def my_chats(request):
-    """Display user's chat rooms"""
-    # Get chat rooms where user is involved
-    chat_rooms = []
-    
-    # For LanguageExchangePost chats
-    if request.user.nationality == 'japanese':
-        # Japanese user's posts that have been accepted
-        accepted_posts = LanguageExchangePost.objects.filter(
-            japanese_user=request.user,
-            status='matched'
-        ).select_related('vietnamese_user', 'phrase', 'cafe_location')
-        
-        print(f"DEBUG: Found {accepted_posts.count()} accepted posts for Japanese user {request.user.username}")
-        
-        for post in accepted_posts:
-            print(f"DEBUG: Processing post {post.id}: japanese_user={post.japanese_user}, vietnamese_partner={post.vietnamese_partner}")
-            
-            try:
-                chat_room = ChatRoom.objects.get(post=post)
-                print(f"DEBUG: Found existing chat room {chat_room.id} for post {post.id}")
-                # Determine the correct partner for display
-                partner = post.vietnamese_user if post.vietnamese_user else post.vietnamese_partner
-                chat_rooms.append({
-                    'chat_room': chat_room,
-                    'type': 'post',
-                    'partner': partner,
-                    'title': f"Chat với {partner.full_name or partner.username}",
-                    'subtitle': f"Học: {post.phrase.vietnamese_text}",
-                    'last_message': chat_room.messages.last(),
-                    'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count(),
-                    'meeting_info': f"{post.cafe_location.name} - {post.meeting_date.strftime('%d/%m/%Y %H:%M')}"
-                })
-            except ChatRoom.DoesNotExist:
-                print(f"DEBUG: Creating new chat room for post {post.id}")
-                # Create missing chat room
-                chat_room = ChatRoom.objects.create(post=post)
-                print(f"DEBUG: Created chat room {chat_room.id} with post={chat_room.post}")
-                # Create welcome message
-                welcome_message = f"Xin chào! Tôi đã chấp nhận bài đăng của bạn. Hãy cùng trò chuyện và học tiếng Việt nhé!"
-                Message.objects.create(
-                    chat_room=chat_room,
-                    sender=partner,
-                    content=welcome_message
-                )
-                chat_rooms.append({
-                    'chat_room': chat_room,
-                    'type': 'post',
-                    'partner': partner,
-                    'title': f"Chat với {partner.full_name or partner.username}",
-                    'subtitle': f"Học: {post.phrase.vietnamese_text}",
-                    'last_message': chat_room.messages.last(),
-                    'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count(),
-                    'meeting_info': f"{post.cafe_location.name} - {post.meeting_date.strftime('%d/%m/%Y %H:%M')}"
-                })
-    else:
-        # Vietnamese user's accepted posts (posts created by Japanese users that Vietnamese user accepted)
-        accepted_posts = LanguageExchangePost.objects.filter(
-            japanese_user__isnull=False,  # Posts created by Japanese users
-            vietnamese_partner=request.user,  # Vietnamese user accepted these posts
-            status='matched'
-        ).select_related('japanese_user', 'phrase', 'cafe_location')
-        
-        print(f"DEBUG: Found {accepted_posts.count()} accepted posts for Vietnamese user {request.user.username}")
-        
-        for post in accepted_posts:
-            print(f"DEBUG: Processing post {post.id}: japanese_user={post.japanese_user}, vietnamese_partner={post.vietnamese_partner}")
-            
-            if post.japanese_user:  # Check if japanese_user exists
-                try:
-                    chat_room = ChatRoom.objects.get(post=post)
-                    print(f"DEBUG: Found existing chat room {chat_room.id} for post {post.id}")
-                    # Determine the correct partner for display
-                    partner = post.japanese_user if post.japanese_user else post.japanese_partner
-                    chat_rooms.append({
-                        'chat_room': chat_room,
-                        'type': 'post',
-                        'partner': partner,
-                        'title': f"Chat với {partner.full_name or partner.username}",
-                        'subtitle': f"Học: {post.phrase.vietnamese_text}",
-                        'last_message': chat_room.messages.last(),
-                        'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count(),
-                        'meeting_info': f"{post.cafe_location.name} - {post.meeting_date.strftime('%d/%m/%Y %H:%M')}"
-                    })
-                except ChatRoom.DoesNotExist:
-                    print(f"DEBUG: Creating new chat room for post {post.id}")
-                    # Create missing chat room
-                    chat_room = ChatRoom.objects.create(post=post)
-                    print(f"DEBUG: Created chat room {chat_room.id} with post={chat_room.post}")
-                    # Create welcome message
-                    welcome_message = f"Xin chào! Tôi đã chấp nhận bài đăng của bạn. Hãy cùng trò chuyện và học tiếng Việt nhé!"
-                    Message.objects.create(
-                        chat_room=chat_room,
-                        sender=request.user,
-                        content=welcome_message
-                    )
-                    chat_rooms.append({
-                        'chat_room': chat_room,
-                        'type': 'post',
-                        'partner': partner,
-                        'title': f"Chat với {partner.full_name or partner.username}",
-                        'subtitle': f"Học: {post.phrase.vietnamese_text}",
-                        'last_message': chat_room.messages.last(),
-                        'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count(),
-                        'meeting_info': f"{post.cafe_location.name} - {post.meeting_date.strftime('%d/%m/%Y %H:%M')}"
-                    })
-    
-    # For PartnerRequest chats
-    if request.user.nationality == 'japanese':
-        # Japanese users can see partner requests they accepted
-        partner_requests = PartnerRequest.objects.filter(
-            status='matched',
-            accepted_by=request.user
-        ).select_related('requester')
-        
-        for partner_request in partner_requests:
-            try:
-                chat_room = ChatRoom.objects.get(partner_request=partner_request)
-                chat_rooms.append({
-                    'chat_room': chat_room,
-                    'type': 'partner_request',
-                    'partner': partner_request.requester,
-                    'title': f"Partner Request: {partner_request.title}",
-                    'subtitle': f"Loại: {partner_request.get_request_type_display()}",
-                    'last_message': chat_room.messages.last(),
-                    'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count()
-                })
-            except ChatRoom.DoesNotExist:
-                pass
-    else:
-        # Vietnamese users can see their own partner requests that were accepted
-        partner_requests = PartnerRequest.objects.filter(
-            requester=request.user,
-            status='matched'
-        ).select_related('accepted_by')
-        
-        for partner_request in partner_requests:
-            try:
-                chat_room = ChatRoom.objects.get(partner_request=partner_request)
-                chat_rooms.append({
-                    'chat_room': chat_room,
-                    'type': 'partner_request',
-                    'partner': partner_request.accepted_by,
-                    'title': f"Partner Request: {partner_request.title}",
-                    'subtitle': f"Loại: {partner_request.get_request_type_display()}",
-                    'last_message': chat_room.messages.last(),
-                    'unread_count': chat_room.messages.filter(is_read=False).exclude(sender=request.user).count()
-                })
-            except ChatRoom.DoesNotExist:
-                pass
-    
-    # Sort by last message time
-    def get_sort_key(chat_info):
-        if chat_info['last_message']:
-            return chat_info['last_message'].timestamp
-        return chat_info['chat_room'].created_at
-    
-    chat_rooms.sort(key=get_sort_key, reverse=True)
+    """
+    Display user's chat rooms, most recent activity first
+    Built by chat_system.inbox from one query; missing rooms are repaired offline by reconcile_chat_rooms
+    """
+    chat_rooms, next_cursor = build_inbox(request.user, cursor=request.GET.get('cursor'))
     
     context = {
         'chat_rooms': chat_rooms,
+        'next_cursor': next_cursor,
     }
     
-    return render(request, 'chat_system/my_chats.html', context)
\ No newline at end of file
+    return render(request, 'chat_system/my_chats.html', context)
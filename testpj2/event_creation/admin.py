@@ -5,11 +5,15 @@ Provides Django admin interface for managing language exchange content:
 - Cafe locations for meetups
 - Language exchange posts
 - Partner requests
+- Previous-partner interactions
 - Lessons and lesson phrases
+Saving or deleting any part of a lesson recompiles its content bundle (event_creation.bundles)
 """
 
 from django.contrib import admin
-from .models import VietnamesePhrase, CafeLocation, LanguageExchangePost, PartnerRequest, Lesson, LessonPhrase, QuizQuestion, TheorySection, TheoryPhrase, ConversationExample, ConversationLine
+from django.db import transaction
+from .bundles import compile_bundles, lesson_id_for
+from .models import VietnamesePhrase, CafeLocation, LanguageExchangePost, PartnerRequest, PartnerInteraction, Lesson, LessonPhrase, QuizQuestion, TheorySection, TheoryPhrase, ConversationExample, ConversationLine
 
 @admin.register(VietnamesePhrase)
 class VietnamesePhraseAdmin(admin.ModelAdmin):
@@ -43,8 +47,39 @@ class PartnerRequestAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(PartnerInteraction)
+class PartnerInteractionAdmin(admin.ModelAdmin):
+    """Admin interface for inspecting the previous-partner graph"""
+    list_display = ['user', 'partner', 'match_count', 'completed_count', 'last_interaction_at']
+    search_fields = ['user__username', 'partner__username']
+    list_select_related = ['user', 'partner']
+
+class LessonBundleAdminMixin:
+    """Recompile the edited lessons' bundles once the admin change has committed"""
+
+    def recompile_bundles(self, lesson_ids):
+        lesson_ids = [lesson_id for lesson_id in lesson_ids if lesson_id is not None]
+        if lesson_ids:
+            # Registered after the signal handlers that drop the old bundles, so it runs after them
+            transaction.on_commit(lambda: compile_bundles(lesson_ids))
+
+    def save_related(self, request, form, formsets, change):
+        # Runs after save_model and the inlines, i.e. once the whole lesson tree is saved
+        super().save_related(request, form, formsets, change)
+        self.recompile_bundles([lesson_id_for(form.instance)])
+
+    def delete_model(self, request, obj):
+        lesson_id = None if isinstance(obj, Lesson) else lesson_id_for(obj)
+        super().delete_model(request, obj)
+        self.recompile_bundles([lesson_id])
+
+    def delete_queryset(self, request, queryset):
+        lesson_ids = set() if queryset.model is Lesson else {lesson_id_for(obj) for obj in queryset}
+        super().delete_queryset(request, queryset)
+        self.recompile_bundles(lesson_ids)
+
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing Vietnamese language lessons"""
     list_display = ['title', 'category', 'difficulty', 'created_at']
     list_filter = ['category', 'difficulty', 'created_at']
@@ -53,7 +88,7 @@ class LessonAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 @admin.register(LessonPhrase)
-class LessonPhraseAdmin(admin.ModelAdmin):
+class LessonPhraseAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing phrases within lessons"""
     list_display = ['lesson', 'vietnamese_text', 'japanese_translation', 'order']
     list_filter = ['lesson__category', 'lesson__difficulty', 'lesson']
@@ -62,7 +97,7 @@ class LessonPhraseAdmin(admin.ModelAdmin):
     list_select_related = ['lesson']  # Optimize database queries
 
 @admin.register(QuizQuestion)
-class QuizQuestionAdmin(admin.ModelAdmin):
+class QuizQuestionAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing quiz questions"""
     list_display = ['lesson', 'question', 'correct_answer', 'order', 'created_at']
     list_filter = ['lesson__category', 'lesson__difficulty', 'lesson']
@@ -82,7 +117,7 @@ class QuizQuestionAdmin(admin.ModelAdmin):
     )
 
 @admin.register(TheorySection)
-class TheorySectionAdmin(admin.ModelAdmin):
+class TheorySectionAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing theory sections"""
     list_display = ['lesson', 'title', 'order', 'created_at']
     list_filter = ['lesson__category', 'lesson__difficulty', 'lesson']
@@ -96,7 +131,7 @@ class TheorySectionAdmin(admin.ModelAdmin):
     )
 
 @admin.register(TheoryPhrase)
-class TheoryPhraseAdmin(admin.ModelAdmin):
+class TheoryPhraseAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing theory phrases"""
     list_display = ['theory_section', 'vietnamese_text', 'is_essential', 'order', 'created_at']
     list_filter = ['theory_section__lesson__category', 'is_essential', 'theory_section']
@@ -113,7 +148,7 @@ class TheoryPhraseAdmin(admin.ModelAdmin):
     )
 
 @admin.register(ConversationExample)
-class ConversationExampleAdmin(admin.ModelAdmin):
+class ConversationExampleAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing conversation examples"""
     list_display = ['theory_section', 'title', 'order', 'created_at']
     list_filter = ['theory_section__lesson__category', 'theory_section']
@@ -127,7 +162,7 @@ class ConversationExampleAdmin(admin.ModelAdmin):
     )
 
 @admin.register(ConversationLine)
-class ConversationLineAdmin(admin.ModelAdmin):
+class ConversationLineAdmin(LessonBundleAdminMixin, admin.ModelAdmin):
     """Admin interface for managing conversation lines"""
     list_display = ['conversation', 'speaker', 'vietnamese_text', 'order', 'created_at']
     list_filter = ['speaker', 'conversation__theory_section__lesson__category']
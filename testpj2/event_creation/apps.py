@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class EventCreationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'event_creation'
\ No newline at end of file
+    name = 'event_creation'
+    
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal handlers)
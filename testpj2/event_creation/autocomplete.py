@@ -0,0 +1,113 @@
+"""
+Phrase Autocomplete
+In-process prefix index over VietnamesePhrase for the phrase typeahead
+- Keys are the normalized Vietnamese and English texts from every word start and the
+  normalized Japanese text from every character, kept in one sorted list searched with bisect
+- Built lazily on the first lookup and rebuilt when the version of the PHRASES cache
+  namespace changes (bumped on every phrase save/delete), so a lookup costs one
+  cache read and never touches the database
+"""
+
+import threading
+from bisect import bisect_left
+from vietnam_japan_connect.normalization import normalize_vietnamese, normalize_japanese
+from .caches import PHRASES
+from .models import VietnamesePhrase
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Matching keys collected per lookup before ranking, bounds the cost of very short prefixes;
+# keys of phrases outside the category / difficulty filter do not count towards it
+MAX_CANDIDATES = 500
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def word_starts(text):
+    """Suffixes of a single-spaced normalized text starting at each word"""
+    return [text[i:] for i in range(len(text)) if i == 0 or text[i - 1] == ' ']
+
+
+class PhraseIndex:
+    """Sorted (key, phrase id, matches from the start of the text) entries plus the phrase payloads"""
+
+    def __init__(self, rows):
+        self.phrases = {}
+        entries = set()
+        for phrase_id, vietnamese, japanese, english, category, difficulty, vietnamese_key, japanese_key in rows:
+            self.phrases[phrase_id] = {
+                'id': phrase_id,
+                'vietnamese_text': vietnamese,
+                'japanese_translation': japanese,
+                'english_translation': english,
+                'category': category,
+                'difficulty': difficulty,
+            }
+            english_key = normalize_vietnamese(english)
+            for text, suffixes in (
+                (vietnamese_key, word_starts(vietnamese_key)),
+                (english_key, word_starts(english_key)),
+                (japanese_key, [japanese_key[i:] for i in range(len(japanese_key))]),
+            ):
+                for suffix in suffixes:
+                    entries.add((suffix, phrase_id, suffix == text))
+        entries = sorted(entries)
+        self.keys = [entry[0] for entry in entries]
+        self.entries = entries
+
+    @classmethod
+    def build(cls):
+        return cls(VietnamesePhrase.objects.values_list(
+            'id', 'vietnamese_text', 'japanese_translation', 'english_translation',
+            'category', 'difficulty', 'vietnamese_normalized', 'japanese_normalized',
+        ))
+
+    def lookup(self, query, limit=DEFAULT_LIMIT, category=None, difficulty=None):
+        """
+        Phrases with a word (or any Japanese character run) starting with the query
+        Whole-text prefix matches first, then shorter phrases
+        """
+        candidates = {}
+        for prefix in {normalize_vietnamese(query), normalize_japanese(query)}:
+            if not prefix:
+                continue
+            position = bisect_left(self.keys, prefix)
+            collected = 0
+            while position < len(self.keys) and collected < MAX_CANDIDATES and self.keys[position].startswith(prefix):
+                _, phrase_id, from_start = self.entries[position]
+                position += 1
+                # Filter while scanning: truncating first could fill the budget with other categories
+                phrase = self.phrases[phrase_id]
+                if category and phrase['category'] != category:
+                    continue
+                if difficulty and phrase['difficulty'] != difficulty:
+                    continue
+                candidates[phrase_id] = candidates.get(phrase_id, False) or from_start
+                collected += 1
+
+        results = [
+            (not from_start, len(self.phrases[phrase_id]['vietnamese_text']), phrase_id)
+            for phrase_id, from_start in candidates.items()
+        ]
+        results.sort()
+        return [self.phrases[phrase_id] for _, _, phrase_id in results[:limit]]
+
+
+def get_index():
+    """The current process's index, (re)built if missing or out of date"""
+    global _index
+    version = PHRASES.version()
+    current = _index
+    if current is not None and current[0] == version:
+        return current[1]
+    with _build_lock:
+        if _index is None or _index[0] != version:
+            _index = (version, PhraseIndex.build())
+        return _index[1]
+
+
+def suggest(query, limit=DEFAULT_LIMIT, category=None, difficulty=None):
+    if not query or not query.strip():
+        return []
+    return get_index().lookup(query, min(limit, MAX_LIMIT), category, difficulty)
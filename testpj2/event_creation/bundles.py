@@ -0,0 +1,166 @@
+"""
+Lesson Content Bundles
+Each lesson's whole tree (phrases, theory sections with their phrases, conversations and
+lines, quiz questions) compiled into one JSON document, stored in LessonBundle and cached
+- lesson_detail, theory_section_detail and lesson_quiz render straight from the bundle:
+  one cache read, or one primary key lookup on a cold cache, instead of a query per relation
+- Any change to the tree drops the lesson's bundle (event_creation.signals) and the next
+  read compiles it again; admin saves recompile right away, and
+  `manage.py compile_lesson_bundles` rebuilds them all (e.g. after seeding)
+- Bump BUNDLE_FORMAT when the document layout changes: older bundles are then ignored
+  and recompiled on their next read
+"""
+
+from django.db import transaction
+from django.db.models import Prefetch
+from .caches import BUNDLES
+from .models import (Lesson, LessonBundle, LessonPhrase, QuizQuestion, TheorySection, TheoryPhrase,
+                     ConversationExample, ConversationLine)
+
+BUNDLE_FORMAT = 1
+
+# Models whose rows are part of a lesson's bundle
+BUNDLE_MODELS = (Lesson, LessonPhrase, QuizQuestion, TheorySection, TheoryPhrase, ConversationExample, ConversationLine)
+
+
+def bundle_parts(lesson_id):
+    return (BUNDLE_FORMAT, lesson_id)
+
+
+def file_url(field_file):
+    return field_file.url if field_file else ''
+
+
+def phrase_data(phrase):
+    return {
+        'id': phrase.id,
+        'vietnamese_text': phrase.vietnamese_text,
+        'japanese_translation': phrase.japanese_translation,
+        'english_translation': phrase.english_translation,
+        'pronunciation_guide': phrase.pronunciation_guide,
+        'usage_note': phrase.usage_note,
+    }
+
+
+def lesson_content(lesson):
+    """The bundle document of a lesson fetched with every relation prefetched"""
+    return {
+        'lesson': {
+            'id': lesson.id,
+            'title': lesson.title,
+            'description': lesson.description,
+            'category': lesson.category,
+            'category_display': lesson.get_category_display(),
+            'difficulty': lesson.difficulty,
+            'difficulty_display': lesson.get_difficulty_display(),
+            'image_url': file_url(lesson.image),
+        },
+        'phrases': [
+            {**phrase_data(phrase), 'audio_url': file_url(phrase.audio_file)}
+            for phrase in lesson.phrases.all()
+        ],
+        'theory_sections': [
+            {
+                'id': section.id,
+                'title': section.title,
+                'description': section.description,
+                'phrases': [
+                    {**phrase_data(phrase), 'is_essential': phrase.is_essential}
+                    for phrase in section.phrases.all()
+                ],
+                'conversations': [
+                    {
+                        'id': conversation.id,
+                        'title': conversation.title,
+                        'description': conversation.description,
+                        'lines': [
+                            {
+                                'speaker': line.speaker,
+                                'speaker_display': line.get_speaker_display(),
+                                'vietnamese_text': line.vietnamese_text,
+                                'japanese_translation': line.japanese_translation,
+                                'english_translation': line.english_translation,
+                            }
+                            for line in conversation.lines.all()
+                        ],
+                    }
+                    for conversation in section.conversations.all()
+                ],
+            }
+            for section in lesson.theory_sections.all()
+        ],
+        'quiz_questions': [
+            {
+                'id': question.id,
+                'question': question.question,
+                'option_a': question.option_a,
+                'option_b': question.option_b,
+                'option_c': question.option_c,
+                'option_d': question.option_d,
+                'correct_answer': question.correct_answer,
+                'explanation': question.explanation,
+            }
+            for question in lesson.quiz_questions.all()
+        ],
+    }
+
+
+def compile_bundles(lesson_ids=None):
+    """
+    (Re)compile the bundles of the given lessons (all lessons when None) in a fixed number of
+    queries, store and cache them; returns {lesson id: content}
+    """
+    lessons = Lesson.objects.prefetch_related(
+        'phrases',
+        'quiz_questions',
+        Prefetch('theory_sections', queryset=TheorySection.objects.prefetch_related(
+            'phrases',
+            Prefetch('conversations', queryset=ConversationExample.objects.prefetch_related('lines')),
+        )),
+    )
+    if lesson_ids is not None:
+        lessons = lessons.filter(id__in=lesson_ids)
+    contents = {lesson.id: lesson_content(lesson) for lesson in lessons}
+
+    with transaction.atomic():
+        LessonBundle.objects.filter(lesson_id__in=list(contents)).delete()
+        LessonBundle.objects.bulk_create([
+            LessonBundle(lesson_id=lesson_id, format_version=BUNDLE_FORMAT, content=content)
+            for lesson_id, content in contents.items()
+        ])
+    transaction.on_commit(lambda: BUNDLES.set_many(
+        {bundle_parts(lesson_id): content for lesson_id, content in contents.items()}
+    ))
+    return contents
+
+
+def get_bundle(lesson_id):
+    """The lesson's bundle document, None if there is no such lesson"""
+    content = BUNDLES.get(*bundle_parts(lesson_id))
+    if content is not None:
+        return content
+    content = LessonBundle.objects.filter(
+        lesson_id=lesson_id, format_version=BUNDLE_FORMAT,
+    ).values_list('content', flat=True).first()
+    if content is None:
+        return compile_bundles([lesson_id]).get(lesson_id)
+    BUNDLES.set(bundle_parts(lesson_id), content)
+    return content
+
+
+def invalidate_bundle(lesson_id):
+    LessonBundle.objects.filter(lesson_id=lesson_id).delete()
+    BUNDLES.delete(*bundle_parts(lesson_id))
+
+
+def lesson_id_for(instance):
+    """Id of the lesson whose bundle contains this row (None if its parents are gone)"""
+    if isinstance(instance, Lesson):
+        return instance.id
+    if isinstance(instance, (LessonPhrase, QuizQuestion, TheorySection)):
+        return instance.lesson_id
+    if isinstance(instance, (TheoryPhrase, ConversationExample)):
+        return TheorySection.objects.filter(id=instance.theory_section_id).values_list('lesson_id', flat=True).first()
+    return ConversationExample.objects.filter(id=instance.conversation_id).values_list(
+        'theory_section__lesson_id', flat=True,
+    ).first()
@@ -0,0 +1,16 @@
+"""
+Cache namespaces for event_creation data (see vietnam_japan_connect.caching)
+Each one is dropped whenever one of its models changes (hooked up in event_creation.signals)
+"""
+
+from vietnam_japan_connect.caching import CacheNamespace
+
+POSTS = CacheNamespace('event_creation:posts', timeout=60)
+# Also tags the partner rankings (event_search.matching): bumped by partner request, partner
+# interaction and score-relevant profile changes
+PARTNER_REQUESTS = CacheNamespace('event_creation:partner_requests', timeout=3600)
+LESSONS = CacheNamespace('event_creation:lessons', timeout=3600)
+PHRASES = CacheNamespace('event_creation:phrases', timeout=3600)
+# Compiled lesson bundles (event_creation.bundles): single entries are replaced or deleted
+# as lessons are recompiled, the bundle format is part of the key
+BUNDLES = CacheNamespace('event_creation:lesson_bundles', timeout=86400)
@@ -0,0 +1,124 @@
+"""
+Geo Helpers
+Geohash spatial index for CafeLocation that works on SQLite:
+- Each cafe stores the geohash of its coordinates in an indexed column
+- A radius search covers its bounding box with a few geohash cells, reads each
+  cell as an index range scan, then refines the candidates with haversine
+"""
+
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5m cells, stored on CafeLocation.geohash
+EARTH_RADIUS_KM = 6371
+DEFAULT_RADIUS_KM = 5
+MAX_RADIUS_KM = 50  # Keeps the geohash cover to a handful of cells
+
+# Approximate city centres, used when only a user's city is known
+CITY_COORDINATES = {
+    'hanoi': (21.03, 105.85),
+    'haiphong': (20.86, 106.68),
+    'danang': (16.05, 108.20),
+    'hochiminh': (10.78, 106.70),
+    'cantho': (10.03, 105.78),
+}
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell"""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180 / 2 ** lat_bits, 360 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, map(float, (lat1, lon1, lat2, lon2)))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle"""
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    lon_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(latitude)), 1e-6)))
+    return (max(latitude - lat_delta, -90), min(latitude + lat_delta, 90),
+            max(longitude - lon_delta, -180), min(longitude + lon_delta, 180))
+
+
+def covering_cells(min_lat, max_lat, min_lon, max_lon):
+    """
+    Geohash prefixes covering the box, using the finest precision whose cells are
+    at least as large as the box, so the cover is at most 3x3 cells
+    """
+    height, width = max_lat - min_lat, max_lon - min_lon
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        cell_height, cell_width = cell_size(candidate)
+        if cell_height >= height and cell_width >= width:
+            precision = candidate
+            break
+    cell_height, cell_width = cell_size(precision)
+
+    cells = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            cells.add(encode_geohash(lat, lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + cell_width, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + cell_height, max_lat)
+    return sorted(cells)
+
+
+def prefix_range(prefix):
+    """[start, end) string range of every geohash starting with prefix (index friendly, unlike LIKE)"""
+    return prefix, prefix + '~'
+
+
+def parse_point(latitude, longitude):
+    """(lat, lon) as floats, or None if missing or out of range"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or math.isnan(latitude + longitude):
+        return None
+    return latitude, longitude
+
+
+def parse_radius(value):
+    """Search radius in km from the query string, DEFAULT_RADIUS_KM if missing or out of (0, MAX_RADIUS_KM]"""
+    try:
+        radius = float(value)
+    except (TypeError, ValueError):
+        return DEFAULT_RADIUS_KM
+    if not 0 < radius <= MAX_RADIUS_KM:
+        return DEFAULT_RADIUS_KM
+    return radius
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from event_creation.models import LanguageExchangePost, PartnerRequest, PartnerInteraction
+from event_search.feeds import invalidate_previous_partners
+from event_creation.caches import PARTNER_REQUESTS
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the previous-partner graph (PartnerInteraction) from matched and completed posts / partner requests'
+
+    def handle(self, *args, **options):
+        edges = {}
+
+        def add(user_id, partner_id, status, at):
+            if not user_id or not partner_id or user_id == partner_id:
+                return
+            # Same counts the live signal keeps (PartnerInteraction.record_status_change)
+            match_count, completed_count = PartnerInteraction.status_counts(status)
+            for pair in ((user_id, partner_id), (partner_id, user_id)):
+                edge = edges.setdefault(pair, {'match_count': 0, 'completed_count': 0, 'first': at, 'last': at})
+                edge['match_count'] += match_count
+                edge['completed_count'] += completed_count
+                edge['first'] = min(edge['first'], at)
+                edge['last'] = max(edge['last'], at)
+
+        counted_statuses = list(PartnerInteraction.STATUS_COUNTS)
+        posts = LanguageExchangePost.objects.filter(status__in=counted_statuses).values_list(
+            'user_type', 'japanese_user', 'vietnamese_user', 'japanese_partner', 'vietnamese_partner', 'status', 'updated_at',
+        )
+        for user_type, japanese_user, vietnamese_user, japanese_partner, vietnamese_partner, status, updated_at in posts:
+            if user_type == 'vietnamese':
+                add(vietnamese_user, japanese_partner, status, updated_at)
+            else:
+                add(japanese_user, vietnamese_partner, status, updated_at)
+
+        partner_requests = PartnerRequest.objects.filter(status__in=counted_statuses).values_list(
+            'requester', 'accepted_by', 'status', 'updated_at',
+        )
+        for requester, accepted_by, status, updated_at in partner_requests:
+            add(requester, accepted_by, status, updated_at)
+
+        with transaction.atomic():
+            PartnerInteraction.objects.all().delete()
+            PartnerInteraction.objects.bulk_create([
+                PartnerInteraction(
+                    user_id=user_id, partner_id=partner_id,
+                    match_count=edge['match_count'], completed_count=edge['completed_count'],
+                    first_interaction_at=edge['first'], last_interaction_at=edge['last'],
+                )
+                for (user_id, partner_id), edge in edges.items()
+            ], batch_size=500)
+        invalidate_previous_partners({user_id for user_id, _ in edges})
+        # bulk_create sends no signals: previous matches feed the partner rankings
+        PARTNER_REQUESTS.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled partner interactions: edges={len(edges)}"))
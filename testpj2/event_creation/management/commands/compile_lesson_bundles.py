@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from event_creation.bundles import BUNDLE_FORMAT, compile_bundles
+
+
+class Command(BaseCommand):
+    help = 'Compile the lesson content bundles served by the lesson, theory and quiz pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lesson_ids', nargs='*', type=int, help='Only compile these lessons')
+
+    def handle(self, *args, **options):
+        contents = compile_bundles(options['lesson_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Compiled {len(contents)} lesson bundles (format v{BUNDLE_FORMAT})'))
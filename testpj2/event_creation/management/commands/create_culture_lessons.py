@@ -168,18 +168,19 @@ class Command(BaseCommand):
             
             # Create phrases for this section
             for i, phrase_data in enumerate(lesson_data['phrases']):
-                phrase, created = TheoryPhrase.objects.get_or_create(
-                    theory_section=section,
-                    vietnamese_text=phrase_data[0],
-                    defaults={
-                        'japanese_translation': phrase_data[1],
-                        'english_translation': phrase_data[2],
-                        'pronunciation_guide': phrase_data[3],
-                        'usage_note': phrase_data[4],
-                        'is_essential': phrase_data[5],
-                        'order': i + 1
-                    }
-                )
+                phrase = TheoryPhrase.objects.same_text(phrase_data[0]).filter(theory_section=section).first()
+                created = phrase is None
+                if created:
+                    phrase = TheoryPhrase.objects.create(
+                        theory_section=section,
+                        vietnamese_text=phrase_data[0],
+                        japanese_translation=phrase_data[1],
+                        english_translation=phrase_data[2],
+                        pronunciation_guide=phrase_data[3],
+                        usage_note=phrase_data[4],
+                        is_essential=phrase_data[5],
+                        order=i + 1,
+                    )
                 
                 if created:
                     created_phrases += 1
@@ -177,15 +177,19 @@ class Command(BaseCommand):
         
         created_phrases = 0
         for category, difficulty, vietnamese, japanese, english in phrases_data:
-            phrase, created = VietnamesePhrase.objects.get_or_create(
-                category=category,
-                difficulty=difficulty,
-                vietnamese_text=vietnamese,
-                defaults={
-                    'japanese_translation': japanese,
-                    'english_translation': english,
-                }
-            )
+            # Not get_or_create: duplicates with the same normalized text would make it raise
+            phrase = VietnamesePhrase.objects.same_text(vietnamese).filter(
+                category=category, difficulty=difficulty,
+            ).first()
+            created = phrase is None
+            if created:
+                phrase = VietnamesePhrase.objects.create(
+                    category=category,
+                    difficulty=difficulty,
+                    vietnamese_text=vietnamese,
+                    japanese_translation=japanese,
+                    english_translation=english,
+                )
             
             if created:
                 created_phrases += 1
@@ -11,14 +11,16 @@ class Command(BaseCommand):
         self.stdout.write('Creating theory sections...')
         
         # Get or create a lesson for greetings
-        lesson, created = Lesson.objects.get_or_create(
-            category='greetings',
-            defaults={
-                'title': 'Chào hỏi cơ bản (Basic Greetings)',
-                'description': 'Học các câu chào hỏi cơ bản trong tiếng Việt',
-                'difficulty': 'beginner'
-            }
-        )
+        # Other seed commands add more greetings lessons: take the first one
+        lesson = Lesson.objects.filter(category='greetings').order_by('id').first()
+        created = lesson is None
+        if created:
+            lesson = Lesson.objects.create(
+                category='greetings',
+                title='Chào hỏi cơ bản (Basic Greetings)',
+                description='Học các câu chào hỏi cơ bản trong tiếng Việt',
+                difficulty='beginner',
+            )
         
         if created:
             self.stdout.write(f'Created lesson: {lesson.title}')
@@ -115,11 +117,12 @@ class Command(BaseCommand):
         ]
         
         for phrase_data in essential_phrases:
-            phrase, created = TheoryPhrase.objects.get_or_create(
+            phrase = TheoryPhrase.objects.same_text(phrase_data['vietnamese_text']).filter(
                 theory_section=theory_section,
-                vietnamese_text=phrase_data['vietnamese_text'],
-                defaults=phrase_data
-            )
+            ).first()
+            created = phrase is None
+            if created:
+                phrase = TheoryPhrase.objects.create(theory_section=theory_section, **phrase_data)
             if created:
                 self.stdout.write(f'Created phrase: {phrase.vietnamese_text}')
         
@@ -245,11 +248,12 @@ class Command(BaseCommand):
         ]
         
         for phrase_data in intro_phrases:
-            phrase, created = TheoryPhrase.objects.get_or_create(
+            phrase = TheoryPhrase.objects.same_text(phrase_data['vietnamese_text']).filter(
                 theory_section=intro_section,
-                vietnamese_text=phrase_data['vietnamese_text'],
-                defaults=phrase_data
-            )
+            ).first()
+            created = phrase is None
+            if created:
+                phrase = TheoryPhrase.objects.create(theory_section=intro_section, **phrase_data)
             if created:
                 self.stdout.write(f'Created phrase: {phrase.vietnamese_text}')
         
@@ -37,16 +37,15 @@ class Command(BaseCommand):
 
         created_phrases = 0
         for category, level, vi, ja, en in phrases:
-            _, created = VietnamesePhrase.objects.get_or_create(
-                category=category,
-                difficulty=level,
-                vietnamese_text=vi,
-                defaults={
-                    "japanese_translation": ja,
-                    "english_translation": en,
-                },
-            )
-            if created:
+            # Earlier runs may have left several rows with the same text: reuse the first
+            if not VietnamesePhrase.objects.same_text(vi).filter(category=category, difficulty=level).exists():
+                VietnamesePhrase.objects.create(
+                    category=category,
+                    difficulty=level,
+                    vietnamese_text=vi,
+                    japanese_translation=ja,
+                    english_translation=en,
+                )
                 created_phrases += 1
 
         locations = [
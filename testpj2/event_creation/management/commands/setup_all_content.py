@@ -63,6 +63,14 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'✗ Error seeding basic content: {e}'))
         
+        # Compile lesson content bundles
+        self.stdout.write('\n8. Compiling lesson content bundles...')
+        try:
+            call_command('compile_lesson_bundles')
+            self.stdout.write(self.style.SUCCESS('✓ Lesson bundles compiled successfully'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'✗ Error compiling lesson bundles: {e}'))
+        
         self.stdout.write(
             self.style.SUCCESS('\n🎉 All content setup completed! Users can now create posts with rich lesson content.')
         )
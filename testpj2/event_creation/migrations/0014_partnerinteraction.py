@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('event_creation', '0013_alter_vietnamesephrase_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartnerInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('match_count', models.PositiveIntegerField(default=0, help_text='Times the two users were matched')),
+                ('completed_count', models.PositiveIntegerField(default=0, help_text='Times an exchange between them was completed')),
+                ('first_interaction_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_interaction_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='partner_interactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_interaction_at'], name='partner_interaction_recent_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='partnerinteraction',
+            constraint=models.UniqueConstraint(fields=('user', 'partner'), name='unique_partner_interaction'),
+        ),
+    ]
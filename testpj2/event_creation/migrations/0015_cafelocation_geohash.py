@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+# Copy of event_creation.geo.encode_geohash as of this migration, so later edits to the live
+# module do not change the backfill
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    """Index the coordinates of existing cafes (historical models skip CafeLocation.save)"""
+    CafeLocation = apps.get_model('event_creation', 'CafeLocation')
+    cafes = list(CafeLocation.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for cafe in cafes:
+        cafe.geohash = encode_geohash(cafe.latitude, cafe.longitude)
+    CafeLocation.objects.bulk_update(cafes, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0014_partnerinteraction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cafelocation',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of the coordinates, maintained on save (spatial index)', max_length=12),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
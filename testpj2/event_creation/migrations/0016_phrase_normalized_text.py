@@ -0,0 +1,100 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:32
+
+import re
+import unicodedata
+from django.db import migrations, models
+
+PHRASE_MODELS = ['VietnamesePhrase', 'LessonPhrase', 'TheoryPhrase', 'ConversationLine']
+
+
+# Copy of vietnam_japan_connect.normalization as of this migration, so later edits to the live
+# module do not change the backfill
+def build_fold_table():
+    """Precomposed Latin letters -> base letter, stray combining marks dropped, katakana -> hiragana"""
+    table = {ord('đ'): 'd', ord('Đ'): 'D'}
+    for codepoint in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        char = chr(codepoint)
+        base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+        if base != char and len(base) == 1 and base.isascii():
+            table[codepoint] = base
+    for codepoint in range(0x0300, 0x0370):
+        table[codepoint] = None
+    table.update({codepoint: codepoint - 0x60 for codepoint in range(ord('ァ'), ord('ヶ') + 1)})
+    table[ord('ヽ')] = 'ゝ'
+    table[ord('ヾ')] = 'ゞ'
+    return table
+
+
+FOLD_TABLE = build_fold_table()
+NON_WORD = re.compile(r'[^0-9a-z々ぁ-ゟー㐀-䶿一-鿿豈-﫿]+')
+
+
+def normalize_vietnamese(text):
+    folded = unicodedata.normalize('NFKC', text or '').lower().translate(FOLD_TABLE)
+    return NON_WORD.sub(' ', folded).strip()
+
+
+def normalize_japanese(text):
+    return normalize_vietnamese(text).replace(' ', '')
+
+
+def fill_normalized_text(apps, schema_editor):
+    """Normalize existing rows (historical models skip NormalizedTextModel.save)"""
+    for model_name in PHRASE_MODELS:
+        model = apps.get_model('event_creation', model_name)
+        rows = list(model.objects.only('id', 'vietnamese_text', 'japanese_translation'))
+        for row in rows:
+            row.vietnamese_normalized = normalize_vietnamese(row.vietnamese_text)
+            row.japanese_normalized = normalize_japanese(row.japanese_translation)
+        model.objects.bulk_update(rows, ['vietnamese_normalized', 'japanese_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0015_cafelocation_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationline',
+            name='japanese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='japanese_translation folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='conversationline',
+            name='vietnamese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='vietnamese_text folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='lessonphrase',
+            name='japanese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='japanese_translation folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='lessonphrase',
+            name='vietnamese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='vietnamese_text folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='theoryphrase',
+            name='japanese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='japanese_translation folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='theoryphrase',
+            name='vietnamese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='vietnamese_text folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='vietnamesephrase',
+            name='japanese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='japanese_translation folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='vietnamesephrase',
+            name='vietnamese_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='vietnamese_text folded for lookups, maintained on save', max_length=300),
+        ),
+        migrations.RunPython(fill_normalized_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0016_phrase_normalized_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cafelocation',
+            index=models.Index(fields=['city'], name='cafe_location_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='languageexchangepost',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['cafe_location', 'user_type'], name='post_active_cafe_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partnerrequest',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['request_type', 'requester'], name='partner_request_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partnerrequest',
+            index=models.Index(fields=['requester', '-created_at'], name='partner_request_recent_idx'),
+        ),
+    ]
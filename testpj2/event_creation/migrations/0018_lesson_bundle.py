@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0017_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonBundle',
+            fields=[
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bundle', serialize=False, to='event_creation.lesson')),
+                ('format_version', models.PositiveIntegerField(help_text='event_creation.bundles.BUNDLE_FORMAT it was compiled with')),
+                ('content', models.JSONField()),
+                ('compiled_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
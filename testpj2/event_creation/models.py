@@ -4,12 +4,60 @@ This module contains models for creating language exchange events, lessons, and
 Handles Vietnamese phrases, cafe locations, language exchange posts, and lesson management.
 """
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
+from vietnam_japan_connect.normalization import normalize_vietnamese, normalize_japanese, prefix_range
+from . import geo
 
-class VietnamesePhrase(models.Model):
+class NormalizedTextQuerySet(models.QuerySet):
+    """Indexed lookups on the normalized shadow columns"""
+    
+    def same_text(self, vietnamese_text):
+        """Rows whose Vietnamese text matches ignoring case, tone marks and punctuation"""
+        return self.filter(vietnamese_normalized=normalize_vietnamese(vietnamese_text))
+    
+    def text_prefix(self, text):
+        """Rows whose Vietnamese or Japanese text starts with text (normalized), as index range scans"""
+        vietnamese, japanese = normalize_vietnamese(text), normalize_japanese(text)
+        condition = models.Q(pk__in=[])
+        if vietnamese:
+            start, end = prefix_range(vietnamese)
+            condition |= models.Q(vietnamese_normalized__gte=start, vietnamese_normalized__lt=end)
+        if japanese:
+            start, end = prefix_range(japanese)
+            condition |= models.Q(japanese_normalized__gte=start, japanese_normalized__lt=end)
+        return self.filter(condition)
+
+class NormalizedTextModel(models.Model):
+    """
+    Base for the phrase models: keeps normalized copies of vietnamese_text and
+    japanese_translation (vietnam_japan_connect.normalization) in indexed columns
+    """
+    vietnamese_normalized = models.CharField(max_length=300, blank=True, db_index=True, editable=False,
+                                             help_text="vietnamese_text folded for lookups, maintained on save")
+    japanese_normalized = models.CharField(max_length=300, blank=True, db_index=True, editable=False,
+                                           help_text="japanese_translation folded for lookups, maintained on save")
+    
+    objects = NormalizedTextQuerySet.as_manager()
+    
+    class Meta:
+        abstract = True
+    
+    def normalize_text(self):
+        self.vietnamese_normalized = normalize_vietnamese(self.vietnamese_text)
+        self.japanese_normalized = normalize_japanese(self.japanese_translation)
+    
+    def save(self, *args, **kwargs):
+        self.normalize_text()
+        if kwargs.get('update_fields') is not None and {'vietnamese_text', 'japanese_translation'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'vietnamese_normalized', 'japanese_normalized'}
+        super().save(*args, **kwargs)
+
+class VietnamesePhrase(NormalizedTextModel):
     """
     Vietnamese language phrases with Japanese and English translations
     Used by Japanese users to create language exchange posts
@@ -70,10 +118,55 @@ class CafeLocation(models.Model):
     # GPS coordinates for mapping (optional)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="GPS latitude")
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="GPS longitude")
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False,
+                               help_text="Geohash of the coordinates, maintained on save (spatial index)")
     description = models.TextField(blank=True, help_text="Additional details about the location")
     
+    class Meta:
+        indexes = [
+            # City filters on cafes, and the city -> cafes -> posts join of the available posts feed
+            models.Index(fields=['city'], name='cafe_location_city_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.city}"
+    
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        if kwargs.get('update_fields') is not None and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'geohash'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def nearby_candidates(cls, latitude, longitude, radius_km, queryset=None):
+        """Cafes in the geohash cells and bounding box around the circle (a superset of the result)"""
+        min_lat, max_lat, min_lon, max_lon = geo.bounding_box(latitude, longitude, radius_km)
+        cells = models.Q()
+        for prefix in geo.covering_cells(min_lat, max_lat, min_lon, max_lon):
+            start, end = geo.prefix_range(prefix)
+            cells |= models.Q(geohash__gte=start, geohash__lt=end)
+        return (queryset if queryset is not None else cls.objects.all()).filter(
+            cells,
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lon, max_lon),
+        )
+    
+    @classmethod
+    def nearby(cls, latitude, longitude, radius_km, limit=None, queryset=None):
+        """
+        Cafes within radius_km of a point as (cafe, distance_km) pairs, nearest first
+        Geohash cell ranges and a bounding box narrow the candidates in SQL, haversine does the rest
+        """
+        results = []
+        for cafe in cls.nearby_candidates(latitude, longitude, radius_km, queryset):
+            distance = geo.haversine_km(latitude, longitude, cafe.latitude, cafe.longitude)
+            if distance <= radius_km:
+                results.append((cafe, distance))
+        results.sort(key=lambda result: result[1])
+        return results[:limit] if limit else results
 
 class PartnerRequest(models.Model):
     """Model for users to find language exchange partners"""
@@ -120,6 +213,13 @@ class PartnerRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Partner matching pool: active requests of the acceptable types
+            models.Index(fields=['request_type', 'requester'], condition=models.Q(status='active'),
+                         name='partner_request_active_idx'),
+            # A user's own requests, newest first (my_partner_requests, matching preferences)
+            models.Index(fields=['requester', '-created_at'], name='partner_request_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.requester.username} - {self.title}"
@@ -156,6 +256,13 @@ class LanguageExchangePost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Available posts feed and dashboard: active posts of one user type at the cafes of a city
+            models.Index(fields=['cafe_location', 'user_type'], condition=models.Q(status='active'),
+                         name='post_active_cafe_type_idx'),
+        ]
+    
     @property
     def creator(self):
         """Get the user who created this post"""
@@ -220,6 +327,89 @@ class LanguageExchangePost(models.Model):
         phrase_text = self.phrase.vietnamese_text if self.phrase else "No phrase"
         return f"{creator_name} ({self.get_user_type_display()}) - {phrase_text}"
 
+class PartnerInteraction(models.Model):
+    """
+    Directed edge of the previous-partner graph: user has been matched with partner
+    Written once per direction when a post or partner request is matched or completed,
+    so ranking can join against it instead of walking chat rooms
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='partner_interactions')
+    partner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    match_count = models.PositiveIntegerField(default=0, help_text="Times the two users were matched")
+    completed_count = models.PositiveIntegerField(default=0, help_text="Times an exchange between them was completed")
+    first_interaction_at = models.DateTimeField(default=timezone.now)
+    last_interaction_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'partner'], name='unique_partner_interaction'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_interaction_at'], name='partner_interaction_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.partner_id} (matched {self.match_count}x)"
+    
+    # (match_count, completed_count) that one post / partner request in this status adds to its edge
+    # Shared by the live signal (record_status_change) and backfill_partner_interactions, so both count alike
+    STATUS_COUNTS = {'matched': (1, 0), 'completed': (1, 1)}
+    
+    @classmethod
+    def status_counts(cls, status):
+        return cls.STATUS_COUNTS.get(status, (0, 0))
+    
+    @classmethod
+    def record_status_change(cls, user_id, partner_id, previous_status, status, at=None):
+        """
+        Move the edge between two users (both directions) from what an exchange in previous_status
+        counted to what it counts in status, so the counts always match a backfill of the current statuses
+        Returns whether the edge changed
+        """
+        if not user_id or not partner_id or user_id == partner_id:
+            return False
+        previous, current = cls.status_counts(previous_status), cls.status_counts(status)
+        match_delta, completed_delta = current[0] - previous[0], current[1] - previous[1]
+        if not match_delta and not completed_delta:
+            return False
+        at = at or timezone.now()
+        pairs = ((user_id, partner_id), (partner_id, user_id))
+        
+        if match_delta < 0 or completed_delta < 0:
+            # Un-matched or un-completed (e.g. cancelled): take the counts back, drop edges left empty
+            for a, b in pairs:
+                cls.objects.filter(user_id=a, partner_id=b).update(
+                    match_count=Greatest(F('match_count') + match_delta, 0),
+                    completed_count=Greatest(F('completed_count') + completed_delta, 0),
+                )
+            cls.objects.filter(
+                models.Q(user_id=user_id, partner_id=partner_id) | models.Q(user_id=partner_id, partner_id=user_id),
+                match_count=0, completed_count=0,
+            ).delete()
+            return True
+        
+        for a, b in pairs:
+            updated = cls.objects.filter(user_id=a, partner_id=b).update(
+                match_count=F('match_count') + match_delta,
+                completed_count=F('completed_count') + completed_delta,
+                last_interaction_at=at,
+            )
+            if updated:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=a, partner_id=b, first_interaction_at=at, last_interaction_at=at,
+                                       match_count=match_delta, completed_count=completed_delta)
+            except IntegrityError:
+                # Created concurrently, count on top of it
+                cls.objects.filter(user_id=a, partner_id=b).update(
+                    match_count=F('match_count') + match_delta,
+                    completed_count=F('completed_count') + completed_delta,
+                    last_interaction_at=at,
+                )
+        return True
+
+
 class Lesson(models.Model):
     """Model for Vietnamese language lessons"""
     CATEGORY_CHOICES = [
@@ -256,7 +446,7 @@ class Lesson(models.Model):
         return f"{self.get_category_display()} - {self.title}"
 
 
-class LessonPhrase(models.Model):
+class LessonPhrase(NormalizedTextModel):
     """Model for phrases within a lesson"""
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='phrases')
     vietnamese_text = models.CharField(max_length=200)
@@ -311,7 +501,7 @@ class TheorySection(models.Model):
     def __str__(self):
         return f"{self.lesson.title} - {self.title}"
 
-class TheoryPhrase(models.Model):
+class TheoryPhrase(NormalizedTextModel):
     """Model for phrases in theory sections"""
     theory_section = models.ForeignKey(TheorySection, on_delete=models.CASCADE, related_name='phrases')
     vietnamese_text = models.CharField(max_length=200, help_text="Câu tiếng Việt")
@@ -343,7 +533,7 @@ class ConversationExample(models.Model):
     def __str__(self):
         return f"{self.theory_section.title} - {self.title}"
 
-class ConversationLine(models.Model):
+class ConversationLine(NormalizedTextModel):
     """Model for individual lines in conversation examples"""
     conversation = models.ForeignKey(ConversationExample, on_delete=models.CASCADE, related_name='lines')
     speaker = models.CharField(max_length=50, choices=[
@@ -362,4 +552,19 @@ class ConversationLine(models.Model):
         ordering = ['conversation', 'order']
     
     def __str__(self):
-        return f"{self.conversation.title} - {self.speaker} - Line {self.order}"
\ No newline at end of file
+        return f"{self.conversation.title} - {self.speaker} - Line {self.order}"
+
+
+class LessonBundle(models.Model):
+    """
+    Precompiled content of one lesson as a single JSON document: the lesson, its phrases,
+    theory sections (with their phrases, conversations and lines) and quiz questions
+    Built and served by event_creation.bundles, so lesson pages need no joins
+    """
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, primary_key=True, related_name='bundle')
+    format_version = models.PositiveIntegerField(help_text="event_creation.bundles.BUNDLE_FORMAT it was compiled with")
+    content = models.JSONField()
+    compiled_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Bundle for lesson {self.lesson_id} (format {self.format_version})"
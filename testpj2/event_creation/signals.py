@@ -0,0 +1,61 @@
+"""
+Event Creation Signals
+Keep the previous-partner edges (PartnerInteraction) in step with the status of posts
+and partner requests (counted as in PartnerInteraction.STATUS_COUNTS), drop the cache
+namespaces of event_creation.caches (phrase autocomplete index included) when their models change,
+and drop a lesson's content bundle (event_creation.bundles) when any part of it changes
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import LanguageExchangePost, PartnerRequest, PartnerInteraction, VietnamesePhrase, Lesson, LessonPhrase
+from . import caches, bundles
+
+@receiver(post_init, sender=LanguageExchangePost)
+@receiver(post_init, sender=PartnerRequest)
+def remember_status(sender, instance, **kwargs):
+    # Lets post_save tell a status transition apart from a re-save (new instances have no status yet)
+    instance._loaded_status = instance.status if instance.pk else None
+
+
+def record_transition(instance, user_id, partner_id):
+    previous = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if instance.status == previous:
+        return
+    if PartnerInteraction.record_status_change(user_id, partner_id, previous, instance.status):
+        # Written with update(), which sends no signals; previous matches feed the partner rankings
+        transaction.on_commit(caches.PARTNER_REQUESTS.invalidate)
+
+
+@receiver(post_save, sender=LanguageExchangePost)
+def record_post_interaction(sender, instance, **kwargs):
+    # Same pairing as LanguageExchangePost.creator / .partner, without loading the users
+    if instance.user_type == 'vietnamese':
+        record_transition(instance, instance.vietnamese_user_id, instance.japanese_partner_id)
+    else:
+        record_transition(instance, instance.japanese_user_id, instance.vietnamese_partner_id)
+
+
+@receiver(post_save, sender=PartnerRequest)
+def record_partner_request_interaction(sender, instance, **kwargs):
+    record_transition(instance, instance.requester_id, instance.accepted_by_id)
+
+
+caches.POSTS.invalidate_on(LanguageExchangePost)
+caches.PARTNER_REQUESTS.invalidate_on(PartnerRequest, PartnerInteraction)
+caches.LESSONS.invalidate_on(Lesson, LessonPhrase)
+caches.PHRASES.invalidate_on(VietnamesePhrase)
+
+
+def drop_lesson_bundle(sender, instance, **kwargs):
+    # The lesson is resolved now, while the row's parents still exist (cascades delete children first)
+    lesson_id = bundles.lesson_id_for(instance)
+    if lesson_id is not None:
+        transaction.on_commit(lambda: bundles.invalidate_bundle(lesson_id))
+
+
+for model in bundles.BUNDLE_MODELS:
+    post_save.connect(drop_lesson_bundle, sender=model, dispatch_uid=f'lesson_bundle_{model._meta.label}_save')
+    post_delete.connect(drop_lesson_bundle, sender=model, dispatch_uid=f'lesson_bundle_{model._meta.label}_delete')
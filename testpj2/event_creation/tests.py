@@ -1,3 +1,378 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from user_profile.models import CustomUser
+from chat_system.models import ChatRoom
+from vietnam_japan_connect.pagination import PAGE_SIZE, encode_cursor, decode_cursor, keyset_page
+from . import autocomplete, bundles, geo
+from .models import (CafeLocation, VietnamesePhrase, LanguageExchangePost, PartnerInteraction, PartnerRequest,
+                     Lesson, LessonPhrase, LessonBundle, TheorySection, TheoryPhrase, ConversationExample,
+                     ConversationLine, QuizQuestion)
 
-# Create your tests here.
+
+def make_user(username, nationality):
+    return CustomUser.objects.create_user(username, password='pw', nationality=nationality, city='hanoi',
+                                          gender='male', date_of_birth=date(1990, 1, 1))
+
+
+class EventCreationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.japanese = make_user('jp', 'japanese')
+        self.vietnamese = make_user('vn', 'vietnamese')
+        self.cafe = CafeLocation.objects.create(name='Cafe', address='Street', city='hanoi', latitude=21.03, longitude=105.85)
+        self.phrase = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                                                      japanese_translation='こんにちは', english_translation='Hello')
+
+    def make_post(self, status='active'):
+        return LanguageExchangePost.objects.create(
+            user_type='japanese', japanese_user=self.japanese, vietnamese_partner=self.vietnamese,
+            phrase=self.phrase, cafe_location=self.cafe, meeting_date=timezone.now() + timedelta(days=1), status=status,
+        )
+
+
+class PartnerInteractionTests(EventCreationTestCase):
+    def edges(self):
+        return sorted(PartnerInteraction.objects.values_list('user_id', 'partner_id', 'match_count', 'completed_count'))
+
+    def assert_backfill_agrees(self):
+        live = self.edges()
+        call_command('backfill_partner_interactions', stdout=StringIO())
+        self.assertEqual(self.edges(), live)
+        return live
+
+    def move(self, post, *statuses):
+        for status in statuses:
+            post.status = status
+            post.save()
+
+    def test_matched_then_completed(self):
+        self.move(self.make_post(), 'matched', 'completed')
+        self.assertEqual(self.assert_backfill_agrees(), [
+            (self.japanese.id, self.vietnamese.id, 1, 1),
+            (self.vietnamese.id, self.japanese.id, 1, 1),
+        ])
+
+    def test_created_completed(self):
+        self.make_post(status='completed')
+        self.assertEqual(len(self.assert_backfill_agrees()), 2)
+
+    def test_cancelled_after_match(self):
+        self.move(self.make_post(), 'matched', 'cancelled')
+        self.assertEqual(self.assert_backfill_agrees(), [])
+
+    def test_rematched(self):
+        post = self.make_post()
+        self.move(post, 'matched', 'active', 'matched')
+        self.move(self.make_post(), 'matched', 'completed')
+        self.assertEqual(self.assert_backfill_agrees(), [
+            (self.japanese.id, self.vietnamese.id, 2, 1),
+            (self.vietnamese.id, self.japanese.id, 2, 1),
+        ])
+
+
+class CursorPaginationTests(EventCreationTestCase):
+    def test_cursor_keeps_microseconds(self):
+        value = timezone.now().replace(microsecond=123456)
+        decoded = decode_cursor(encode_cursor([value, 5]))
+        self.assertEqual(LanguageExchangePost._meta.get_field('created_at').to_python(decoded[0]), value)
+
+    def test_tie_at_page_boundary(self):
+        # Three posts within the same millisecond, paged one at a time in my_posts order
+        base = timezone.now().replace(microsecond=500000)
+        posts = [self.make_post() for _ in range(3)]
+        for offset, post in enumerate(posts):
+            LanguageExchangePost.objects.filter(id=post.id).update(created_at=base + timedelta(microseconds=100 * offset))
+        seen, cursor = [], None
+        while True:
+            items, cursor = keyset_page(LanguageExchangePost.objects.all(), ['-created_at', '-id'], cursor, page_size=1)
+            seen += [post.id for post in items]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
+
+
+class PhraseListTests(EventCreationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.food = VietnamesePhrase.objects.create(category='food', difficulty='intermediate', vietnamese_text='Ngon quá',
+                                                    japanese_translation='おいしい', english_translation='Delicious')
+        self.client.force_login(self.japanese)
+
+    def listed(self, **params):
+        return [phrase.id for phrase in self.client.get(reverse('phrase_list'), params).context['phrases']]
+
+    def test_filters(self):
+        self.assertEqual(self.listed(category='food'), [self.food.id])
+        self.assertEqual(self.listed(difficulty='beginner'), [self.phrase.id])
+        self.assertEqual(self.listed(category='food', difficulty='beginner'), [])
+
+    def test_insertion_order(self):
+        later = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Tạm biệt',
+                                                japanese_translation='さようなら', english_translation='Bye')
+        # An older row with a higher id still comes first
+        older = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Cảm ơn',
+                                                japanese_translation='ありがとう', english_translation='Thanks')
+        VietnamesePhrase.objects.filter(id=older.id).update(created_at=later.created_at - timedelta(days=1))
+        self.assertEqual(self.listed(), [older.id, self.phrase.id, self.food.id, later.id])
+
+    def test_infinite_scroll(self):
+        VietnamesePhrase.objects.bulk_create([
+            VietnamesePhrase(category='daily', difficulty='beginner', vietnamese_text=f'Câu {i}',
+                             japanese_translation='文', english_translation='Sentence')
+            for i in range(PAGE_SIZE)
+        ])
+        response = self.client.get(reverse('phrase_list'))
+        self.assertEqual(len(response.context['phrases']), PAGE_SIZE)
+        data = self.client.get(reverse('phrase_list'), {'cursor': response.context['next_cursor'], 'format': 'json'})
+        data = data.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['html'].count('Câu '), 2)
+
+
+class LessonListTests(EventCreationTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, category in enumerate(['greetings', 'greetings', 'food']):
+            lesson = Lesson.objects.create(title=f'Lesson {i}', description='d', category=category, difficulty='beginner')
+            for j in range(i):
+                LessonPhrase.objects.create(lesson=lesson, vietnamese_text=f'Câu {j}', japanese_translation='文',
+                                            english_translation='Sentence')
+        self.client.force_login(self.japanese)
+
+    def test_cards_carry_phrase_counts(self):
+        response = self.client.get(reverse('lessons'))
+        self.assertEqual([(lesson.title, lesson.phrase_count) for lesson in response.context['lessons']],
+                         [('Lesson 2', 2), ('Lesson 0', 0), ('Lesson 1', 1)])
+        response = self.client.get(reverse('lessons'), {'category': 'greetings'})
+        self.assertEqual([lesson.title for lesson in response.context['lessons']], ['Lesson 0', 'Lesson 1'])
+
+    def test_lesson_cursor_is_validated(self):
+        url = reverse('lessons')
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': encode_cursor(['beginner', 'greetings'])}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'category': 'bogus'}).status_code, 400)
+
+        first = Lesson.objects.get(title='Lesson 0')
+        values = ['beginner', 'greetings', first.title]
+        # The same position spelled with a string or a number id gives the same page
+        for cursor in (encode_cursor(values + [first.id]), encode_cursor(values + [str(first.id)])):
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual([lesson.title for lesson in response.context['lessons']], ['Lesson 1'])
+
+
+class MyPostsTests(EventCreationTestCase):
+    def test_own_posts_newest_first(self):
+        # Enough matched cards that a per-card room lookup would blow the view's query budget
+        posts = [self.make_post()] + [self.make_post(status='matched') for _ in range(4)]
+        for post in posts[1:]:
+            ChatRoom.objects.create(post=post)
+        LanguageExchangePost.objects.create(
+            user_type='vietnamese', vietnamese_user=self.vietnamese, phrase=self.phrase, cafe_location=self.cafe,
+            meeting_date=timezone.now() + timedelta(days=1),
+        )
+        self.client.force_login(self.japanese)
+        response = self.client.get(reverse('my_posts'))
+        self.assertEqual([post.id for post in response.context['posts']], [post.id for post in reversed(posts)])
+        self.assertContains(response, reverse('chat_room', args=[posts[-1].chatroom.id]))
+        self.assertEqual((response.context['total_posts_count'], response.context['matched_posts_count'],
+                          response.context['active_posts_count']), (5, 4, 1))
+
+
+class MyPartnerRequestsTests(EventCreationTestCase):
+    def test_own_requests_only(self):
+        fields = {'request_type': 'both', 'description': 'Looking for a partner', 'preferred_city': 'hanoi',
+                  'meeting_preference': 'online', 'frequency': 'flexible'}
+        PartnerRequest.objects.create(requester=self.japanese, title='Mine', **fields)
+        PartnerRequest.objects.create(requester=self.vietnamese, title='Theirs', **fields)
+        self.client.force_login(self.japanese)
+        response = self.client.get(reverse('my_partner_requests'))
+        self.assertEqual([request.title for request in response.context['partner_requests']], ['Mine'])
+
+
+class NearbyCafeTests(EventCreationTestCase):
+    def setUp(self):
+        super().setUp()
+        # Around Hoan Kiem lake, plus cafes in the bounding box corner and in Da Nang
+        points = [(21.0285, 105.8542), (21.0300, 105.8600), (21.0450, 105.8400), (21.0700, 105.8900),
+                  (21.0800, 105.9100), (16.0500, 108.2000)]
+        for i, (latitude, longitude) in enumerate(points):
+            CafeLocation.objects.create(name=f'Cafe {i}', address='Street', city='hanoi',
+                                        latitude=latitude, longitude=longitude)
+
+    def test_geohash_follows_coordinates(self):
+        self.assertEqual(self.cafe.geohash, geo.encode_geohash(21.03, 105.85))
+        self.assertEqual(geo.encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.cafe.latitude = 16.05
+        self.cafe.save(update_fields=['latitude'])
+        self.cafe.refresh_from_db()
+        self.assertEqual(self.cafe.geohash, geo.encode_geohash(16.05, 105.85))
+
+    def test_nearby_matches_a_full_scan(self):
+        center = (21.0285, 105.8542)
+        for radius in (0.5, 2, 5, 50):
+            expected = sorted(
+                (geo.haversine_km(*center, cafe.latitude, cafe.longitude), cafe.id)
+                for cafe in CafeLocation.objects.all()
+                if geo.haversine_km(*center, cafe.latitude, cafe.longitude) <= radius
+            )
+            found = CafeLocation.nearby(*center, radius)
+            self.assertEqual([cafe.id for cafe, _ in found], [cafe_id for _, cafe_id in expected], radius)
+
+    def test_partner_city_lookup(self):
+        self.client.force_login(self.japanese)
+        url = reverse('nearby_cafes')
+        # Not a partner (yet): the city of an arbitrary user id is not disclosed
+        self.assertEqual(self.client.get(url, {'user_id': self.vietnamese.id}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'user_id': 999}).status_code, 404)
+        self.make_post(status='matched')
+        response = self.client.get(url, {'user_id': self.vietnamese.id})
+        self.assertEqual(response.json()['center'], {'latitude': 21.03, 'longitude': 105.85})
+        self.client.force_login(self.vietnamese)
+        self.assertEqual(self.client.get(url, {'user_id': self.japanese.id}).status_code, 200)
+
+    def test_accepted_partner_request_lookup(self):
+        PartnerRequest.objects.create(requester=self.vietnamese, accepted_by=self.japanese, status='active',
+                                      request_type='vietnamese_to_japanese', title='Partner', description='Hi',
+                                      preferred_city='hanoi', meeting_preference='offline', frequency='weekly')
+        self.client.force_login(self.vietnamese)
+        self.assertEqual(self.client.get(reverse('nearby_cafes'), {'user_id': self.japanese.id}).status_code, 200)
+
+    def test_view_around_a_cafe(self):
+        self.client.force_login(self.japanese)
+        response = self.client.get(reverse('nearby_cafes'), {'cafe_id': self.cafe.id, 'radius': 0.2})
+        self.assertEqual([cafe['id'] for cafe in response.json()['cafes']], [self.cafe.id])
+        self.assertEqual(self.client.get(reverse('nearby_cafes')).status_code, 400)
+
+    def test_nearby_limit(self):
+        found = CafeLocation.nearby(21.0285, 105.8542, 10, limit=2)
+        self.assertEqual([cafe.name for cafe, _ in found], ['Cafe 0', 'Cafe'])
+
+
+class SeedCommandTests(TestCase):
+    def test_reseeding_tolerates_duplicate_rows(self):
+        # Rows of the same text left behind by earlier seeding, differing only in punctuation
+        for text in ('Tôi cần gặp bác sĩ.', 'Tôi cần gặp bác sĩ!'):
+            VietnamesePhrase.objects.create(category='emergency', difficulty='intermediate', vietnamese_text=text,
+                                            japanese_translation='医者', english_translation='Doctor')
+        call_command('seed_content', stdout=StringIO())
+        count = VietnamesePhrase.objects.count()
+        call_command('seed_content', stdout=StringIO())
+        self.assertEqual(VietnamesePhrase.objects.count(), count)
+        self.assertEqual(VietnamesePhrase.objects.same_text('Tôi cần gặp bác sĩ').count(), 2)
+
+
+class PhraseAutocompleteTests(EventCreationTestCase):
+    def add_phrase(self, vietnamese, category='travel', difficulty='beginner', english='Phrase'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return VietnamesePhrase.objects.create(category=category, difficulty=difficulty, vietnamese_text=vietnamese,
+                                                   japanese_translation='句', english_translation=english)
+
+    def texts(self, query, **kwargs):
+        return [phrase['vietnamese_text'] for phrase in autocomplete.suggest(query, **kwargs)]
+
+    def test_word_prefixes(self):
+        self.add_phrase('Chào buổi sáng')
+        # Matches from the start of the text rank first
+        self.assertEqual(self.texts('chao'), ['Chào buổi sáng', 'Xin chào!'])
+        self.assertEqual(self.texts('buoi'), ['Chào buổi sáng'])
+        # Only word starts match, not the middle of a word
+        self.assertEqual(self.texts('hao'), [])
+
+    def test_folding(self):
+        self.assertEqual(self.texts('XIN CHÀO'), ['Xin chào!'])
+        self.assertEqual(self.texts('xin chao'), ['Xin chào!'])
+        # Katakana finds the hiragana translation, and English is indexed too
+        self.assertEqual(self.texts('コンニチ'), ['Xin chào!'])
+        self.assertEqual(self.texts('hel'), ['Xin chào!'])
+
+    def test_view(self):
+        self.client.force_login(self.japanese)
+        response = self.client.get(reverse('phrase_autocomplete'), {'q': 'xin chao', 'limit': 'many'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [self.phrase.id])
+        self.assertEqual(self.client.get(reverse('phrase_autocomplete'), {'q': ' '}).json()['results'], [])
+
+    def test_filter_applies_before_the_candidate_cap(self):
+        for i in range(5):
+            self.add_phrase(f'Xin a {i}')
+        self.add_phrase('Xin z', category='food', difficulty='advanced')
+        with mock.patch.object(autocomplete, 'MAX_CANDIDATES', 3):
+            # The food phrase sorts after every travel key the cap lets through
+            self.assertEqual(self.texts('xin', category='food'), ['Xin z'])
+            self.assertEqual(self.texts('xin', difficulty='advanced'), ['Xin z'])
+            self.assertEqual(self.texts('xin', category='travel', difficulty='advanced'), [])
+        self.assertEqual(self.texts('xin', category='travel', limit=2), ['Xin a 0', 'Xin a 1'])
+        self.assertEqual(len(self.texts('xin', limit=100)), 7)
+
+
+class LessonBundleTests(EventCreationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.create(title='Chào hỏi', description='Greetings', category='greetings',
+                                            difficulty='beginner')
+        self.phrase = LessonPhrase.objects.create(lesson=self.lesson, vietnamese_text='Xin chào',
+                                                  japanese_translation='こんにちは', english_translation='Hello')
+        section = TheorySection.objects.create(lesson=self.lesson, title='Theory', description='Basics')
+        TheoryPhrase.objects.create(theory_section=section, vietnamese_text='Cảm ơn', japanese_translation='ありがとう',
+                                    english_translation='Thank you', is_essential=True)
+        self.conversation = ConversationExample.objects.create(theory_section=section, title='At a cafe',
+                                                               description='Ordering')
+        self.line = ConversationLine.objects.create(conversation=self.conversation, speaker='person_a',
+                                                    vietnamese_text='Cho tôi một ly cà phê',
+                                                    japanese_translation='コーヒーを一杯ください',
+                                                    english_translation='A coffee please')
+        QuizQuestion.objects.create(lesson=self.lesson, question='Hello?', option_a='Xin chào', option_b='Cảm ơn',
+                                    option_c='Tạm biệt', option_d='Vâng', correct_answer='A')
+        cache.clear()
+
+    def test_bundle_holds_the_lesson_tree(self):
+        bundle = bundles.get_bundle(self.lesson.id)
+        self.assertEqual(bundle['lesson']['title'], 'Chào hỏi')
+        self.assertEqual([phrase['vietnamese_text'] for phrase in bundle['phrases']], ['Xin chào'])
+        section = bundle['theory_sections'][0]
+        self.assertTrue(section['phrases'][0]['is_essential'])
+        self.assertEqual(section['conversations'][0]['lines'][0]['speaker_display'], 'PERSON A')
+        self.assertEqual(bundle['quiz_questions'][0]['correct_answer'], 'A')
+        self.assertIsNone(bundles.get_bundle(self.lesson.id + 1))
+
+    def test_bundle_is_read_without_relation_queries(self):
+        bundles.get_bundle(self.lesson.id)
+        cache.clear()
+        with self.assertNumQueries(1):  # The stored bundle, by primary key
+            bundles.get_bundle(self.lesson.id)
+        with self.assertNumQueries(0):
+            bundles.get_bundle(self.lesson.id)
+
+    def test_change_anywhere_in_the_tree_drops_the_bundle(self):
+        bundles.get_bundle(self.lesson.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.line.vietnamese_text = 'Cho tôi một ly trà'
+            self.line.save()
+        self.assertFalse(LessonBundle.objects.filter(lesson=self.lesson).exists())
+        section = bundles.get_bundle(self.lesson.id)['theory_sections'][0]
+        self.assertEqual(section['conversations'][0]['lines'][0]['vietnamese_text'], 'Cho tôi một ly trà')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.phrase.delete()
+        self.assertEqual(bundles.get_bundle(self.lesson.id)['phrases'], [])
+
+    def test_old_format_is_recompiled(self):
+        bundles.compile_bundles([self.lesson.id])
+        LessonBundle.objects.update(format_version=bundles.BUNDLE_FORMAT - 1, content={})
+        cache.clear()
+        self.assertEqual(bundles.get_bundle(self.lesson.id)['lesson']['title'], 'Chào hỏi')
+        self.assertEqual(LessonBundle.objects.get(lesson=self.lesson).format_version, bundles.BUNDLE_FORMAT)
+
+    def test_lesson_pages(self):
+        self.client.force_login(self.japanese)
+        response = self.client.get(reverse('lesson_detail', args=[self.lesson.id]))
+        self.assertEqual(response.context['phrases'][0]['id'], self.phrase.id)
+        section_id = self.conversation.theory_section_id
+        response = self.client.get(reverse('theory_section_detail', args=[self.lesson.id, section_id]))
+        self.assertContains(response, 'ありがとう')
+        self.assertEqual(self.client.get(reverse('lesson_quiz', args=[self.lesson.id + 1])).status_code, 404)
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('phrases/', views.phrase_list, name='phrase_list'),
+    path('phrases/autocomplete/', views.phrase_autocomplete, name='phrase_autocomplete'),
     path('lessons/', views.lessons, name='lessons'),
     path('theory-sections/', views.all_theory_sections, name='all_theory_sections'),
     path('lesson/<int:lesson_id>/', views.lesson_detail, name='lesson_detail'),
@@ -15,6 +16,7 @@ urlpatterns = [
     path('accept-post/<int:post_id>/phrases/', views.phrase_list, name='phrase_list'),
     path('accept-post/<int:post_id>/<int:phrase_id>/', views.accept_post, name='accept_post'),
     path('cancel-accept-post/<int:post_id>/', views.cancel_accept_post, name='cancel_accept_post'),
+    path('cafes/nearby/', views.nearby_cafes, name='nearby_cafes'),
     
     # Partner request URLs
     path('create-partner-request/', views.create_partner_request, name='create_partner_request'),
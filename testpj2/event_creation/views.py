@@ -8,15 +8,21 @@ Handles creation and management of language exchange content:
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.utils import timezone
-from django.db.models import Q
-from .models import VietnamesePhrase, CafeLocation, LanguageExchangePost, PartnerRequest, Lesson, LessonPhrase, QuizQuestion, TheorySection
+from django.db.models import Q, Count, Exists, OuterRef
+from . import autocomplete, bundles, caches, geo
+from .models import VietnamesePhrase, CafeLocation, LanguageExchangePost, PartnerRequest, PartnerInteraction, Lesson, LessonPhrase, QuizQuestion, TheorySection
 from .forms import LanguageExchangePostForm, PartnerRequestForm
 from chat_system.models import ChatRoom, Message
+from vietnam_japan_connect.pagination import (keyset_page, decode_cursor, parse_cursor_values, wants_json,
+                                              page_response)
+from vietnam_japan_connect.metrics import query_budget
 
+@query_budget(5)
 @login_required
 def phrase_list(request, post_id=None):
     """
@@ -36,9 +42,17 @@ def phrase_list(request, post_id=None):
     if difficulty:
         phrases = phrases.filter(difficulty=difficulty)
     
+    # The page never had an ORDER BY and listed phrases in insertion order: keep creation
+    # time as the leading key, id breaks ties
+    phrases, next_cursor = keyset_page(phrases, ['created_at', 'id'], request.GET.get('cursor'))
+    if wants_json(request):
+        return page_response(request, 'event_creation/includes/phrase_cards.html',
+                             {'phrases': phrases, 'post_id': post_id}, next_cursor)
+    
     context = {
         'post_id': post_id,
         'phrases': phrases,
+        'next_cursor': next_cursor,
         'categories': VietnamesePhrase.CATEGORY_CHOICES,
         'difficulties': VietnamesePhrase.DIFFICULTY_CHOICES,
         'selected_category': category,
@@ -47,6 +61,30 @@ def phrase_list(request, post_id=None):
     
     return render(request, 'event_creation/phrase_list.html', context)
 
+@query_budget(4)
+@login_required
+def phrase_autocomplete(request):
+    """
+    Phrase suggestions as JSON for the typeahead on phrase_list
+    ?q= prefix in Vietnamese, Japanese or English; optional ?category=, ?difficulty=, ?limit=
+    Served from the in-process index (event_creation.autocomplete), no database query
+    """
+    try:
+        limit = int(request.GET.get('limit', autocomplete.DEFAULT_LIMIT))
+    except ValueError:
+        limit = autocomplete.DEFAULT_LIMIT
+    results = autocomplete.suggest(
+        request.GET.get('q', ''),
+        limit=max(limit, 1),
+        category=request.GET.get('category') or None,
+        difficulty=request.GET.get('difficulty') or None,
+    )
+    return JsonResponse({'success': True, 'results': results})
+
+# Same order as Lesson.Meta.ordering, with id to make the cursor unique
+LESSON_ORDERING = ['difficulty', 'category', 'title', 'id']
+
+@query_budget(5)
 @login_required
 def lessons(request):
     """Display Vietnamese language lessons"""
@@ -55,16 +93,34 @@ def lessons(request):
     
     category = request.GET.get('category', '')
     difficulty = request.GET.get('difficulty', '')
-    
-    lessons = Lesson.objects.all()
+    cursor = request.GET.get('cursor')
+    # Pages are cached per filter and cursor: refuse values that could only fill the cache
+    after = parse_cursor_values(Lesson, LESSON_ORDERING, decode_cursor(cursor))
+    if cursor and after is None:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
+    if (category and category not in dict(Lesson.CATEGORY_CHOICES)
+            or difficulty and difficulty not in dict(Lesson.DIFFICULTY_CHOICES)):
+        return JsonResponse({'success': False, 'error': 'Invalid filter'}, status=400)
+    
+    # Phrase count for the cards in the same query (was three COUNTs per card)
+    lessons = Lesson.objects.annotate(phrase_count=Count('phrases'))
     
     if category:
         lessons = lessons.filter(category=category)
     if difficulty:
         lessons = lessons.filter(difficulty=difficulty)
     
+    # Keyed on the decoded cursor, so every spelling of the same position shares one entry
+    lessons, next_cursor = caches.LESSONS.get_or_set(
+        ('page', category, difficulty, *(after or ())),
+        lambda: keyset_page(lessons, LESSON_ORDERING, after=after),
+    )
+    if wants_json(request):
+        return page_response(request, 'event_creation/includes/lesson_cards.html', {'lessons': lessons}, next_cursor)
+    
     context = {
         'lessons': lessons,
+        'next_cursor': next_cursor,
         'categories': Lesson.CATEGORY_CHOICES,
         'difficulties': Lesson.DIFFICULTY_CHOICES,
         'selected_category': category,
@@ -73,6 +129,13 @@ def lessons(request):
     
     return render(request, 'event_creation/lessons.html', context)
 
+def get_lesson_bundle(lesson_id):
+    """The lesson's precompiled content (event_creation.bundles), 404 if there is no such lesson"""
+    bundle = bundles.get_bundle(lesson_id)
+    if bundle is None:
+        raise Http404('No such lesson')
+    return bundle
+
 @login_required
 def lesson_detail(request, lesson_id):
     """Display lesson detail with phrases, theory sections, and quiz questions"""
@@ -82,16 +145,13 @@ def lesson_detail(request, lesson_id):
     # if request.user.nationality != 'japanese':
     #     return redirect('dashboard')
     
-    lesson = get_object_or_404(Lesson, id=lesson_id)
-    phrases = lesson.phrases.all()
-    theory_sections = lesson.theory_sections.all()
-    quiz_questions = lesson.quiz_questions.all()
+    bundle = get_lesson_bundle(lesson_id)
     
     context = {
-        'lesson': lesson,
-        'phrases': phrases,
-        'theory_sections': theory_sections,
-        'quiz_questions': quiz_questions,
+        'lesson': bundle['lesson'],
+        'phrases': bundle['phrases'],
+        'theory_sections': bundle['theory_sections'],
+        'quiz_questions': bundle['quiz_questions'],
     }
     
     return render(request, 'event_creation/lesson_detail.html', context)
@@ -102,16 +162,16 @@ def theory_section_detail(request, lesson_id, section_id):
     if request.user.nationality != 'japanese':
         return redirect('dashboard')
     
-    lesson = get_object_or_404(Lesson, id=lesson_id)
-    theory_section = get_object_or_404(TheorySection, id=section_id, lesson=lesson)
-    phrases = theory_section.phrases.all()
-    conversations = theory_section.conversations.all()
+    bundle = get_lesson_bundle(lesson_id)
+    theory_section = next((section for section in bundle['theory_sections'] if section['id'] == section_id), None)
+    if theory_section is None:
+        raise Http404('No such theory section')
     
     context = {
-        'lesson': lesson,
+        'lesson': bundle['lesson'],
         'theory_section': theory_section,
-        'phrases': phrases,
-        'conversations': conversations,
+        'phrases': theory_section['phrases'],
+        'conversations': theory_section['conversations'],
     }
     
     return render(request, 'event_creation/theory_section_detail.html', context)
@@ -122,21 +182,22 @@ def lesson_quiz(request, lesson_id):
     if request.user.nationality != 'japanese':
         return redirect('dashboard')
     
-    lesson = get_object_or_404(Lesson, id=lesson_id)
-    quiz_questions = lesson.quiz_questions.all()
+    bundle = get_lesson_bundle(lesson_id)
+    lesson = bundle['lesson']
+    quiz_questions = bundle['quiz_questions']
     
     if request.method == 'POST':
         # Handle quiz submission
         score = 0
-        total_questions = quiz_questions.count()
+        total_questions = len(quiz_questions)
         user_answers = {}
         
         for question in quiz_questions:
-            answer_key = f'question_{question.id}'
+            answer_key = f"question_{question['id']}"
             user_answer = request.POST.get(answer_key)
-            user_answers[question.id] = user_answer
+            user_answers[question['id']] = user_answer
             
-            if user_answer == question.correct_answer:
+            if user_answer == question['correct_answer']:
                 score += 1
         
         percentage = (score / total_questions) * 100 if total_questions > 0 else 0
@@ -259,6 +320,7 @@ def edit_post(request, post_id):
     
     return render(request, 'event_creation/edit_post.html', context)
 
+@query_budget(8)
 @login_required
 def my_posts(request):
     """Display user's own posts for both Vietnamese and Japanese users"""
@@ -267,17 +329,32 @@ def my_posts(request):
     else:
         posts = LanguageExchangePost.objects.filter(japanese_user=request.user, user_type='japanese')
     
-    # Calculate counts for statistics
-    matched_posts_count = posts.filter(status='matched').count()
-    active_posts_count = posts.filter(status='active').count()
+    page, next_cursor = keyset_page(
+        # chatroom: matched cards link to their room
+        posts.select_related('phrase', 'cafe_location', 'japanese_partner', 'vietnamese_partner', 'chatroom'),
+        ['-created_at', '-id'], request.GET.get('cursor'),
+    )
+    if wants_json(request):
+        return page_response(request, 'event_creation/includes/my_post_cards.html', {'posts': page}, next_cursor)
+    
+    # Calculate counts for statistics (one aggregate instead of three COUNTs)
+    counts = posts.aggregate(
+        total=Count('id'),
+        matched=Count('id', filter=Q(status='matched')),
+        active=Count('id', filter=Q(status='active')),
+    )
     
     # Get recent accepted posts for notifications
-    recent_accepted_posts = posts.filter(status='matched').order_by('-updated_at')[:3]
+    recent_accepted_posts = posts.filter(status='matched').select_related(
+        'phrase', 'japanese_partner', 'vietnamese_partner',
+    ).order_by('-updated_at')[:3]
     
     context = {
-        'posts': posts,
-        'matched_posts_count': matched_posts_count,
-        'active_posts_count': active_posts_count,
+        'posts': page,
+        'next_cursor': next_cursor,
+        'total_posts_count': counts['total'],
+        'matched_posts_count': counts['matched'],
+        'active_posts_count': counts['active'],
         'recent_accepted_posts': recent_accepted_posts,
     }
     
@@ -373,6 +450,59 @@ def cancel_accept_post(request, post_id):
     
     return redirect('dashboard')
 
+@query_budget(5)
+@login_required
+def nearby_cafes(request):
+    """
+    Cafes near a point as JSON, nearest first
+    Centre: ?lat=..&lon=.. (e.g. the browser's location), ?cafe_id=.. (near a meeting place)
+    or ?user_id=.. (near a partner's city, 404 for anyone who is not a partner); ?radius= in km, ?limit= results
+    """
+    point = geo.parse_point(request.GET.get('lat'), request.GET.get('lon'))
+    if point is None and request.GET.get('cafe_id', '').isdigit():
+        cafe = CafeLocation.objects.filter(id=request.GET['cafe_id'], geohash__gt='').first()
+        if cafe:
+            point = (float(cafe.latitude), float(cafe.longitude))
+    if point is None and request.GET.get('user_id', '').isdigit():
+        # Only the user's partners (a previous match either way, or an accepted request) can be looked up
+        partner = get_user_model().objects.filter(
+            Q(id=request.GET['user_id']),
+            Exists(PartnerInteraction.objects.filter(user=request.user, partner=OuterRef('pk')))
+            | Exists(PartnerRequest.objects.filter(
+                Q(requester=request.user, accepted_by=OuterRef('pk')) | Q(requester=OuterRef('pk'), accepted_by=request.user)
+            )),
+        ).values_list('id', 'city').first()
+        if partner is None:
+            raise Http404('No such partner')
+        point = geo.CITY_COORDINATES.get(partner[1])
+    if point is None:
+        return JsonResponse({'success': False, 'error': 'A valid lat/lon, cafe_id or user_id is required'}, status=400)
+    
+    radius = geo.parse_radius(request.GET.get('radius'))
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    
+    cafes = CafeLocation.nearby(*point, radius, limit=limit)
+    return JsonResponse({
+        'success': True,
+        'center': {'latitude': point[0], 'longitude': point[1]},
+        'radius_km': radius,
+        'cafes': [
+            {
+                'id': cafe.id,
+                'name': cafe.name,
+                'address': cafe.address,
+                'city': cafe.city,
+                'latitude': float(cafe.latitude),
+                'longitude': float(cafe.longitude),
+                'distance_km': round(distance, 2),
+            }
+            for cafe, distance in cafes
+        ],
+    })
+
 @login_required
 def create_partner_request(request):
     """Create a partner request"""
@@ -393,6 +523,7 @@ def create_partner_request(request):
     
     return render(request, 'event_creation/create_partner_request.html', context)
 
+@query_budget(5)
 @login_required
 def my_partner_requests(request):
     """Display user's own partner requests"""
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class EventSearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'event_search'
\ No newline at end of file
+    name = 'event_search'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal handlers)
@@ -0,0 +1,11 @@
+"""
+Cache namespaces for event_search data (see vietnam_japan_connect.caching)
+Each one is dropped whenever one of its models changes (hooked up in event_search.signals)
+"""
+
+from vietnam_japan_connect.caching import CacheNamespace
+
+# Available-posts feeds, rebuilt from one query on the first read after any post change
+FEEDS = CacheNamespace('event_search:feeds', timeout=600)
+# Per-user sets of previous partners, deleted per user when a request is accepted
+PREVIOUS_PARTNERS = CacheNamespace('event_search:previous_partners', timeout=3600)
@@ -0,0 +1,57 @@
+"""
+Available Posts Feed
+Lists of active posts per (city, creator nationality), built from one query and cached
+in the FEEDS namespace, plus a per-user set of previous partners (PREVIOUS_PARTNERS) used
+for the priority boost in available_posts
+- Any post or cafe change drops every feed at once (a namespace version bump, see
+  event_search.signals) and the next read rebuilds it; nothing is patched in place, so
+  concurrent saves cannot lose each other's updates
+"""
+
+from event_creation.models import LanguageExchangePost, PartnerInteraction
+from .caches import FEEDS, PREVIOUS_PARTNERS
+
+
+def feed_entry(created_at, post_id, creator_id, cafe_id):
+    # Feeds are lists of these tuples in ascending order, so the newest post is last
+    return (created_at.timestamp(), post_id, creator_id, cafe_id)
+
+
+def feed_queryset(city, nationality):
+    """Active posts created by users of the given nationality in the given city"""
+    return LanguageExchangePost.objects.filter(**{
+        f'{nationality}_user__nationality': nationality,
+        'user_type': nationality,
+        'cafe_location__city': city,
+        'status': 'active',
+    })
+
+
+def build_feed(city, nationality):
+    return sorted(
+        feed_entry(created_at, post_id, creator_id, cafe_id)
+        for post_id, created_at, creator_id, cafe_id in feed_queryset(city, nationality).values_list(
+            'id', 'created_at', f'{nationality}_user', 'cafe_location'
+        )
+    )
+
+
+def available_feed(city, nationality):
+    """The feed's (created timestamp, post id, creator id, cafe id) entries, oldest first"""
+    return FEEDS.get_or_set(('feed', city, nationality), lambda: build_feed(city, nationality))
+
+
+def available_post_ids(city, nationality):
+    """Ids of the feed's posts, newest first"""
+    return [entry[1] for entry in reversed(available_feed(city, nationality))]
+
+
+def previous_partner_ids(user_id):
+    """Ids of everyone the user has been matched with (cached)"""
+    return PREVIOUS_PARTNERS.get_or_set((user_id,), lambda: frozenset(
+        PartnerInteraction.objects.filter(user_id=user_id).values_list('partner_id', flat=True)
+    ))
+
+
+def invalidate_previous_partners(user_ids):
+    PREVIOUS_PARTNERS.delete_many([(user_id,) for user_id in user_ids if user_id])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from vietnam_japan_connect import query_plans
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN QUERY PLAN the canonical hot-path querysets and fail on full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only audit these registry entries')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('The plan audit reads SQLite EXPLAIN QUERY PLAN output')
+        unknown = set(options['names']) - set(query_plans.CANONICAL_QUERIES)
+        if unknown:
+            raise CommandError(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+        failures = 0
+        for name, plan, scans in query_plans.audit(options['names']):
+            if scans:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'FAIL {name}: ' + '; '.join(scans)))
+            else:
+                self.stdout.write(f'ok   {name}')
+            if scans or options['verbosity'] >= 2:
+                for _, parent, detail in plan:
+                    self.stdout.write(f'       {"  " if parent else ""}{detail}')
+
+        if failures:
+            raise CommandError(f'{failures} queries do full table scans')
+        self.stdout.write(self.style.SUCCESS('No full table scans'))
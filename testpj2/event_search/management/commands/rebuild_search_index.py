@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from event_search import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the content search index (phrases, lessons and theory content) from the database'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = search.rebuild()
+        for kind, count in counts.items():
+            self.stdout.write(f'{kind}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {sum(counts.values())} documents'))
@@ -0,0 +1,133 @@
+"""
+Partner Matching
+Scores the pool of active partner requests a user can accept and caches the ranking
+- Each candidate is scored on city proximity, meeting preference and frequency
+  compatibility, shared interests, the requester's points and previous matches
+- The whole pool is scored in one pass over a single values() query, which also
+  joins in each requester's previous matches with the user (PartnerInteraction)
+- The ranking is cached per user in the PARTNER_REQUESTS cache namespace, whose version
+  is bumped whenever a partner request or a previous-partner edge
+  changes (event_creation.signals) and when a profile field in PROFILE_FIELDS is saved
+  (event_search.signals)
+"""
+
+import math
+import re
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from event_creation import geo
+from event_creation.caches import PARTNER_REQUESTS
+from event_creation.models import PartnerRequest, PartnerInteraction
+
+# Relative weight of each signal, the score is their weighted mean (0-1)
+WEIGHTS = {
+    'city': 3,
+    'meeting': 2,
+    'frequency': 1,
+    'interests': 2,
+    'points': 1,
+    'history': 2,
+}
+
+MAX_CITY_DISTANCE_KM = 1500
+
+# Profile fields read by the scores, as the viewer or as a candidate
+PROFILE_FIELDS = frozenset({'nationality', 'city', 'interests', 'point'})
+
+# Which requests each nationality can accept (same rules as find_partners)
+ACCEPTABLE_REQUESTS = {
+    'japanese': ('vietnamese', ['vietnamese_to_japanese', 'both']),
+    'vietnamese': ('japanese', ['japanese_to_vietnamese', 'both']),
+}
+
+
+def city_score(user_city, preferred_city):
+    if preferred_city == 'any' or preferred_city == user_city:
+        return 1.0
+    if user_city not in geo.CITY_COORDINATES or preferred_city not in geo.CITY_COORDINATES:
+        return 0.0
+    distance = geo.haversine_km(*geo.CITY_COORDINATES[user_city], *geo.CITY_COORDINATES[preferred_city])
+    return max(0.0, 1 - distance / MAX_CITY_DISTANCE_KM)
+
+
+def preference_score(own, candidate, flexible):
+    """1 for the same choice, 0.75 when either side is flexible, 0 for a clash, 0.5 if unknown"""
+    if own is None:
+        return 0.5
+    if own == candidate:
+        return 1.0
+    if flexible in (own, candidate):
+        return 0.75
+    return 0.0
+
+
+def interest_tokens(text):
+    return {token for token in re.split(r'[\s,;/、。.]+', (text or '').lower()) if len(token) > 1}
+
+
+def interest_score(own_tokens, text):
+    tokens = interest_tokens(text)
+    if not own_tokens or not tokens:
+        return 0.0
+    return len(own_tokens & tokens) / len(own_tokens | tokens)
+
+
+def pool_queryset(user):
+    """Active requests the user can accept, as the rows score_pool needs (unordered, it sorts them itself)"""
+    requester_nationality, request_types = ACCEPTABLE_REQUESTS.get(user.nationality, ACCEPTABLE_REQUESTS['vietnamese'])
+    # One lookup on the (user, partner) unique index per candidate
+    previous_matches = PartnerInteraction.objects.filter(
+        user_id=user.id, partner_id=OuterRef('requester_id'),
+    ).values('match_count')[:1]
+    return PartnerRequest.objects.filter(
+        status='active',
+        requester__nationality=requester_nationality,
+        request_type__in=request_types,
+    ).exclude(requester=user).order_by().annotate(
+        previous_matches=Coalesce(Subquery(previous_matches), 0),
+    ).values_list(
+        'id', 'requester_id', 'preferred_city', 'meeting_preference', 'frequency',
+        'request_type', 'requester__interests', 'requester__point', 'previous_matches',
+    )
+
+
+def own_preferences_queryset(user):
+    """The user's own latest request, which tells us how they like to meet"""
+    return PartnerRequest.objects.filter(requester=user).order_by('-created_at').values_list(
+        'meeting_preference', 'frequency',
+    )
+
+
+def score_pool(user):
+    """
+    Score every active request the user can accept
+    Returns (score, request id, preferred city, request type, matched before) tuples, best first
+    """
+    pool = list(pool_queryset(user))
+    if not pool:
+        return []
+
+    own = own_preferences_queryset(user).first() or (None, None)
+    own_tokens = interest_tokens(user.interests)
+    max_points = max(max(row[7] or 0 for row in pool), 1)
+    total_weight = sum(WEIGHTS.values())
+
+    ranking = []
+    for request_id, requester_id, preferred_city, meeting, frequency, request_type, interests, points, matches in pool:
+        score = (
+            WEIGHTS['city'] * city_score(user.city, preferred_city)
+            + WEIGHTS['meeting'] * preference_score(own[0], meeting, 'both')
+            + WEIGHTS['frequency'] * preference_score(own[1], frequency, 'flexible')
+            + WEIGHTS['interests'] * interest_score(own_tokens, interests)
+            + WEIGHTS['points'] * math.log1p(max(points or 0, 0)) / math.log1p(max_points)
+            + WEIGHTS['history'] * min(matches, 3) / 3
+        ) / total_weight
+        ranking.append((round(score, 4), request_id, preferred_city, request_type, matches > 0))
+
+    ranking.sort(key=lambda entry: (-entry[0], -entry[1]))
+    return ranking
+
+
+def ranked_requests(user):
+    """The user's cached ranking, rescored when the request pool has changed since it was built"""
+    return PARTNER_REQUESTS.get_or_set(('ranking', user.id), lambda: score_pool(user))
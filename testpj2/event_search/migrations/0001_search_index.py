@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:10
+
+import re
+import unicodedata
+from django.db import migrations
+
+# Snapshot of event_search.search as of this migration (the analyzer, the indexed fields and
+# the rowid layout), so later edits to the live module do not change what it does
+
+TABLE = 'event_search_document'
+
+SOURCES = {
+    'phrase': ('VietnamesePhrase', ('vietnamese_text', 'japanese_translation', 'english_translation')),
+    'lesson': ('Lesson', ('title', 'description')),
+    'lesson_phrase': ('LessonPhrase', ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                       'pronunciation_guide', 'usage_note')),
+    'theory_phrase': ('TheoryPhrase', ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                       'pronunciation_guide', 'usage_note')),
+    'conversation_line': ('ConversationLine', ('vietnamese_text', 'japanese_translation', 'english_translation')),
+}
+KINDS = list(SOURCES)
+
+VIETNAMESE_FOLD = str.maketrans({'đ': 'd', 'Đ': 'd'})
+COMBINING_DIACRITICS = re.compile('[\u0300-\u036f]')
+WORD_PATTERN = re.compile(r'[0-9a-z]+|[々぀-ヿ㐀-䶿一-鿿豈-﫿]+')
+
+
+def fold(text):
+    text = unicodedata.normalize('NFKC', text or '').lower().translate(VIETNAMESE_FOLD)
+    text = COMBINING_DIACRITICS.sub('', unicodedata.normalize('NFD', text))
+    return unicodedata.normalize('NFC', text)
+
+
+def analyze(text):
+    terms, chars = [], []
+    for token in WORD_PATTERN.findall(fold(text)):
+        if token[0].isascii():
+            terms.append(token)
+            continue
+        chars.extend(token)
+        if len(token) > 1:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms, chars
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 table for event_search.search.SQLiteFTSBackend (other databases use SimpleSearchBackend)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        "USING fts5(terms, chars, tokenize='unicode61 remove_diacritics 0')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def index_existing_content(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for position, (kind, (model_name, fields)) in enumerate(SOURCES.items()):
+            model = apps.get_model('event_creation', model_name)
+            rows = []
+            for row in model.objects.values_list('id', *fields).iterator():
+                terms, chars = analyze(' '.join(value or '' for value in row[1:]))
+                rows.append((row[0] * len(KINDS) + position, ' '.join(terms), ' '.join(chars)))
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, terms, chars) VALUES (%s, %s, %s)', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0015_cafelocation_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+import re
+import unicodedata
+from django.db import migrations
+
+# Snapshot of the event_search.search analyzer as of this migration, now folding through
+# vietnam_japan_connect.normalization (copied here so later edits do not change the migration)
+
+TABLE = 'event_search_document'
+
+SOURCES = {
+    'phrase': ('VietnamesePhrase', ('vietnamese_text', 'japanese_translation', 'english_translation')),
+    'lesson': ('Lesson', ('title', 'description')),
+    'lesson_phrase': ('LessonPhrase', ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                       'pronunciation_guide', 'usage_note')),
+    'theory_phrase': ('TheoryPhrase', ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                       'pronunciation_guide', 'usage_note')),
+    'conversation_line': ('ConversationLine', ('vietnamese_text', 'japanese_translation', 'english_translation')),
+}
+KINDS = list(SOURCES)
+
+WORD_PATTERN = re.compile(r'[0-9a-z]+|[々぀-ヿ㐀-䶿一-鿿豈-﫿]+')
+
+
+def build_fold_table():
+    """Precomposed Latin letters -> base letter, stray combining marks dropped, katakana -> hiragana"""
+    table = {ord('đ'): 'd', ord('Đ'): 'D'}
+    for codepoint in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        char = chr(codepoint)
+        base = ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+        if base != char and len(base) == 1 and base.isascii():
+            table[codepoint] = base
+    for codepoint in range(0x0300, 0x0370):
+        table[codepoint] = None
+    table.update({codepoint: codepoint - 0x60 for codepoint in range(ord('ァ'), ord('ヶ') + 1)})
+    table[ord('ヽ')] = 'ゝ'
+    table[ord('ヾ')] = 'ゞ'
+    return table
+
+
+FOLD_TABLE = build_fold_table()
+
+
+def fold(text):
+    return unicodedata.normalize('NFKC', text or '').lower().translate(FOLD_TABLE)
+
+
+def analyze(text):
+    terms, chars = [], []
+    for token in WORD_PATTERN.findall(fold(text)):
+        if token[0].isascii():
+            terms.append(token)
+            continue
+        chars.extend(token)
+        if len(token) > 1:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms, chars
+
+
+def reindex_content(apps, schema_editor):
+    """The analyzer now folds katakana to hiragana, re-analyze every document"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for position, (kind, (model_name, fields)) in enumerate(SOURCES.items()):
+            model = apps.get_model('event_creation', model_name)
+            rows = []
+            for row in model.objects.values_list('id', *fields).iterator():
+                terms, chars = analyze(' '.join(value or '' for value in row[1:]))
+                rows.append((row[0] * len(KINDS) + position, ' '.join(terms), ' '.join(chars)))
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, terms, chars) VALUES (%s, %s, %s)', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_creation', '0016_phrase_normalized_text'),
+        ('event_search', '0001_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,260 @@
+"""
+Content Search
+Full-text search over phrases, lessons and theory content
+- Text is analyzed in Python before indexing and querying: it is folded with
+  vietnam_japan_connect.normalization (lowercase, tone marks removed, katakana as hiragana)
+  so "xin chao" finds "Xin chào", and Japanese runs are split into character bigrams
+  since they have no spaces
+- The index lives behind a pluggable backend (settings.SEARCH_BACKEND): SQLite FTS5 by
+  default, or a plain in-process scan for databases without FTS5
+- event_search.signals keeps it in sync; `manage.py rebuild_search_index` rebuilds it
+"""
+
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from event_creation.models import VietnamesePhrase, Lesson, LessonPhrase, TheoryPhrase, ConversationLine
+from vietnam_japan_connect.normalization import fold
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+INDEX_BATCH_SIZE = 500
+
+# Searchable models and the fields that are indexed for each
+# Never reorder: the FTS backend derives rowids from the position of the kind
+SOURCES = {
+    'phrase': (VietnamesePhrase, ('vietnamese_text', 'japanese_translation', 'english_translation')),
+    'lesson': (Lesson, ('title', 'description')),
+    'lesson_phrase': (LessonPhrase, ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                     'pronunciation_guide', 'usage_note')),
+    'theory_phrase': (TheoryPhrase, ('vietnamese_text', 'japanese_translation', 'english_translation',
+                                     'pronunciation_guide', 'usage_note')),
+    'conversation_line': (ConversationLine, ('vietnamese_text', 'japanese_translation', 'english_translation')),
+}
+KINDS = list(SOURCES)
+
+WORD_PATTERN = re.compile(r'[0-9a-z]+|[々぀-ヿ㐀-䶿一-鿿豈-﫿]+')
+
+
+def is_cjk(token):
+    return not token[0].isascii()
+
+
+def analyze(text):
+    """
+    (terms, chars) of a text: Latin words and Japanese bigrams in reading order, and the
+    single Japanese characters (so one-character queries still match)
+    """
+    terms, chars = [], []
+    for token in WORD_PATTERN.findall(fold(text)):
+        if not is_cjk(token):
+            terms.append(token)
+            continue
+        chars.extend(token)
+        if len(token) == 1:
+            continue
+        terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms, chars
+
+
+def document_text(instance, fields):
+    return ' '.join(getattr(instance, field) or '' for field in fields)
+
+
+class BaseSearchBackend:
+    """Stores analyzed documents keyed by (kind, id) and returns matching keys, best first"""
+
+    def index(self, kind, instances):
+        raise NotImplementedError
+
+    def remove(self, kind, ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, kinds, limit):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 table (created by event_search migration 0001) holding the analyzed text
+    rowid = object id * len(KINDS) + kind position, so updates and deletes are rowid lookups
+    """
+    table = 'event_search_document'
+
+    def rowid(self, kind, object_id):
+        return object_id * len(KINDS) + KINDS.index(kind)
+
+    def index(self, kind, instances):
+        fields = SOURCES[kind][1]
+        rows = []
+        for instance in instances:
+            terms, chars = analyze(document_text(instance, fields))
+            rows.append((self.rowid(kind, instance.id), ' '.join(terms), ' '.join(chars)))
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(f'INSERT INTO {self.table} (rowid, terms, chars) VALUES (%s, %s, %s)', rows)
+
+    def remove(self, kind, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s',
+                               [(self.rowid(kind, object_id),) for object_id in ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def match_expression(self, query):
+        """FTS5 query: every term must match, Japanese runs as bigram phrases, the last word as a prefix"""
+        clauses = []
+        tokens = WORD_PATTERN.findall(fold(query))
+        for position, token in enumerate(tokens):
+            if not is_cjk(token):
+                clauses.append(f'terms : "{token}"' + ('*' if position == len(tokens) - 1 else ''))
+            elif len(token) == 1:
+                clauses.append(f'chars : "{token}"')
+            else:
+                bigrams = ' '.join(token[i:i + 2] for i in range(len(token) - 1))
+                clauses.append(f'terms : "{bigrams}"')
+        return ' AND '.join(clauses)
+
+    def search(self, query, kinds, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        sql = f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s'
+        params = [expression]
+        if set(kinds) != set(KINDS):
+            sql += f' AND rowid %% {len(KINDS)} IN ({", ".join("%s" for _ in kinds)})'
+            params += [KINDS.index(kind) for kind in kinds]
+        sql += f' ORDER BY bm25({self.table}) LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rowids = [row[0] for row in cursor.fetchall()]
+        return [(KINDS[rowid % len(KINDS)], rowid // len(KINDS)) for rowid in rowids]
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Analyzes every document on each search, for databases without FTS5
+    Nothing is stored, so index/remove/clear are no-ops
+    """
+
+    def index(self, kind, instances):
+        pass
+
+    def remove(self, kind, ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, kinds, limit):
+        query_terms, query_chars = analyze(query)
+        if not query_terms and not query_chars:
+            return []
+        results = []
+        for kind in kinds:
+            model, fields = SOURCES[kind]
+            for row in model.objects.values_list('id', *fields).iterator():
+                terms, chars = analyze(' '.join(value or '' for value in row[1:]))
+                haystack = ' ' + ' '.join(terms) + ' '
+                if all(f' {term}' in haystack for term in query_terms) and set(query_chars) <= set(chars):
+                    results.append((kind, row[0]))
+                    if len(results) >= limit:
+                        return results
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        path = ('event_search.search.SQLiteFTSBackend' if connection.vendor == 'sqlite'
+                else 'event_search.search.SimpleSearchBackend')
+    return import_string(path)()
+
+
+def index_objects(kind, instances):
+    get_backend().index(kind, instances)
+
+
+def remove_objects(kind, ids):
+    get_backend().remove(kind, ids)
+
+
+def rebuild():
+    """Re-index every searchable object, returns the number of documents per kind"""
+    backend = get_backend()
+    backend.clear()
+    counts = {}
+    for kind, (model, fields) in SOURCES.items():
+        counts[kind] = 0
+        batch = []
+        for instance in model.objects.only('id', *fields).iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(instance)
+            if len(batch) == INDEX_BATCH_SIZE:
+                backend.index(kind, batch)
+                counts[kind] += len(batch)
+                batch = []
+        backend.index(kind, batch)
+        counts[kind] += len(batch)
+    return counts
+
+
+def result_url(kind, instance):
+    if kind == 'phrase':
+        return reverse('phrase_list') + f'?category={instance.category}'
+    if kind == 'lesson':
+        return reverse('lesson_detail', args=[instance.id])
+    if kind == 'lesson_phrase':
+        return reverse('lesson_detail', args=[instance.lesson_id])
+    section = instance.theory_section if kind == 'theory_phrase' else instance.conversation.theory_section
+    return reverse('theory_section_detail', args=[section.lesson_id, section.id])
+
+
+def search(query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Search results as dicts (kind, id, title, subtitle, url), best first
+    Only the matching objects are loaded, one in_bulk query per kind
+    """
+    kinds = [kind for kind in (kinds or KINDS) if kind in SOURCES]
+    if not query or not query.strip() or not kinds:
+        return []
+    hits = get_backend().search(query, kinds, min(limit, MAX_LIMIT))
+
+    related = {
+        'theory_phrase': ['theory_section'],
+        'conversation_line': ['conversation__theory_section'],
+    }
+    objects = {}
+    for kind in {kind for kind, _ in hits}:
+        model = SOURCES[kind][0]
+        ids = [object_id for hit_kind, object_id in hits if hit_kind == kind]
+        objects[kind] = model.objects.select_related(*related.get(kind, [])).in_bulk(ids)
+
+    results = []
+    for kind, object_id in hits:
+        instance = objects[kind].get(object_id)
+        if instance is None:  # Deleted since it was indexed
+            continue
+        if kind == 'lesson':
+            title, subtitle = instance.title, instance.description
+        else:
+            title, subtitle = instance.vietnamese_text, f'{instance.japanese_translation} · {instance.english_translation}'
+        results.append({
+            'kind': kind,
+            'id': object_id,
+            'title': title,
+            'subtitle': subtitle,
+            'url': result_url(kind, instance),
+        })
+    return results
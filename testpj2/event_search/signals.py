@@ -0,0 +1,60 @@
+"""
+Event Search Signals
+Keep the cached available-posts feeds (the FEEDS namespace of event_search.caches), the
+previous-partner sets (event_search.feeds) and the partner rankings (event_search.matching)
+in step with posts, cafes, partner requests and profiles once the surrounding transaction
+has committed
+(a partner request change makes every ranking stale through event_creation.caches)
+Also keeps the content search index (event_search.search) in step with the searchable models
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from event_creation.caches import PARTNER_REQUESTS
+from event_creation.models import CafeLocation, LanguageExchangePost, PartnerRequest
+from user_profile.models import CustomUser
+from . import caches, feeds, matching, search
+
+
+caches.FEEDS.invalidate_on(LanguageExchangePost, CafeLocation)
+
+
+@receiver(post_save, sender=LanguageExchangePost)
+def invalidate_post_partners(sender, instance, **kwargs):
+    # event_creation.signals may have added or removed a PartnerInteraction edge
+    # (moving out of matched takes it back), so any save drops the cached sets
+    user_ids = [instance.japanese_user_id, instance.vietnamese_user_id,
+                instance.japanese_partner_id, instance.vietnamese_partner_id]
+    transaction.on_commit(lambda: feeds.invalidate_previous_partners(user_ids))
+
+
+@receiver(post_save, sender=PartnerRequest)
+def invalidate_partner_request_partners(sender, instance, **kwargs):
+    user_ids = [instance.requester_id, instance.accepted_by_id]
+    transaction.on_commit(lambda: feeds.invalidate_previous_partners(user_ids))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_rankings(sender, instance, update_fields=None, **kwargs):
+    # A profile feeds its owner's ranking and, as a candidate, everyone else's:
+    # drop every ranking, unless only fields the scores ignore were saved (e.g. last_login)
+    if update_fields is not None and not matching.PROFILE_FIELDS.intersection(update_fields):
+        return
+    transaction.on_commit(PARTNER_REQUESTS.invalidate)
+
+
+def index_search_document(sender, instance, **kwargs):
+    kind = SEARCH_KINDS[sender]
+    transaction.on_commit(lambda: search.index_objects(kind, [instance]))
+
+
+def remove_search_document(sender, instance, **kwargs):
+    kind, object_id = SEARCH_KINDS[sender], instance.id
+    transaction.on_commit(lambda: search.remove_objects(kind, [object_id]))
+
+
+SEARCH_KINDS = {model: kind for kind, (model, _) in search.SOURCES.items()}
+for search_model in SEARCH_KINDS:
+    post_save.connect(index_search_document, sender=search_model, dispatch_uid=f'search_index_{search_model.__name__}')
+    post_delete.connect(remove_search_document, sender=search_model, dispatch_uid=f'search_remove_{search_model.__name__}')
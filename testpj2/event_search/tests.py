@@ -1,3 +1,263 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from user_profile.models import CustomUser
+from event_creation.caches import PARTNER_REQUESTS
+from event_creation.models import (CafeLocation, VietnamesePhrase, LanguageExchangePost, PartnerRequest, PartnerInteraction,
+                                   Lesson)
+from vietnam_japan_connect.pagination import PAGE_SIZE
+from . import feeds, matching, search
 
-# Create your tests here.
+
+def make_user(username, nationality, **fields):
+    fields = {'city': 'hanoi', 'gender': 'male', 'date_of_birth': date(1990, 1, 1), **fields}
+    return CustomUser.objects.create_user(username, password='pw', nationality=nationality, **fields)
+
+
+def make_request(requester, **fields):
+    fields = {'request_type': 'vietnamese_to_japanese', 'title': 'Partner', 'description': 'Looking for a partner',
+              'preferred_city': 'hanoi', 'meeting_preference': 'offline', 'frequency': 'weekly', **fields}
+    return PartnerRequest.objects.create(requester=requester, **fields)
+
+
+class PartnerMatchingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('jp', 'japanese')
+        self.known = make_user('known', 'vietnamese')
+        self.stranger = make_user('stranger', 'vietnamese')
+        self.known_request = make_request(self.known)
+        self.stranger_request = make_request(self.stranger)
+
+    def test_previous_matches_raise_the_score(self):
+        PartnerInteraction.record_status_change(self.viewer.id, self.known.id, None, 'matched')
+        ranking = matching.score_pool(self.viewer)
+        self.assertEqual([entry[1] for entry in ranking], [self.known_request.id, self.stranger_request.id])
+        self.assertEqual([entry[4] for entry in ranking], [True, False])
+
+    def test_cached_ranking_follows_other_users(self):
+        first = matching.ranked_requests(self.viewer)
+        self.assertEqual(first[0][1], self.stranger_request.id)  # Newer request wins the tie
+
+        # A new previous-partner edge: the viewer's post gets matched with one of the candidates
+        cafe = CafeLocation.objects.create(name='Cafe', address='Street', city='hanoi', latitude=21.03, longitude=105.85)
+        phrase = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                                                 japanese_translation='こんにちは', english_translation='Hello')
+        post = LanguageExchangePost.objects.create(
+            user_type='japanese', japanese_user=self.viewer, vietnamese_partner=self.known, phrase=phrase,
+            cafe_location=cafe, meeting_date=timezone.now() + timedelta(days=1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            post.status = 'matched'
+            post.save()
+        best = matching.ranked_requests(self.viewer)[0]
+        self.assertEqual((best[1], best[4]), (self.known_request.id, True))
+
+        # A candidate's profile
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stranger.point = 1000
+            self.stranger.save()
+        ranked = matching.ranked_requests(self.viewer)
+        self.assertEqual(ranked, matching.score_pool(self.viewer))
+        self.assertNotEqual(ranked, first)
+
+    def test_sign_in_keeps_rankings(self):
+        matching.ranked_requests(self.viewer)
+        version = PARTNER_REQUESTS.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.known.save(update_fields=['last_login'])
+        self.assertEqual(PARTNER_REQUESTS.version(), version)
+
+    def test_evicted_version_drops_rankings(self):
+        # A version key lost to eviction must not bring back entries of an earlier version
+        stale = matching.ranked_requests(self.viewer)
+        cache.delete(PARTNER_REQUESTS.version_key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stranger.point = 1000
+            self.stranger.save()
+        cache.delete(PARTNER_REQUESTS.version_key)
+        self.assertNotEqual(matching.ranked_requests(self.viewer), stale)
+
+    def test_find_partners_page(self):
+        PartnerInteraction.record_status_change(self.viewer.id, self.known.id, None, 'matched')
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('find_partners'))
+        found = response.context['partner_requests']
+        self.assertEqual([r.id for r in found], [self.known_request.id, self.stranger_request.id])
+        self.assertEqual([r.priority for r in found], [1, 0])
+        self.assertGreater(found[0].match_score, found[1].match_score)
+
+    def test_find_partners_filters(self):
+        far = make_request(make_user('saigon', 'vietnamese'), preferred_city='hochiminh', request_type='both')
+        make_request(make_user('learner', 'japanese'), request_type='japanese_to_vietnamese')  # Not for the viewer
+        self.client.force_login(self.viewer)
+        found = lambda **params: [r.id for r in self.client.get(reverse('find_partners'), params).context['partner_requests']]
+        self.assertEqual(set(found()), {self.known_request.id, self.stranger_request.id, far.id})
+        self.assertEqual(found(city='hochiminh'), [far.id])
+        self.assertEqual(found(request_type='both'), [far.id])
+        self.assertNotIn(far.id, found(city='hanoi'))
+
+
+class ContentSearchTests(TestCase):
+    backend = 'event_search.search.SQLiteFTSBackend'
+
+    def setUp(self):
+        search.get_backend.cache_clear()
+        self.addCleanup(search.get_backend.cache_clear)
+        self.settings_override = override_settings(SEARCH_BACKEND=self.backend)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hello = VietnamesePhrase.objects.create(
+                category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                japanese_translation='こんにちは', english_translation='Hello')
+            self.road = VietnamesePhrase.objects.create(
+                category='asking_directions', difficulty='beginner', vietnamese_text='Đường này đi đâu?',
+                japanese_translation='この道はどこへ行きますか', english_translation='Where does this road go?')
+            self.coffee = VietnamesePhrase.objects.create(
+                category='restaurant', difficulty='beginner', vietnamese_text='Cho tôi một ly cà phê',
+                japanese_translation='コーヒーを一杯ください', english_translation='A coffee please')
+            self.lesson = Lesson.objects.create(title='Cảm ơn', description='Thanking people',
+                                                category='greetings', difficulty='beginner')
+
+    def found(self, query, kinds=None):
+        return [(result['kind'], result['id']) for result in search.search(query, kinds)]
+
+    def test_vietnamese_without_tone_marks(self):
+        self.assertEqual(self.found('xin chao'), [('phrase', self.hello.id)])
+        self.assertEqual(self.found('XIN CHÀO'), [('phrase', self.hello.id)])
+        self.assertEqual(self.found('duong'), [('phrase', self.road.id)])
+        self.assertEqual(self.found('ca phe'), [('phrase', self.coffee.id)])
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.found('cam'), [('lesson', self.lesson.id)])
+        self.assertEqual(self.found('cam', kinds=['phrase']), [])
+
+    def test_japanese_bigrams_and_kana(self):
+        self.assertEqual(self.found('道'), [('phrase', self.road.id)])
+        self.assertEqual(self.found('どこへ'), [('phrase', self.road.id)])
+        # Katakana, half-width katakana and hiragana spellings all match
+        self.assertEqual(self.found('コンニチハ'), [('phrase', self.hello.id)])
+        self.assertEqual(self.found('ｺｰﾋｰ'), [('phrase', self.coffee.id)])
+        self.assertEqual(self.found('こーひー'), [('phrase', self.coffee.id)])
+
+    def test_index_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hello.vietnamese_text = 'Tạm biệt'
+            self.hello.save()
+        self.assertEqual(self.found('xin chao'), [])
+        self.assertEqual(self.found('tam biet'), [('phrase', self.hello.id)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.road.delete()
+        self.assertEqual(self.found('duong'), [])
+
+    def test_search_page(self):
+        self.client.force_login(make_user('jp', 'japanese'))
+        response = self.client.get(reverse('content_search'), {'q': 'cam', 'format': 'json'})
+        self.assertEqual(response.json()['results'], search.search('cam'))
+        response = self.client.get(reverse('content_search'), {'q': 'cam', 'kind': 'phrase', 'format': 'json'})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('content_search'), {'q': 'xin chao', 'kind': 'unknown'})
+        self.assertEqual(response.context['selected_kind'], '')
+        self.assertContains(response, 'Xin chào!')
+
+
+class SimpleContentSearchTests(ContentSearchTests):
+    backend = 'event_search.search.SimpleSearchBackend'
+
+
+class AvailableFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = make_user('jp', 'japanese')
+        self.author = make_user('vn', 'vietnamese')
+        self.cafe = CafeLocation.objects.create(name='Cafe', address='Street', city='hanoi', latitude=21.03, longitude=105.85)
+        self.phrase = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                                                      japanese_translation='こんにちは', english_translation='Hello')
+
+    def make_post(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return LanguageExchangePost.objects.create(
+                user_type='vietnamese', vietnamese_user=self.author, phrase=self.phrase, cafe_location=self.cafe,
+                meeting_date=timezone.now() + timedelta(days=1), **fields,
+            )
+
+    def test_feed_follows_post_changes(self):
+        first = self.make_post()
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [first.id])  # Now cached
+        second = self.make_post()
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [second.id, first.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.status = 'cancelled'
+            first.save()
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [second.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [])
+
+    def test_feed_read_during_a_save_is_dropped_on_commit(self):
+        posts = [self.make_post() for _ in range(2)]
+        feeds.available_feed('hanoi', 'vietnamese')
+        with self.captureOnCommitCallbacks(execute=True):
+            late = LanguageExchangePost.objects.create(
+                user_type='vietnamese', vietnamese_user=self.author, phrase=self.phrase, cafe_location=self.cafe,
+                meeting_date=timezone.now() + timedelta(days=1),
+            )
+            feeds.available_feed('hanoi', 'vietnamese')  # Read while the save is not committed yet
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [late.id, posts[1].id, posts[0].id])
+
+    def test_cafe_move_changes_feed(self):
+        post = self.make_post()
+        feeds.available_feed('hanoi', 'vietnamese')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cafe.city = 'danang'
+            self.cafe.save()
+        self.assertEqual(feeds.available_post_ids('hanoi', 'vietnamese'), [])
+        self.assertEqual(feeds.available_post_ids('danang', 'vietnamese'), [post.id])
+
+    def test_total_count_leaves_out_stale_entries(self):
+        posts = [self.make_post() for _ in range(3)]
+        self.client.force_login(self.viewer)
+        self.assertEqual(self.client.get(reverse('available_posts')).context['total_count'], 3)
+        # Matched in another process whose invalidation has not landed yet
+        LanguageExchangePost.objects.filter(id=posts[0].id).update(status='matched')
+        response = self.client.get(reverse('available_posts'))
+        self.assertEqual(len(response.context['posts']), 2)
+        self.assertEqual(response.context['total_count'], 2)
+
+    def test_previous_partners_come_first(self):
+        partner = make_user('partner', 'vietnamese')
+        PartnerInteraction.record_status_change(self.viewer.id, partner.id, None, 'matched')
+        older = self.make_post()
+        self.author = partner
+        ours = self.make_post()
+        newest = self.make_post()
+        self.author = make_user('other', 'vietnamese')
+        stranger = self.make_post()
+        self.client.force_login(self.viewer)
+        posts = self.client.get(reverse('available_posts')).context['posts']
+        self.assertEqual([post.id for post in posts], [newest.id, ours.id, stranger.id, older.id])
+        self.assertEqual([post.priority for post in posts], [1, 1, 0, 0])
+
+    def test_radius_around_a_point(self):
+        post = self.make_post()
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('available_posts'), {'lat': 21.031, 'lon': 105.851, 'radius': 5})
+        self.assertEqual([p.id for p in response.context['posts']], [post.id])
+        self.assertLess(response.context['posts'][0].distance_km, 1)
+        response = self.client.get(reverse('available_posts'), {'lat': 16.05, 'lon': 108.2, 'radius': 5})
+        self.assertEqual(response.context['posts'], [])
+        self.assertEqual(response.context['total_count'], 0)
+
+    def test_infinite_scroll(self):
+        posts = [self.make_post() for _ in range(PAGE_SIZE + 1)]
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse('available_posts'))
+        self.assertEqual(len(response.context['posts']), PAGE_SIZE)
+        data = self.client.get(reverse('available_posts'), {'cursor': response.context['next_cursor'], 'format': 'json'})
+        data = data.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['html'].count('acceptPost('), 1)
+        self.assertIn(f'acceptPost({posts[0].id},', data['html'])
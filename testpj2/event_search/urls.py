@@ -5,4 +5,6 @@ urlpatterns = [
     path('available-posts/', views.available_posts, name='available_posts'),
 
     path('find-partners/', views.find_partners, name='find_partners'),
+
+    path('content/', views.content_search, name='content_search'),
 ]
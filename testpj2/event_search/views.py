@@ -4,14 +4,22 @@ Handles searching and browsing of language exchange opportunities:
 - Finding available language exchange posts by Japanese users
 - Searching for compatible language exchange partners
 - Filtering by city, language type, and other criteria
+- Full-text search over phrases, lessons and theory content
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Case, When, IntegerField
-from event_creation.models import LanguageExchangePost, PartnerRequest
+from django.http import JsonResponse
+from event_creation import geo
+from event_creation.models import LanguageExchangePost, PartnerRequest, CafeLocation
+from vietnam_japan_connect.metrics import query_budget
+from vietnam_japan_connect.pagination import sorted_page, wants_json, page_response
+from . import feeds, matching, search
 
+RADIUS_CHOICES_KM = [2, 5, 10, 20]
+
+@query_budget(8)
 @login_required
 def available_posts(request):
     """
@@ -21,162 +29,134 @@ def available_posts(request):
     """
     city = request.GET.get('city', request.user.city)
     
-    # Get posts from users of the opposite nationality
-    if request.user.nationality == 'vietnamese':
-        # Vietnamese users see posts from Japanese users
-        posts = LanguageExchangePost.objects.filter(
-            japanese_user__nationality='japanese',
-            user_type='japanese',
-            cafe_location__city=city,
-            status='active'
-        ).select_related('japanese_user', 'phrase', 'cafe_location')
-        opposite_users = 'japanese'
-    else:
-        # Japanese users see posts from Vietnamese users
-        posts = LanguageExchangePost.objects.filter(
-            vietnamese_user__nationality='vietnamese',
-            user_type='vietnamese',
-            cafe_location__city=city,
-            status='active'
-        ).select_related('vietnamese_user', 'phrase', 'cafe_location')
-        opposite_users = 'vietnamese'
-    
-    # Get users that current user has chatted with before
-    from chat_system.models import ChatRoom
-    previous_chat_users = set()
-    
-    # Find all chat rooms where current user was involved
-    user_chat_rooms = ChatRoom.objects.filter(
-        Q(post__japanese_user=request.user) | 
-        Q(post__vietnamese_user=request.user) |
-        Q(post__japanese_partner=request.user) |
-        Q(post__vietnamese_partner=request.user) |
-        Q(partner_request__requester=request.user) |
-        Q(partner_request__accepted_by=request.user)
+    # Vietnamese users see posts from Japanese users and vice versa
+    opposite_users = 'japanese' if request.user.nationality == 'vietnamese' else 'vietnamese'
+    
+    feed = feeds.available_feed(city, opposite_users)
+    
+    # Optional radius filter around a point (?lat=..&lon=..&radius=km), e.g. the user's location
+    point = geo.parse_point(request.GET.get('lat'), request.GET.get('lon'))
+    radius = geo.parse_radius(request.GET.get('radius'))
+    cafe_distances = None
+    if point:
+        cafe_distances = {cafe.id: distance for cafe, distance in CafeLocation.nearby(*point, radius)}
+        feed = [entry for entry in feed if entry[3] in cafe_distances]
+    
+    # Rank the precomputed (city, nationality) feed: posts from users the current user
+    # has been matched with before first, then newest first
+    previous_chat_users = feeds.previous_partner_ids(request.user.id)
+    rank_key = lambda entry: (-entry[0], -entry[1], -entry[2])  # (-priority, -created_at, -id)
+    ranked = sorted(
+        ((1 if creator_id in previous_chat_users else 0, created, post_id)
+         for created, post_id, creator_id, _ in feed),
+        key=rank_key,
     )
-    
-    # Extract unique users from previous chats
-    for chat_room in user_chat_rooms:
-        if chat_room.post:
-            if chat_room.post.creator == request.user:
-                if chat_room.post.partner:
-                    previous_chat_users.add(chat_room.post.partner.id)
-            elif chat_room.post.partner == request.user:
-                previous_chat_users.add(chat_room.post.creator.id)
-        elif chat_room.partner_request:
-            if chat_room.partner_request.requester == request.user:
-                if chat_room.partner_request.accepted_by:
-                    previous_chat_users.add(chat_room.partner_request.accepted_by.id)
-            else:
-                previous_chat_users.add(chat_room.partner_request.requester.id)
-    
-    # Annotate posts with priority (previous chat users get higher priority)
-    if opposite_users == 'japanese':
-        posts = posts.annotate(
-            priority=Case(
-                When(japanese_user__id__in=previous_chat_users, then=1),
-                default=0,
-                output_field=IntegerField(),
-            )
-        ).order_by('-priority', '-created_at')
-    else:
-        posts = posts.annotate(
-            priority=Case(
-                When(vietnamese_user__id__in=previous_chat_users, then=1),
-                default=0,
-                output_field=IntegerField(),
-            )
-        ).order_by('-priority', '-created_at')
+    page, next_cursor = sorted_page(ranked, rank_key, request.GET.get('cursor'))
+    
+    # Only the current page is loaded from the database
+    posts_by_id = LanguageExchangePost.objects.select_related(
+        f'{opposite_users}_user', 'phrase', 'cafe_location'
+    ).in_bulk([post_id for _, _, post_id in page])
+    posts = []
+    for priority, _, post_id in page:
+        post = posts_by_id.get(post_id)
+        if post is None or post.status != 'active':  # Feed entry not yet updated by another process
+            continue
+        post.priority = priority
+        if cafe_distances is not None:
+            post.distance_km = cafe_distances.get(post.cafe_location_id)
+        posts.append(post)
+    
+    if wants_json(request):
+        return page_response(request, 'event_search/includes/available_post_cards.html', {'posts': posts}, next_cursor)
     
     context = {
         'posts': posts,
+        'total_count': len(ranked) - (len(page) - len(posts)),  # Stale entries on the page not counted
+        'next_cursor': next_cursor,
         'selected_city': city,
         'cities': request.user.CITY_CHOICES,
-        'opposite_users': opposite_users
+        'opposite_users': opposite_users,
+        'near_point': point,
+        'selected_radius': radius,
+        'radius_choices': RADIUS_CHOICES_KM,
     }
     
     return render(request, 'event_search/available_posts.html', context)
 
 
 
+@query_budget(8)
 @login_required
 def find_partners(request):
     """
     Find compatible language exchange partners based on user nationality
     Japanese users can help Vietnamese users learn Japanese and vice versa
     Supports filtering by city and request type
-    Prioritizes users who have been matched before
+    Ranks requests with the matching engine (event_search.matching)
     """
     city = request.GET.get('city', '')
     request_type = request.GET.get('request_type', '')
     
-    # Find compatible partner requests based on user nationality
-    if request.user.nationality == 'japanese':
-        # Japanese users can help Vietnamese users learn Japanese
-        compatible_requests = PartnerRequest.objects.filter(
-            status='active',
-            requester__nationality='vietnamese',
-            request_type__in=['vietnamese_to_japanese', 'both']
-        )
-    else:
-        # Vietnamese users can help Japanese users learn Vietnamese
-        compatible_requests = PartnerRequest.objects.filter(
-            status='active',
-            requester__nationality='japanese',
-            request_type__in=['japanese_to_vietnamese', 'both']
-        )
+    # Compatible requests (opposite nationality, matching request type), best match first
+    ranking = matching.ranked_requests(request.user)
     
     # Filter by city if specified
     if city and city != 'any':
-        compatible_requests = compatible_requests.filter(
-            Q(preferred_city=city) | Q(preferred_city='any')
-        )
+        ranking = [entry for entry in ranking if entry[2] in (city, 'any')]
     
     # Filter by request type if specified
     if request_type:
-        compatible_requests = compatible_requests.filter(request_type=request_type)
-    
-    # Get users that current user has chatted with before
-    from chat_system.models import ChatRoom
-    previous_chat_users = set()
-    
-    # Find all chat rooms where current user was involved
-    user_chat_rooms = ChatRoom.objects.filter(
-        Q(post__japanese_user=request.user) | 
-        Q(post__vietnamese_user=request.user) |
-        Q(partner_request__requester=request.user) |
-        Q(partner_request__accepted_by=request.user)
-    )
-    
-    # Extract unique users from previous chats
-    for chat_room in user_chat_rooms:
-        if chat_room.post:
-            if chat_room.post.japanese_user == request.user:
-                previous_chat_users.add(chat_room.post.vietnamese_user.id)
-            else:
-                previous_chat_users.add(chat_room.post.japanese_user.id)
-        elif chat_room.partner_request:
-            if chat_room.partner_request.requester == request.user:
-                if chat_room.partner_request.accepted_by:
-                    previous_chat_users.add(chat_room.partner_request.accepted_by.id)
-            else:
-                previous_chat_users.add(chat_room.partner_request.requester.id)
-    
-    # Annotate requests with priority (previous chat users get higher priority)
-    compatible_requests = compatible_requests.annotate(
-        priority=Case(
-            When(requester__id__in=previous_chat_users, then=1),
-            default=0,
-            output_field=IntegerField(),
-        )
-    ).order_by('-priority', '-created_at')
+        ranking = [entry for entry in ranking if entry[3] == request_type]
+    
+    # Only the requests on the current page are read, by primary key
+    rank_key = lambda entry: (-entry[0], -entry[1])  # (-score, -id)
+    page, next_cursor = sorted_page(ranking, rank_key, request.GET.get('cursor'))
+    requests_by_id = PartnerRequest.objects.select_related('requester').in_bulk([entry[1] for entry in page])
+    partner_requests = []
+    for score, request_id, _, _, matched_before in page:
+        partner_request = requests_by_id.get(request_id)
+        if partner_request is None or partner_request.status != 'active':
+            continue
+        partner_request.match_score = round(score * 100)
+        partner_request.priority = 1 if matched_before else 0
+        partner_requests.append(partner_request)
+    
+    if wants_json(request):
+        return page_response(request, 'event_search/includes/partner_request_cards.html',
+                             {'partner_requests': partner_requests}, next_cursor)
     
     context = {
-        'partner_requests': compatible_requests,
+        'partner_requests': partner_requests,
+        'next_cursor': next_cursor,
         'selected_city': city,
         'selected_request_type': request_type,
         'cities': request.user.CITY_CHOICES,
         'request_types': PartnerRequest.REQUEST_TYPE_CHOICES,
     }
     
-    return render(request, 'event_search/find_partners.html', context)
\ No newline at end of file
+    return render(request, 'event_search/find_partners.html', context)
+
+@query_budget(8)
+@login_required
+def content_search(request):
+    """
+    Search phrases, lessons and theory content (event_search.search)
+    ?q= query, ?kind= one of search.KINDS to narrow it, ?format=json for the API
+    """
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind', '')
+    kinds = [kind] if kind in search.SOURCES else None
+    results = search.search(query, kinds)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'success': True, 'query': query, 'results': results})
+    
+    context = {
+        'query': query,
+        'selected_kind': kind if kinds else '',
+        'kinds': search.KINDS,
+        'results': results,
+    }
+    
+    return render(request, 'event_search/content_search.html', context)
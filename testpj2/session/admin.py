@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import StudyScript, StudyLine
 
-# Register your models here.
+
+class StudyLineInline(admin.TabularInline):
+    model = StudyLine
+    extra = 1
+    fields = ['order', 'side', 'text']
+
+
+@admin.register(StudyScript)
+class StudyScriptAdmin(admin.ModelAdmin):
+    """Admin interface for the chat-style study scripts (edits show up without a deploy)"""
+    list_display = ['phrase_number', 'title', 'updated_at']
+    search_fields = ['title']
+    ordering = ['phrase_number']
+    inlines = [StudyLineInline]
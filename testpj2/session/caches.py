@@ -0,0 +1,8 @@
+"""
+Cache namespaces for session data (see vietnam_japan_connect.caching)
+Each one is dropped whenever one of its models changes (hooked up in session.signals)
+"""
+
+from vietnam_japan_connect.caching import CacheNamespace
+
+SCRIPTS = CacheNamespace('session:scripts', timeout=86400)
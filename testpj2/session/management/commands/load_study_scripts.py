@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from session.scripts import SCRIPTS_FILE, load_scripts_file
+
+
+class Command(BaseCommand):
+    help = 'Create or replace the study scripts (study_detail pages) from a JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=SCRIPTS_FILE,
+                            help='JSON list of {phrase_number, title, lines: [{side, text}]} (default: session/study_scripts.json)')
+
+    def handle(self, *args, **options):
+        count = load_scripts_file(options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Loaded {count} study scripts'))
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('session', '0002_delete_evaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudyScript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase_number', models.PositiveIntegerField(help_text='Number in the study_phrase URL', unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['phrase_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StudyLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('side', models.CharField(choices=[('system', 'System'), ('left', 'Teacher'), ('right', 'Student')], max_length=10)),
+                ('text', models.TextField(help_text='Vietnamese line, then the translation on the next line')),
+                ('script', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='session.studyscript')),
+            ],
+            options={
+                'ordering': ['script', 'order'],
+                'unique_together': {('script', 'order')},
+            },
+        ),
+    ]
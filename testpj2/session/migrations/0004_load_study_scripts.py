@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+from django.db import migrations
+
+SCRIPTS_FILE = Path(__file__).resolve().parent.parent / 'study_scripts.json'
+
+
+def load_study_scripts(apps, schema_editor):
+    # The scripts that used to be hardcoded in session.views.study_detail
+    StudyScript = apps.get_model('session', 'StudyScript')
+    StudyLine = apps.get_model('session', 'StudyLine')
+    with open(SCRIPTS_FILE, encoding='utf-8') as f:
+        scripts = json.load(f)
+    for data in scripts:
+        script, _ = StudyScript.objects.update_or_create(phrase_number=data['phrase_number'], defaults={'title': data['title']})
+        script.lines.all().delete()
+        StudyLine.objects.bulk_create([
+            StudyLine(script=script, order=order, side=line['side'], text=line['text'])
+            for order, line in enumerate(data['lines'])
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0003_study_scripts'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_study_scripts, migrations.RunPython.noop),
+    ]
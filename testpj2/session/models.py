@@ -1,3 +1,35 @@
 from django.db import models
 
-# Create your models here.
+
+class StudyScript(models.Model):
+    """Chat-style study script shown by study_detail (/session/study_phrase/<phrase_number>/)"""
+    phrase_number = models.PositiveIntegerField(unique=True, help_text="Number in the study_phrase URL")
+    title = models.CharField(max_length=200)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['phrase_number']
+
+    def __str__(self):
+        return f"{self.phrase_number}: {self.title}"
+
+
+class StudyLine(models.Model):
+    """One message of a study script: a section heading (system) or a teacher / student line"""
+    SIDE_CHOICES = [
+        ('system', 'System'),
+        ('left', 'Teacher'),
+        ('right', 'Student'),
+    ]
+
+    script = models.ForeignKey(StudyScript, on_delete=models.CASCADE, related_name='lines')
+    order = models.PositiveIntegerField(default=0)
+    side = models.CharField(max_length=10, choices=SIDE_CHOICES)
+    text = models.TextField(help_text="Vietnamese line, then the translation on the next line")
+
+    class Meta:
+        ordering = ['script', 'order']
+        unique_together = ['script', 'order']
+
+    def __str__(self):
+        return f"{self.script.phrase_number}#{self.order} ({self.side})"
@@ -0,0 +1,83 @@
+"""
+Study Scripts
+Compiled copies of the StudyScript rows served by session.views.study_detail
+- A compiled script is immutable: its lines frozen into a tuple of StudyMessage pairs,
+  plus a digest of the content for the page's ETag
+- Compiled once (two queries), cached in the SCRIPTS namespace and interned per process,
+  so a request costs one cache read for the namespace version whatever the script length
+- Any script or line change bumps the namespace version (session.signals)
+- load_scripts imports scripts from JSON (study_scripts.json holds the original ones,
+  see the load_study_scripts command)
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+from pathlib import Path
+from django.db import transaction
+from . import caches
+from .models import StudyScript, StudyLine
+
+SCRIPTS_FILE = Path(__file__).resolve().parent / 'study_scripts.json'
+
+StudyMessage = namedtuple('StudyMessage', ['side', 'text'])
+CompiledScript = namedtuple('CompiledScript', ['phrase_number', 'title', 'messages', 'digest'])
+
+# phrase_number -> (SCRIPTS version, CompiledScript)
+_interned = {}
+
+
+def compile_script(phrase_number):
+    """The compiled script, None if there is no such script"""
+    title = StudyScript.objects.filter(phrase_number=phrase_number).values_list('title', flat=True).first()
+    if title is None:
+        return None
+    messages = tuple(
+        StudyMessage(side, text)
+        for side, text in StudyLine.objects.filter(script__phrase_number=phrase_number).values_list('side', 'text')
+    )
+    content = json.dumps([title, messages], ensure_ascii=False).encode()
+    return CompiledScript(phrase_number, title, messages, hashlib.md5(content).hexdigest())
+
+
+def get_script(phrase_number):
+    """The compiled script (None if there is no such script), reused while the namespace version holds"""
+    version = caches.SCRIPTS.version()
+    entry = _interned.get(phrase_number)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    script = caches.SCRIPTS.get('script', phrase_number)
+    if script is None:
+        script = compile_script(phrase_number)
+        # Misses are neither cached nor interned: arbitrary numbers from the URL must not
+        # fill the cache or grow the table
+        if script is None:
+            return None
+        caches.SCRIPTS.set(('script', phrase_number), script)
+    _interned[phrase_number] = (version, script)
+    return script
+
+
+def load_scripts(scripts):
+    """
+    Create or replace scripts from [{'phrase_number', 'title', 'lines': [{'side', 'text'}]}];
+    scripts missing from the list are left alone
+    """
+    with transaction.atomic():
+        for data in scripts:
+            script, _ = StudyScript.objects.update_or_create(
+                phrase_number=data['phrase_number'], defaults={'title': data['title']},
+            )
+            script.lines.all().delete()
+            StudyLine.objects.bulk_create([
+                StudyLine(script=script, order=order, side=line['side'], text=line['text'])
+                for order, line in enumerate(data['lines'])
+            ])
+    # bulk_create sends no post_save, drop the compiled copies here
+    transaction.on_commit(caches.SCRIPTS.invalidate)
+    return len(scripts)
+
+
+def load_scripts_file(path=SCRIPTS_FILE):
+    with open(path, encoding='utf-8') as f:
+        return load_scripts(json.load(f))
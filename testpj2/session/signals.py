@@ -0,0 +1,9 @@
+"""
+Session Signals
+Drop the compiled study scripts (session.caches.SCRIPTS) whenever a script or one of its lines changes
+"""
+
+from . import caches
+from .models import StudyScript, StudyLine
+
+caches.SCRIPTS.invalidate_on(StudyScript, StudyLine)
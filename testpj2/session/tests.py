@@ -1,3 +1,46 @@
+import json
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from . import caches, scripts
+from .models import StudyLine
 
-# Create your tests here.
+
+class StudyScriptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        scripts._interned.clear()
+
+    def test_every_script_renders(self):
+        # The scripts are loaded by migration 0004 from the same file
+        with open(scripts.SCRIPTS_FILE, encoding='utf-8') as f:
+            expected = json.load(f)
+        for data in expected:
+            response = self.client.get(reverse('study_phrase', args=[data['phrase_number']]))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [(message.side, message.text) for message in response.context['messages']],
+                [(line['side'], line['text']) for line in data['lines']],
+            )
+
+    def test_etag_revalidation(self):
+        url = reverse('study_phrase', args=[1])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Editing the script changes the digest, so the old ETag no longer matches
+        with self.captureOnCommitCallbacks(execute=True):
+            line = StudyLine.objects.filter(script__phrase_number=1).first()
+            line.text = 'Changed'
+            line.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unknown_script_is_not_cached(self):
+        self.assertEqual(self.client.get(reverse('study_phrase', args=[999])).status_code, 404)
+        self.assertIsNone(caches.SCRIPTS.get('script', 999))
+        self.assertNotIn(999, scripts._interned)
@@ -4,10 +4,12 @@ from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
+from django.http import HttpResponseNotModified, Http404
 from user_profile.models import CustomUser
 from event_creation.models import LanguageExchangePost
 from django.shortcuts import render
 from django.contrib import messages
+from .scripts import get_script
 
 """
 Session Views for Language Exchange Platform
@@ -151,154 +153,25 @@ def list(request):
     return render(request, 'session/list.html', context)
 
 def study_detail(request, phrase_id):
-    if phrase_id == 1:
-        messages = [
-            {'side': 'system', 'text': '＜１＞lời chào\n「挨拶」を学ぼう'},
-            {'side': 'left', 'text': 'Xin chào.\n(こんにちは)'},
-            {'side': 'right', 'text': 'Xin chào.\n(こんにちは)'},
-            {'side': 'system', 'text': '＜２＞TÔI\n「私」を学ぼう'},
-            {'side': 'left', 'text': 'Lặp lại theo tôi.\n(私が読んだ後に繰り返してください)'},
-            {'side': 'left', 'text': 'Tôi là Minh.\n(私はMinhです。)'},
-            {'side': 'right', 'text': 'Tôi là Minh.\n(私はMinhです。)'},
-            {'side': 'left', 'text': 'Tôi là Hayato.\n(私はHayatoです。)'},
-            {'side': 'right', 'text': 'Tôi là Hayato.\n(私はHayatoです。)'},
-            {'side': 'left', 'text': 'Tôi là giáo viên.\n(私は先生です。)'},
-            {'side': 'right', 'text': 'Tôi là giáo viên.\n(私は先生です。)'},
-            {'side': 'left', 'text': 'Tôi là học sinh.\n(私は学生です。)'},
-            {'side': 'right', 'text': 'Tôi là học sinh.\n(私は学生です。)'},
-            {'side': 'left', 'text': 'Tôi là người Việt Nam.\n(私はベトナム人です。)'},
-            {'side': 'right', 'text': 'Tôi là người Việt Nam.\n(私はベトナム人です。)'},
-            {'side': 'left', 'text': 'Tôi là người Nhật.\n(私は日本人です。)'},
-            {'side': 'right', 'text': 'Tôi là người Nhật.\n(私は日本人です。)'},
-            {'side': 'system', 'text': '＜３＞Bạn\n「あなた」を学ぼう'},
-            {'side': 'left', 'text': 'Lặp lại theo tôi.\n(私が読んだ後に繰り返してください)'},
-            {'side': 'left', 'text': 'Bạn là Minh.\n(あなたはMinhです。)'},
-            {'side': 'right', 'text': 'Bạn là Minh.\n(あなたはMinhです。)'},
-            {'side': 'left', 'text': 'Bạn là Hayato.\n(あなたはHayatoです。)'},
-            {'side': 'right', 'text': 'Bạn là Hayato.\n(あなたはHayatoです。)'},
-            {'side': 'left', 'text': 'Bạn là giáo viên.\n(あなたは先生ですか？)'},
-            {'side': 'right', 'text': 'Bạn là giáo viên.\n(あなたは先生ですか？)'},
-            {'side': 'left', 'text': 'Bạn là học sinh.\n(あなたは学生ですか？)'},
-            {'side': 'right', 'text': 'Bạn là học sinh.\n(あなたは学生ですか？)'},
-            {'side': 'left', 'text': 'Bạn là người Việt Nam.\n(あなたはベトナム人ですか？)'},
-            {'side': 'right', 'text': 'Bạn là người Việt Nam.\n(あなたはベトナム人ですか？)'},
-            {'side': 'left', 'text': 'Bạn là người Nhật.\n(あなたは日本人ですか？)'},
-            {'side': 'right', 'text': 'Bạn là người Nhật.\n(あなたは日本人ですか？)'},
-            {'side': 'system', 'text': '＜４＞Bạn có phải\n「あなたは～ですか？」を学ぼう'},
-            {'side': 'left', 'text': 'Lặp lại theo tôi.\n(私が読んだ後に繰り返してください)'},
-            {'side': 'left', 'text': 'Bạn có phải là Minh？\n(あなたはMinhですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là Minh？\n(あなたはMinhですか？)'},
-            {'side': 'left', 'text': 'Bạn có phải là Hayato？\n(あなたはHayatoですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là Hayato？\n(あなたはHayatoですか？)'},
-            {'side': 'left', 'text': 'Bạn có phải là giáo viên？\n(あなたは先生ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là giáo viên？\n(あなたは先生ですか？)'},
-            {'side': 'left', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'left', 'text': 'Bạn có phải là người Việt Nam？\n(あなたはベトナム人ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là người Việt Nam？\n(あなたはベトナム人ですか？)'},
-            {'side': 'left', 'text': 'Bạn có phải là người Nhật？\n(あなたは日本人ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là người Nhật？\n(あなたは日本人ですか？)'},
-            {'side': 'system', 'text': '＜５＞Vâng・Không\n「はい・いいえ」を学ぼう'},
-            {'side': 'left', 'text': 'Bạn có phải là Hayato？\n(あなたはHayatoですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là Hayato？\n(あなたはHayatoですか？)'},
-            {'side': 'left', 'text': 'Vâng, tôi là Hayato.\n(はい、私はHayatoです。)'},
-            {'side': 'right', 'text': 'Vâng, tôi là Hayato.\n(はい、私はHayatoです。)'},
-            {'side': 'left', 'text': 'Không, tôi là Minh.\n(いいえ、私はMinhです。)'},
-            {'side': 'right', 'text': 'Không, tôi là Minh.\n(いいえ、私はMinhです。)'},
-            {'side': 'left', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'left', 'text': 'Vâng, tôi là học sinh.\n(はい、私は学生です。)'},
-            {'side': 'right', 'text': 'Vâng, tôi là học sinh.\n(はい、私は学生です。)'},
-            {'side': 'left', 'text': 'Không, tôi là giáo viên.\n(いいえ、私は先生です。)'},
-            {'side': 'right', 'text': 'Không, tôi là giáo viên.\n(いいえ、私は先生です。)'},
-            {'side': 'left', 'text': 'Bạn có phải là người Nhật？\n(あなたは日本人ですか？)'},
-            {'side': 'right', 'text': 'Bạn có phải là người Nhật？\n(あなたは日本人ですか？)'},
-            {'side': 'left', 'text': 'Vâng, tôi là người Nhật.\n(はい、私は日本人です。)'},
-            {'side': 'right', 'text': 'Vâng, tôi là người Nhật.\n(はい、私は日本人です。)'},
-            {'side': 'left', 'text': 'Không, tôi là người Việt Nam.\n(いいえ、私はベトナム人です。)'},
-            {'side': 'right', 'text': 'Không, tôi là người Việt Nam.\n(いいえ、私はベトナム人です。)'},
-            {'side': 'system', 'text': '＜６＞trò chuyện①\n学んだ表現を使って会話しよう①'},
-            {'side': 'left', 'text': 'Xin chào! Tôi là Minh.\n(こんにちは！私はMinhです。)'},
-            {'side': 'right', 'text': 'Xin chào! Tôi là Hayato.\n(こんにちは！私はHayatoです。)'},
-            {'side': 'left', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'right', 'text': 'Vâng, tôi là học sinh. Bạn có phải là giáo viên？\n(はい、私は学生です。あなたは先生ですか？)'},
-            {'side': 'left', 'text': 'Vâng, tôi là giáo viên. Bạn có phải là người Việt Nam？\n(はい、私は先生です。あなたはベトナム人ですか？)'},
-            {'side': 'right', 'text': 'Không, tôi là người Nhật. Bạn có phải là người Nhật？\n(いいえ、私は日本人です。あなたは日本人ですか？)'},
-            {'side': 'left', 'text': 'Không, tôi là người Việt Nam.\n(いいえ、私はベトナム人です。)'},
-            {'side': 'system', 'text': '＜６＞trò chuyện②\n学んだ表現を使って会話しよう②'},
-            {'side': 'right', 'text': 'Xin chào! Tôi là Minh.\n(こんにちは！私はMinhです。)'},
-            {'side': 'left', 'text': 'Xin chào! Tôi là Hayato.\n(こんにちは！私はHayatoです。)'},
-            {'side': 'right', 'text': 'Bạn có phải là học sinh？\n(あなたは学生ですか？)'},
-            {'side': 'left', 'text': 'Vâng, tôi là học sinh. Bạn có phải là giáo viên？\n(はい、私は学生です。あなたは先生ですか？)'},
-            {'side': 'right', 'text': 'Vâng, tôi là giáo viên. Bạn có phải là người Việt Nam？\n(はい、私は先生です。あなたはベトナム人ですか？)'},
-            {'side': 'left', 'text': 'Không, tôi là người Nhật. Bạn có phải là người Nhật？\n(いいえ、私は日本人です。あなたは日本人ですか？)'},
-            {'side': 'right', 'text': 'Không, tôi là người Việt Nam.\n(いいえ、私はベトナム人です。)'},
-        ]
-    elif phrase_id == 2:
-        # Chủ đề: Chào buổi sáng
-        messages = [
-            {'side': 'system', 'text': '＜２＞Chào buổi sáng\n「おはよう」を学ぼう'},
-            {'side': 'left', 'text': 'Chào buổi sáng.\n(おはようございます。)'},
-            {'side': 'right', 'text': 'Chào buổi sáng.\n(おはようございます。)'},
-            {'side': 'left', 'text': 'Chào nhé! (thân mật)\n(おはよう。)'},
-            {'side': 'right', 'text': 'Chào nhé! (thân mật)\n(おはよう。)'},
-            {'side': 'left', 'text': 'Chúc bạn một ngày tốt lành.\n(良い一日を。)'},
-            {'side': 'right', 'text': 'Cảm ơn. Bạn cũng vậy nhé.\n(ありがとうございます。あなたも良い一日を。)'},
-            {'side': 'system', 'text': '＜練習＞　Lặp lại và đối thoại ngắn'},
-            {'side': 'left', 'text': 'おはようございます。私はMinhです。\n(Chào buổi sáng. Tôi là Minh.)'},
-            {'side': 'right', 'text': 'おはようございます。私はHayatoです。\n(Chào buổi sáng. Tôi là Hayato.)'},
-        ]
-    elif phrase_id == 3:
-        # Chủ đề: Chào buổi trưa
-        messages = [
-            {'side': 'system', 'text': '＜３＞Chào buổi trưa\n「こんにちは」を学ぼう'},
-            {'side': 'left', 'text': 'Chào buổi trưa.\n(こんにちは。)'},
-            {'side': 'right', 'text': 'Chào buổi trưa.\n(こんにちは。)'},
-            {'side': 'left', 'text': 'Bạn đã ăn trưa chưa？\n(もうお昼ご飯を食べましたか？)'},
-            {'side': 'right', 'text': 'Chưa, mình định đi ăn bây giờ.\n(まだです。これから食べに行く予定です。)'},
-            {'side': 'left', 'text': 'Chúc bữa trưa vui vẻ.\n(良いお昼を。)'},
-            {'side': 'right', 'text': 'Cảm ơn bạn.\n(ありがとうございます。)'},
-        ]
-    elif phrase_id == 4:
-        # Chủ đề: Chào buổi tối
-        messages = [
-            {'side': 'system', 'text': '＜４＞Chào buổi tối\n「こんばんは」を学ぼう'},
-            {'side': 'left', 'text': 'Chào buổi tối.\n(こんばんは。)'},
-            {'side': 'right', 'text': 'Chào buổi tối.\n(こんばんは。)'},
-            {'side': 'left', 'text': 'Bạn đã ăn tối chưa？\n(もう夕食を食べましたか？)'},
-            {'side': 'right', 'text': 'Rồi, mình đã ăn rồi.\n(はい、もう食べました。)'},
-            {'side': 'left', 'text': 'Chúc ngủ ngon sau nhé.\n(おやすみなさい。)'},
-            {'side': 'right', 'text': 'Ngủ ngon nhé.\n(おやすみなさい。)'},
-        ]
-    elif phrase_id == 5:
-        # Chủ đề: Bạn khỏe không?
-        messages = [
-            {'side': 'system', 'text': '＜５＞Bạn khỏe không\n「お元気ですか？」を学ぼう'},
-            {'side': 'left', 'text': 'Bạn khỏe không?\n(お元気ですか？)'},
-            {'side': 'right', 'text': 'Bạn khỏe không?\n(お元気ですか？)'},
-            {'side': 'left', 'text': 'Hôm nay bạn có khỏe không?\n(今日はお元気ですか？)'},
-            {'side': 'right', 'text': 'Tôi hơi mệt nhưng ổn.\n(少し疲れていますが、大丈夫です。)'},
-            {'side': 'left', 'text': 'Bạn có cần nghỉ không?\n(休んだ方がいいですか？)'},
-            {'side': 'right', 'text': 'Không, cảm ơn. Tôi ổn.\n(いいえ、大丈夫です。ありがとう。)'},
-        ]
-    elif phrase_id == 6:
-        # Chủ đề: Tôi khỏe, cảm ơn
-        messages = [
-            {'side': 'system', 'text': '＜６＞Tôi khỏe, cảm ơn\n「元気です、ありがとう」を学ぼう'},
-            {'side': 'left', 'text': 'Tôi khỏe, cảm ơn.\n(元気です、ありがとう。)'},
-            {'side': 'right', 'text': 'Tôi khỏe, cảm ơn.\n(元気です、ありがとう。)'},
-            {'side': 'left', 'text': 'Rất vui khi nghe vậy.\n(それは良かったです。)'},
-            {'side': 'right', 'text': 'Cảm ơn bạn.\n(ありがとうございます。)'},
-            {'side': 'left', 'text': 'Nếu mệt thì hãy nghỉ nhé.\n(疲れたら休んでくださいね。)'},
-        ]
-    else:
-        messages = []
+    """Chat-style study script, served from its compiled copy (session.scripts)"""
+    script = get_script(phrase_id)
+    if script is None:
+        raise Http404('No such study script')
+    
+    # The page only depends on the script and the language: revalidation skips rendering
+    etag = f'"{phrase_id}-{request.LANGUAGE_CODE}-{script.digest}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
 
     context = {
-        'messages': messages,
+        'messages': script.messages,
         'left_icon': 'images/session/teacher.png',
         'left_name': '先生/giáo viên',
         'right_icon': 'images/session/student.png',
         'right_name': '生徒/học sinh',
     }
-    return render(request, 'session/study.html', context)
\ No newline at end of file
+    response = render(request, 'session/study.html', context)
+    response['ETag'] = etag
+    return response
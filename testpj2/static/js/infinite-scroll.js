@@ -0,0 +1,74 @@
+/**
+ * Infinite Scroll
+ * Loads further pages of a list rendered with vietnam_japan_connect.pagination.
+ * Markup: a container with data-infinite-scroll and data-next-cursor, followed by
+ * an element with data-infinite-scroll-sentinel; pages come from ?format=json.
+ */
+
+(function() {
+    'use strict';
+    
+    function setup(container) {
+        const sentinel = container.parentNode.querySelector('[data-infinite-scroll-sentinel]');
+        let loading = false;
+        
+        function loadMore() {
+            const cursor = container.dataset.nextCursor;
+            if (loading || !cursor) {
+                return;
+            }
+            loading = true;
+            
+            // Keep the current filters, only add the cursor
+            const params = new URLSearchParams(window.location.search);
+            params.set('cursor', cursor);
+            params.set('format', 'json');
+            
+            fetch(window.location.pathname + '?' + params.toString(), {
+                headers: {'X-Requested-With': 'XMLHttpRequest'},
+                credentials: 'same-origin'
+            })
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function(data) {
+                    container.insertAdjacentHTML('beforeend', data.html);
+                    container.dataset.nextCursor = data.next_cursor || '';
+                    if (!data.next_cursor && sentinel) {
+                        sentinel.style.display = 'none';
+                    }
+                })
+                .catch(function(error) {
+                    console.error('Error loading more items:', error);
+                })
+                .finally(function() {
+                    loading = false;
+                });
+        }
+        
+        if (!sentinel) {
+            return;
+        }
+        if (!container.dataset.nextCursor) {
+            sentinel.style.display = 'none';
+            return;
+        }
+        
+        if ('IntersectionObserver' in window) {
+            new IntersectionObserver(function(entries) {
+                if (entries.some(function(entry) { return entry.isIntersecting; })) {
+                    loadMore();
+                }
+            }, {rootMargin: '300px'}).observe(sentinel);
+        }
+        // The sentinel doubles as a "load more" button for browsers without IntersectionObserver
+        sentinel.addEventListener('click', loadMore);
+    }
+    
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('[data-infinite-scroll]').forEach(setup);
+    });
+})();
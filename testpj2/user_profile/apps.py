@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class UserProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'user_profile'
\ No newline at end of file
+    name = 'user_profile'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal handlers)
@@ -0,0 +1,18 @@
+"""
+Authentication backend that loads request.user from the cached session principal
+(user_profile.principal) instead of the full user row on every request
+"""
+
+from django.contrib.auth.backends import ModelBackend
+from .principal import get_principal
+
+
+class PrincipalBackend(ModelBackend):
+    """ModelBackend (username/password login, permissions) with a cached get_user"""
+
+    def get_user(self, user_id):
+        principal = get_principal(user_id)
+        if principal is None:
+            return None
+        user = principal.to_user()
+        return user if self.user_can_authenticate(user) else None
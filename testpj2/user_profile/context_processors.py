@@ -1,17 +1,21 @@
+from .principal import request_principal
+
+
 def user_language_context(request):
     """
     Context processor to set the appropriate language for menu display
     based on user's nationality
     """
-    if request.user.is_authenticated:
+    principal = request_principal(request)
+    if principal is not None:
         # Set language based on user's nationality
-        if request.user.nationality == 'japanese':
+        if principal.nationality == 'japanese':
             return {
                 'user_language': 'ja',
                 'is_japanese_user': True,
                 'is_vietnamese_user': False
             }
-        elif request.user.nationality == 'vietnamese':
+        elif principal.nationality == 'vietnamese':
             return {
                 'user_language': 'vi',
                 'is_japanese_user': False,
@@ -0,0 +1,69 @@
+"""
+Dashboard Data
+What the dashboard shows, computed without writes and mostly from the cache
+- The "available posts" block (count and newest posts of the other nationality in the
+  user's city) is a per-(city, nationality) snapshot built from the cached feeds in
+  event_search.feeds, cached for a short time in the POSTS cache
+  namespace, which is dropped whenever a post is saved or deleted
+- The user's own numbers are one aggregate query
+"""
+
+from heapq import merge
+from django.db.models import Count, Q
+from event_creation.caches import POSTS
+from event_creation.models import LanguageExchangePost
+from event_search import feeds
+from .models import CustomUser
+
+SNAPSHOT_CACHE_TIMEOUT = 60
+AVAILABLE_POSTS_SHOWN = 6
+RECENT_POSTS_SHOWN = 5
+
+
+def other_nationality(nationality):
+    return 'vietnamese' if nationality == 'japanese' else 'japanese'
+
+
+def available_snapshot(city, nationality):
+    """
+    {'count', 'posts'} for the active posts created by `nationality` users in `city`
+    (every city when city is empty), newest posts first
+    """
+    def build():
+        if city:
+            entries = feeds.available_feed(city, nationality)
+        else:
+            entries = list(merge(*(feeds.available_feed(code, nationality) for code, _ in CustomUser.CITY_CHOICES)))
+        newest_ids = [entry[1] for entry in reversed(entries[-AVAILABLE_POSTS_SHOWN:])]
+        posts = LanguageExchangePost.objects.select_related(
+            f'{nationality}_user', 'phrase', 'cafe_location',
+        ).in_bulk(newest_ids)
+        return {
+            'count': len(entries),
+            'posts': [posts[post_id] for post_id in newest_ids if post_id in posts],
+        }
+    return POSTS.get_or_set(('dashboard', city or 'all', nationality), build, SNAPSHOT_CACHE_TIMEOUT)
+
+
+def user_posts(user):
+    """The user's own posts (as creator)"""
+    return LanguageExchangePost.objects.filter(**{
+        f'{user.nationality}_user': user,
+        'user_type': user.nationality,
+    })
+
+
+def dashboard_context(user):
+    city = user.city if user.city != 'any' else ''
+    snapshot = available_snapshot(city, other_nationality(user.nationality))
+    posts = user_posts(user)
+    counts = posts.aggregate(total=Count('id'), matched=Count('id', filter=Q(status='matched')))
+    return {
+        'user': user,
+        'available_posts': snapshot['posts'],
+        'available_posts_count': snapshot['count'],
+        'accepted_posts_count': counts['matched'],
+        'posts_count': counts['total'],
+        # Lazy, only queried by the templates that show it
+        'recent_posts': posts.select_related('phrase', 'cafe_location')[:RECENT_POSTS_SHOWN],
+    }
@@ -7,6 +7,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from functools import wraps
+from .principal import request_principal
 
 def profile_complete_required(view_func):
     """
@@ -15,13 +16,14 @@ def profile_complete_required(view_func):
     """
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if request.user.is_authenticated:
+        principal = request_principal(request)
+        if principal is not None:
             # Skip check for admin users
-            if request.user.is_staff:
+            if principal.is_staff:
                 return view_func(request, *args, **kwargs)
             
             # Check if user has complete profile
-            if not request.user.gender or not request.user.date_of_birth or not request.user.city:
+            if not principal.profile_complete:
                 messages.warning(request, 'Vui lòng hoàn thiện thông tin cá nhân để tiếp tục sử dụng hệ thống.')
                 return redirect('profile')
         
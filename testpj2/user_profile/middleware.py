@@ -1,11 +1,24 @@
 """
 Session Security Middleware
 Handles session management and prevents back button issues after login
+
+Request Metrics Middleware
+Measures query count, DB time, template time and latency per view (vietnam_japan_connect.metrics)
 """
 
+import json
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import reverse, resolve, Resolver404
 from django.contrib import messages
+from vietnam_japan_connect import metrics
+from .principal import request_principal
+
+logger = logging.getLogger('request_metrics')
 
 class SessionSecurityMiddleware:
     """
@@ -18,13 +31,14 @@ class SessionSecurityMiddleware:
     
     def __call__(self, request):
         # Check if user is authenticated and needs to complete profile
-        if request.user.is_authenticated:
+        principal = request_principal(request)
+        if principal is not None:
             # Skip check for admin users
-            if request.user.is_staff:
+            if principal.is_staff:
                 return self.get_response(request)
             
             # Check if user needs to complete profile
-            if not request.user.gender or not request.user.date_of_birth or not request.user.city:
+            if not principal.profile_complete:
                 # Allow access to profile page and logout
                 allowed_paths = [
                     '/auth/profile/',
@@ -60,3 +74,66 @@ class SessionSecurityMiddleware:
                 return redirect('dashboard')
         
         return None
+
+
+class RequestMetricsMiddleware:
+    """
+    Records every request in vietnam_japan_connect.metrics and logs it as one JSON line
+    Listed first in MIDDLEWARE so the session, user and context processor queries count too
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_metrics.set(request_metrics)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(request_metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.current_metrics.reset(token)
+        duration = perf_counter() - started
+        
+        view = view_label(request)
+        budget = getattr(request, 'query_budget', None)
+        over_budget = budget is not None and request_metrics.queries > budget
+        metrics.registry.record(view, request.method, response.status_code, request_metrics, duration, over_budget)
+        
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': request_metrics.queries,
+            'db_ms': round(request_metrics.db_seconds * 1000, 2),
+            'template_ms': round(request_metrics.template_seconds * 1000, 2),
+            'total_ms': round(duration * 1000, 2),
+        }))
+        if over_budget:
+            message = f'{view} issued {request_metrics.queries} queries, over its budget of {budget}'
+            if getattr(settings, 'QUERY_BUDGETS_ENFORCED', False):
+                raise metrics.QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Declared with @metrics.query_budget on the view
+        request.query_budget = getattr(view_func, 'query_budget', None)
+        return None
+
+
+def view_label(request):
+    """
+    The URL name of the requested view, also for requests a middleware answered before
+    URL resolution (e.g. redirects); 'unmatched' only for paths no URL pattern matches
+    """
+    if request.resolver_match is not None:
+        return request.resolver_match.view_name
+    try:
+        return resolve(request.path_info, getattr(request, 'urlconf', None)).view_name
+    except Resolver404:
+        return 'unmatched'
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def set_japanese_preferred_language(apps, schema_editor):
+    # Used to be written by every dashboard visit, now set by CustomUser.save
+    CustomUser = apps.get_model('user_profile', 'CustomUser')
+    CustomUser.objects.filter(nationality='japanese').exclude(preferred_language='ja').update(preferred_language='ja')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0003_customuser_point'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_japanese_preferred_language, migrations.RunPython.noop),
+    ]
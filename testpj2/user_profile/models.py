@@ -59,6 +59,23 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
     
+    def save(self, *args, **kwargs):
+        # Japanese users get the Japanese interface (set here so the dashboard never writes)
+        if self.nationality == 'japanese' and self.preferred_language != 'ja':
+            self.preferred_language = 'ja'
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'preferred_language'}
+        super().save(*args, **kwargs)
+    
+    def get_session_auth_hash(self):
+        # Users rebuilt from the cached session principal (user_profile.principal) have
+        # no password loaded, the principal carries the hash instead
+        principal = self.__dict__.get('_principal')
+        if principal is not None and 'password' not in self.__dict__:
+            return principal.session_auth_hash
+        return super().get_session_auth_hash()
+    
     def get_age(self):
         """
         Calculate user's current age based on date of birth
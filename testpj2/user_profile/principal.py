@@ -0,0 +1,91 @@
+"""
+Session Principal
+Compact cached copy of a signed-in user, shared by the auth backend
+(user_profile.backends.PrincipalBackend), SessionSecurityMiddleware, the profile
+decorators and the language context processor
+- Holds the user's columns except password, bio and interests, plus the session auth
+  hash Django verifies on every request, so request.user is rebuilt without a query
+- The left-out columns stay deferred on the rebuilt user and load only if accessed
+- Versioned in the shared cache: an entry is only used while it carries the user's current
+  version token, and every user save or delete writes a new token (user_profile.signals),
+  so all server processes stop using the old principal at once. An entry cached from a
+  row read before a concurrent save committed carries the old token and is never used
+"""
+
+from uuid import uuid4
+from django.core.cache import cache
+from .models import CustomUser
+
+PRINCIPAL_CACHE_KEY = 'user_profile:principal:{user_id}'
+PRINCIPAL_VERSION_KEY = 'user_profile:principal_version:{user_id}'
+PRINCIPAL_CACHE_TIMEOUT = 60  # Authenticates requests: short-lived even though saves invalidate it
+DEFERRED_FIELDS = ('password', 'bio', 'interests')
+PRINCIPAL_FIELDS = [
+    field.attname for field in CustomUser._meta.concrete_fields if field.attname not in DEFERRED_FIELDS
+]
+
+
+def principal_key(user_id):
+    return PRINCIPAL_CACHE_KEY.format(user_id=user_id)
+
+
+def principal_version_key(user_id):
+    return PRINCIPAL_VERSION_KEY.format(user_id=user_id)
+
+
+class SessionPrincipal:
+    """Column values of one user (in PRINCIPAL_FIELDS order) and its session auth hash"""
+
+    def __init__(self, values, session_auth_hash):
+        self.values = tuple(values)
+        self.session_auth_hash = session_auth_hash
+        fields = dict(zip(PRINCIPAL_FIELDS, self.values))
+        self.id = fields['id']
+        self.nationality = fields['nationality']
+        self.city = fields['city']
+        self.is_staff = fields['is_staff']
+        self.profile_complete = bool(fields['gender'] and fields['date_of_birth'] and fields['city'])
+
+    def to_user(self):
+        """A CustomUser with the cached columns loaded and the rest deferred"""
+        user = CustomUser.from_db('default', PRINCIPAL_FIELDS, self.values)
+        user._principal = self
+        return user
+
+
+def get_principal(user_id):
+    """
+    The user's principal, from the cache (one round trip for the entry and the version token)
+    or one narrow query; None if the user is gone
+    """
+    key, version_key = principal_key(user_id), principal_version_key(user_id)
+    cached = cache.get_many([key, version_key])
+    version, entry = cached.get(version_key), cached.get(key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+    if version is None:
+        # First use, or the token was evicted: a fresh token, so no older entry can match
+        version = uuid4().hex
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key)
+    row = CustomUser.objects.filter(pk=user_id).values_list('password', *PRINCIPAL_FIELDS).first()
+    if row is None:
+        return None
+    password, values = row[0], row[1:]
+    principal = SessionPrincipal(values, CustomUser(password=password).get_session_auth_hash())
+    cache.set(key, (version, principal), PRINCIPAL_CACHE_TIMEOUT)
+    return principal
+
+
+def invalidate_principal(user_id):
+    """Retire the user's cached principal in every process sharing the cache"""
+    cache.set(principal_version_key(user_id), uuid4().hex, None)
+    cache.delete(principal_key(user_id))
+
+
+def request_principal(request):
+    """The signed-in user's principal, None for anonymous requests"""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    return getattr(user, '_principal', None) or get_principal(user.pk)
@@ -0,0 +1,20 @@
+"""
+User Profile Signals
+Drop a user's cached session principal (user_profile.principal) when the user changes
+(the dashboard snapshots live in the POSTS namespace of event_creation.caches)
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import principal
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_session_principal(sender, instance, **kwargs):
+    user_id = instance.id
+    # Now for this request, and again after commit in case it was re-cached in between
+    principal.invalidate_principal(user_id)
+    transaction.on_commit(lambda: principal.invalidate_principal(user_id))
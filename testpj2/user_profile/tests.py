@@ -1,3 +1,160 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from event_creation.models import CafeLocation, VietnamesePhrase, LanguageExchangePost
+from vietnam_japan_connect import metrics
+from .models import CustomUser
+from . import principal, views
 
-# Create your tests here.
+
+def make_user(username, nationality, **fields):
+    fields = {'city': 'hanoi', 'gender': 'male', 'date_of_birth': date(1990, 1, 1), **fields}
+    return CustomUser.objects.create_user(username, password='pw', nationality=nationality, **fields)
+
+
+@override_settings(METRICS_TOKEN='scrape-token')
+class MetricsAccessTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.user = make_user('jp', 'japanese')
+
+    def test_local_address_is_not_trusted(self):
+        # Tunnels (ngrok) forward every request from 127.0.0.1
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+
+    def test_bearer_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_no_token_configured(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer None').status_code, 403)
+
+    def test_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.client.get('/metrics')
+        response = self.client.get('/metrics')
+        self.assertContains(response, 'vjc_http_requests_total{view="metrics",method="GET",status="200"} 1')
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_middleware_redirect_keeps_view_name(self):
+        # SessionSecurityMiddleware sends incomplete profiles away before URL resolution
+        self.client.force_login(CustomUser.objects.create_user('new', password='pw'))
+        self.assertRedirects(self.client.get(reverse('dashboard')), reverse('profile'), fetch_redirect_response=False)
+        self.client.logout()
+        self.client.get('/no-such-page/')
+        output = metrics.registry.render_prometheus()
+        self.assertIn('vjc_http_requests_total{view="dashboard",method="GET",status="302"} 1', output)
+        self.assertIn('vjc_http_requests_total{view="unmatched",method="GET",status="404"} 1', output)
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = make_user('vn', 'vietnamese')
+        self.cafe = CafeLocation.objects.create(name='Cafe', address='Street', city='hanoi', latitude=21.03, longitude=105.85)
+        self.phrase = VietnamesePhrase.objects.create(category='greetings', difficulty='beginner', vietnamese_text='Xin chào!',
+                                                      japanese_translation='こんにちは', english_translation='Hello')
+        self.client.force_login(self.user)
+
+    def make_post(self, creator, cafe=None, **fields):
+        return LanguageExchangePost.objects.create(
+            user_type=creator.nationality, **{f'{creator.nationality}_user': creator}, phrase=self.phrase,
+            cafe_location=cafe or self.cafe, meeting_date=timezone.now() + timedelta(days=1), **fields,
+        )
+
+    def test_counts_and_posts_from_the_other_side(self):
+        visitor = make_user('jp', 'japanese')
+        older, newer = self.make_post(visitor), self.make_post(visitor)
+        self.make_post(visitor, status='matched')
+        self.make_post(visitor, cafe=CafeLocation.objects.create(name='Far', address='Street', city='danang',
+                                                                 latitude=16.05, longitude=108.2))
+        self.make_post(self.user)
+        self.make_post(self.user, status='matched')
+        cache.clear()
+        response = self.client.get(reverse('dashboard'))
+        self.assertTemplateUsed(response, 'user_profile/vietnamese_dashboard.html')
+        self.assertEqual([post.id for post in response.context['available_posts']], [newer.id, older.id])
+        self.assertEqual(response.context['available_posts_count'], 2)
+        self.assertEqual((response.context['posts_count'], response.context['accepted_posts_count']), (2, 1))
+
+    def test_incomplete_profile_is_sent_to_profile(self):
+        self.client.force_login(CustomUser.objects.create_user('new', password='pw'))
+        self.assertRedirects(self.client.get(reverse('dashboard')), reverse('profile'), fetch_redirect_response=False)
+
+    def test_blown_budget_fails(self):
+        with mock.patch.object(views.dashboard, 'query_budget', 1):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('dashboard'))
+
+
+class ProfileEditTests(TestCase):
+    def setUp(self):
+        self.user = make_user('vn', 'vietnamese', bio='Xin chào')
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_form_shows_the_stored_profile(self):
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.context['form'].initial['bio'], 'Xin chào')
+        self.assertEqual(response['Cache-Control'], 'no-cache, no-store, must-revalidate, private')
+
+    def test_update(self):
+        response = self.client.post(reverse('profile'), {'full_name': 'Nguyễn Văn A', 'bio': 'Tôi thích cà phê',
+                                                         'interests': 'coffee', 'city': 'danang'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.bio, self.user.city), ('Tôi thích cà phê', 'danang'))
+        self.assertEqual(self.client.get(reverse('profile')).context['form'].initial['city'], 'danang')
+
+
+class SessionPrincipalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('vn', 'vietnamese')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)  # Principal cached
+
+    def test_deactivated_user_is_signed_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertRedirects(self.client.get(reverse('profile')), f"{reverse('login')}?next={reverse('profile')}",
+                             fetch_redirect_response=False)
+
+    def test_password_change_ends_other_sessions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new password')
+            self.user.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+    def test_entry_cached_before_a_save_is_not_used(self):
+        # Another process read the row, then the save committed and retired the version,
+        # then the other process stored what it had read
+        stale_version = cache.get(principal.principal_version_key(self.user.id))
+        stale = principal.get_principal(self.user.id)
+        CustomUser.objects.filter(id=self.user.id).update(city='danang')
+        principal.invalidate_principal(self.user.id)
+        cache.set(principal.principal_key(self.user.id), (stale_version, stale))
+        self.assertEqual(principal.get_principal(self.user.id).city, 'danang')
+
+    def test_evicted_version_does_not_revive_entries(self):
+        stale = principal.get_principal(self.user.id)
+        CustomUser.objects.filter(id=self.user.id).update(city='danang')
+        cache.delete(principal.principal_version_key(self.user.id))
+        self.assertEqual(principal.get_principal(self.user.id).city, 'danang')
+        with self.assertNumQueries(0):
+            self.assertIsNot(principal.get_principal(self.user.id), stale)
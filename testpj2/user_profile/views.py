@@ -15,10 +15,13 @@ from django.http import HttpResponse, JsonResponse
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from .forms import CustomUserCreationForm, ProfileUpdateForm
+from .models import CustomUser
 
 from event_creation.models import LanguageExchangePost, PartnerRequest
 
+from .dashboard import dashboard_context
 from .decorators import complete_profile_required
+from vietnam_japan_connect.metrics import query_budget
 
 class CustomLoginView(LoginView):
     """
@@ -105,6 +108,7 @@ def custom_logout(request):
     
     return redirect('home')
 
+@query_budget(8)
 @login_required
 @complete_profile_required
 def dashboard(request):
@@ -113,69 +117,11 @@ def dashboard(request):
     Japanese users: See their posts and available posts from Vietnamese users
     Vietnamese users: See available posts from Japanese users and their own posts
     """
-    user = request.user
-    
-    # Set language preference based on nationality
-    if user.nationality == 'japanese':
-        user.preferred_language = 'ja'
-        user.save()
-        
-        # For Japanese users, get available posts from Vietnamese users in their city
-        available_posts = LanguageExchangePost.objects.filter(
-            vietnamese_user__nationality='vietnamese',
-            user_type='vietnamese',
-            status='active'
-        ).select_related('vietnamese_user', 'phrase', 'cafe_location')
-        
-        # Filter by user's city if specified
-        if user.city and user.city != 'any':
-            available_posts = available_posts.filter(cafe_location__city=user.city)
-        
-        # Get user's recent language exchange posts
-        recent_posts = user.japanese_posts.filter(user_type='japanese').select_related('phrase', 'cafe_location')[:5]
-        
-        # Calculate statistics
-        accepted_posts_count = user.japanese_posts.filter(user_type='japanese', status='matched').count()
-        available_posts_count = available_posts.filter(status='active').count()
-        
-        context = {
-            'user': user,
-            'available_posts': available_posts[:6],  # Show first 6 posts
-            'accepted_posts_count': accepted_posts_count,
-            'available_posts_count': available_posts_count,
-            'recent_posts': recent_posts,
-        }
+    # Read-only: counts and the available posts come from user_profile.dashboard's cached snapshots
+    context = dashboard_context(request.user)
+    if request.user.nationality == 'japanese':
         response = render(request, 'user_profile/japanese_dashboard.html', context)
     else:
-        # Vietnamese user dashboard
-        # For Vietnamese users, get available posts from Japanese users in their city
-        available_posts = LanguageExchangePost.objects.filter(
-            japanese_user__nationality='japanese',
-            user_type='japanese',
-            status='active'
-        ).select_related('japanese_user', 'phrase', 'cafe_location')
-        
-        # Filter by user's city if specified
-        if user.city and user.city != 'any':
-            available_posts = available_posts.filter(cafe_location__city=user.city)
-        
-        # Only show active posts (not accepted ones)
-        available_posts = available_posts.filter(status='active')
-
-        # Get user's recent language exchange posts
-        recent_posts = user.vietnamese_posts.filter(user_type='vietnamese').select_related('phrase', 'cafe_location')[:5]
-        
-        # Calculate statistics
-        accepted_posts_count = user.vietnamese_posts.filter(user_type='vietnamese', status='matched').count()
-        available_posts_count = available_posts.filter(status='active').count()
-        
-        context = {
-            'user': user,
-            'available_posts': available_posts[:6],  # Show first 6 posts
-            'accepted_posts_count': accepted_posts_count,
-            'available_posts_count': available_posts_count,
-            'recent_posts' : recent_posts,
-        }
         response = render(request, 'user_profile/vietnamese_dashboard.html', context)
     
     # Add cache control headers
@@ -186,17 +132,20 @@ def dashboard(request):
     
     return response
 
+@query_budget(6)
 @login_required
 @complete_profile_required
 def profile(request):
+    # The form edits bio/interests, which the cached request.user leaves unloaded: load the full row once
+    user = CustomUser.objects.get(pk=request.user.pk)
     if request.method == 'POST':
-        form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user)
+        form = ProfileUpdateForm(request.POST, request.FILES, instance=user)
         if form.is_valid():
             form.save()
             messages.success(request, 'Profile updated successfully!')
             return redirect('profile')
     else:
-        form = ProfileUpdateForm(instance=request.user)
+        form = ProfileUpdateForm(instance=user)
     
     response = render(request, 'user_profile/profile.html', {'form': form})
     # Add cache control headers
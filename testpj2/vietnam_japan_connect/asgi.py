@@ -2,6 +2,8 @@
 ASGI config for vietnam_japan_connect project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django as usual; WebSocket connections are routed to the
+chat_system consumers (real-time message push).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +15,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vietnam_japan_connect.settings')
 
-application = get_asgi_application()
+# Initialise Django before importing anything that touches models
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack
+from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.security.websocket import AllowedHostsOriginValidator
+
+import chat_system.routing
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            URLRouter(chat_system.routing.websocket_urlpatterns)
+        )
+    ),
+})
@@ -0,0 +1,120 @@
+"""
+Cache helpers
+Namespaced, versioned keys on the default cache (backend chosen by settings.CACHE_BACKEND)
+- CacheNamespace('app:thing'): keys look like 'app:thing:v<version>:<parts>', and
+  invalidate() bumps the version so every key of the namespace is dropped at once
+  (the old entries are never read again and simply expire)
+- Versions are random tokens written with set/add, not counters bumped with incr: incr is
+  a non-atomic get+set on the file and database backends, so two concurrent bumps could
+  land on the same value, and an evicted counter restarting at 1 would revive old entries.
+  Any write of a fresh token changes the version, whichever of several racing bumps wins
+- delete / delete_many drop single entries (per-user or per-row data)
+- get_or_set / @namespace.cached / cached_queryset for read-through caching
+- namespace.invalidate_on(Model, ...) bumps the version once any save or delete of those
+  models has committed; call it from the app's signals module (loaded in AppConfig.ready)
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+from urllib.parse import quote
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+DEFAULT_TIMEOUT = 300
+# Longer keys are hashed (memcached refuses keys over 250 characters)
+MAX_KEY_LENGTH = 200
+
+
+class CacheNamespace:
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self.version_key = f'{name}:version'
+
+    def __repr__(self):
+        return f'<CacheNamespace {self.name}>'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # add() so processes racing on a cold cache settle on one token
+            version = uuid.uuid4().hex[:12]
+            if not cache.add(self.version_key, version, None):
+                version = cache.get(self.version_key, version)
+        return version
+
+    def invalidate(self):
+        """Drop every key of the namespace"""
+        cache.set(self.version_key, uuid.uuid4().hex[:12], None)
+
+    def key(self, *parts):
+        return self._key(self.version(), parts)
+
+    def _key(self, version, parts):
+        # Parts are percent-encoded so user input cannot forge a separator and collide;
+        # None and hashed suffixes use '%' and '#', which encoded parts never contain bare
+        suffix = ':'.join('%' if part is None else quote(str(part), safe='') for part in parts)
+        if len(suffix) > MAX_KEY_LENGTH:
+            suffix = '#' + hashlib.md5(suffix.encode()).hexdigest()
+        return f'{self.name}:v{version}:{suffix}'
+
+    def get(self, *parts, default=None):
+        return cache.get(self.key(*parts), default)
+
+    def set(self, parts, value, timeout=None):
+        cache.set(self.key(*parts), value, self.timeout if timeout is None else timeout)
+
+    def set_many(self, values, timeout=None):
+        """Store {parts: value} in one round trip"""
+        version = self.version()
+        cache.set_many(
+            {self._key(version, parts): value for parts, value in values.items()},
+            self.timeout if timeout is None else timeout,
+        )
+
+    def delete(self, *parts):
+        cache.delete(self.key(*parts))
+
+    def delete_many(self, parts_list):
+        version = self.version()
+        cache.delete_many([self._key(version, parts) for parts in parts_list])
+
+    def get_or_set(self, parts, compute, timeout=None):
+        """
+        Cached value for `parts`, computed with compute() and stored on a miss
+        None is a valid cached value (e.g. "no such row")
+        """
+        key = self.key(*parts)
+        missing = object()
+        value = cache.get(key, missing)
+        if value is missing:
+            value = compute()
+            cache.set(key, value, self.timeout if timeout is None else timeout)
+        return value
+
+    def cached(self, timeout=None):
+        """Decorator: read-through cache a function, keyed on its name and positional arguments"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args):
+                return self.get_or_set((func.__name__, *args), lambda: func(*args), timeout)
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    def invalidate_on(self, *models):
+        """Bump the version after any save or delete of these models commits"""
+        def handler(sender, **kwargs):
+            transaction.on_commit(self.invalidate)
+        for model in models:
+            uid = f'cache_namespace_{self.name}_{model._meta.label}'
+            # weak=False: the handler is a closure nothing else keeps alive
+            post_save.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_save')
+            post_delete.connect(handler, sender=model, weak=False, dispatch_uid=f'{uid}_delete')
+
+
+def cached_queryset(namespace, parts, queryset, timeout=None):
+    """The queryset's rows as a list, cached under `parts` of the namespace (evaluated on a miss only)"""
+    return namespace.get_or_set(parts, lambda: list(queryset), timeout)
@@ -0,0 +1,195 @@
+"""
+Request Metrics
+Per-view SQL query count, DB time, template render time and total latency
+- user_profile.middleware.RequestMetricsMiddleware measures every request, records it
+  in `registry` and writes one JSON log line per request (logger 'request_metrics')
+- metrics_view serves the totals in the Prometheus text format at /metrics
+- @query_budget(n) declares the most queries a view may issue per request; going over logs
+  a warning, and raises QueryBudgetExceeded when settings.QUERY_BUDGETS_ENFORCED is on,
+  which vietnam_japan_connect.test_runner does for the test suite
+Totals are kept per process, like any in-process exporter: scrape each worker
+"""
+
+import threading
+from contextvars import ContextVar
+from time import perf_counter
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+
+METRIC_PREFIX = 'vjc'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Measurements of the request being handled, set by RequestMetricsMiddleware
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A view issued more queries than its @query_budget (an AssertionError so it fails tests)"""
+
+
+def query_budget(max_queries):
+    """
+    Declare a view's query budget (whole request: session, user, context processors included)
+    Put it above @login_required so the budget sits on the function Django resolves
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class RequestMetrics:
+    """Counters for one request; also the database execute_wrapper that fills them"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += perf_counter() - started
+
+
+class InstrumentedTemplate:
+    """Times the top-level render of a template (includes and extends are part of it)"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.template_depth:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        started = perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_seconds += perf_counter() - started
+            metrics.template_depth -= 1
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded in current_metrics"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+class ViewStats:
+    def __init__(self):
+        self.responses = {}  # (method, status) -> count
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.duration_seconds = 0.0
+        self.duration_buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.budget_exceeded = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, method, status, metrics, duration, over_budget=False):
+        with self._lock:
+            stats = self._views.setdefault(view, ViewStats())
+            key = (method, status)
+            stats.responses[key] = stats.responses.get(key, 0) + 1
+            stats.queries += metrics.queries
+            stats.max_queries = max(stats.max_queries, metrics.queries)
+            stats.db_seconds += metrics.db_seconds
+            stats.template_seconds += metrics.template_seconds
+            stats.duration_seconds += duration
+            stats.count += 1
+            stats.budget_exceeded += over_budget
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats.duration_buckets[i] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render_prometheus(self):
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+
+            def family(name, kind, help_text, samples):
+                lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+                lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+                for suffix, labels, value in samples:
+                    label_text = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+                    lines.append(f'{METRIC_PREFIX}_{name}{suffix}{{{label_text}}} {value}')
+
+            family('http_requests_total', 'counter', 'Responses by view, method and status', [
+                ('', [('view', view), ('method', method), ('status', status)], count)
+                for view, stats in views for (method, status), count in sorted(stats.responses.items())
+            ])
+            duration_samples = []
+            for view, stats in views:
+                for bound, count in zip(LATENCY_BUCKETS, stats.duration_buckets):
+                    duration_samples.append(('_bucket', [('view', view), ('le', bound)], count))
+                duration_samples.append(('_bucket', [('view', view), ('le', '+Inf')], stats.count))
+                duration_samples.append(('_sum', [('view', view)], round(stats.duration_seconds, 6)))
+                duration_samples.append(('_count', [('view', view)], stats.count))
+            family('http_request_duration_seconds', 'histogram', 'Total request latency', duration_samples)
+            family('db_queries_total', 'counter', 'SQL queries issued', [
+                ('', [('view', view)], stats.queries) for view, stats in views
+            ])
+            family('db_queries_max', 'gauge', 'Most SQL queries issued by a single request', [
+                ('', [('view', view)], stats.max_queries) for view, stats in views
+            ])
+            family('db_duration_seconds_total', 'counter', 'Time spent executing SQL', [
+                ('', [('view', view)], round(stats.db_seconds, 6)) for view, stats in views
+            ])
+            family('template_render_seconds_total', 'counter', 'Time spent rendering templates', [
+                ('', [('view', view)], round(stats.template_seconds, 6)) for view, stats in views
+            ])
+            family('query_budget_exceeded_total', 'counter', 'Requests that went over the view query budget', [
+                ('', [('view', view)], stats.budget_exceeded) for view, stats in views
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def has_metrics_token(request):
+    """Whether the request carries `Authorization: Bearer <settings.METRICS_TOKEN>`"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and constant_time_compare(credentials.strip(), token)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint, for staff users and scrapers sending settings.METRICS_TOKEN
+    The client address is not trusted: tunnels and proxies make every request local
+    """
+    if not (request.user.is_staff or has_metrics_token(request)):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
@@ -0,0 +1,80 @@
+"""
+Text normalization shared by search, dedup and the seeding commands
+- fold: lowercase, NFKC width folding (full-width Latin -> ASCII, half-width kana -> full-width),
+  Vietnamese tone marks and diacritics removed (đ -> d) and katakana -> hiragana
+- normalize_vietnamese / normalize_japanese: fold plus punctuation and spacing removed, the
+  keys stored in the *_normalized shadow columns of the phrase models
+The per-character work runs through translation tables built once at import, so
+normalizing is a couple of C-level passes instead of a Python loop per character
+"""
+
+import re
+import unicodedata
+
+
+def _build_diacritics_table():
+    """Every precomposed Latin letter (Vietnamese included) -> its base letter"""
+    table = {ord('đ'): 'd', ord('Đ'): 'D'}
+    for codepoint in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        char = chr(codepoint)
+        decomposed = unicodedata.normalize('NFD', char)
+        base = ''.join(c for c in decomposed if not unicodedata.combining(c))
+        if base != char and len(base) == 1 and base.isascii():
+            table[codepoint] = base
+    # Stray combining marks left by decomposed (NFD) input that NFKC could not recompose
+    for codepoint in range(0x0300, 0x0370):
+        table[codepoint] = None
+    return table
+
+
+def _build_kana_table():
+    """Katakana -> hiragana (ァ..ヶ are ぁ..ゖ shifted by 0x60), plus the iteration marks"""
+    table = {codepoint: codepoint - 0x60 for codepoint in range(ord('ァ'), ord('ヶ') + 1)}
+    table[ord('ヽ')] = 'ゝ'
+    table[ord('ヾ')] = 'ゞ'
+    return table
+
+
+DIACRITICS_TABLE = _build_diacritics_table()
+KANA_TABLE = _build_kana_table()
+FOLD_TABLE = {**DIACRITICS_TABLE, **KANA_TABLE}
+
+# Anything that is not a letter, digit, kana or kanji (punctuation, symbols, spacing)
+NON_WORD = re.compile(r'[^0-9a-z々ぁ-ゟー㐀-䶿一-鿿豈-﫿]+')
+
+
+def fold(text):
+    """Lowercase, width-normalized text without Vietnamese diacritics and with katakana as hiragana"""
+    return unicodedata.normalize('NFKC', text or '').lower().translate(FOLD_TABLE)
+
+
+def strip_diacritics(text):
+    """Vietnamese text without tone marks and diacritics, case and punctuation kept"""
+    return unicodedata.normalize('NFC', text or '').translate(DIACRITICS_TABLE)
+
+
+def to_hiragana(text):
+    return (text or '').translate(KANA_TABLE)
+
+
+def compact(folded):
+    """Single-spaced words of already folded text, punctuation removed"""
+    return NON_WORD.sub(' ', folded).strip()
+
+
+def normalize_vietnamese(text):
+    """Dedup / lookup key: 'Xin chào!' and 'xin chao' both give 'xin chao'"""
+    return compact(fold(text))
+
+
+def normalize_japanese(text):
+    """Dedup / lookup key: 'コンニチハ。' and 'こんにちは' both give 'こんにちは' (spaces dropped too)"""
+    return compact(fold(text)).replace(' ', '')
+
+
+def prefix_range(prefix):
+    """
+    (start, end) bounds for a prefix match on a normalized column
+    Filter with __gte / __lt so SQLite can use the column's index (LIKE 'x%' cannot)
+    """
+    return prefix, prefix + '\U0010ffff'
@@ -0,0 +1,128 @@
+"""
+Keyset (cursor) pagination shared by the list views
+- keyset_page: pages a queryset by an explicit ordering whose last field is unique (usually id)
+- sorted_page: pages a list already sorted in Python (e.g. the cached available-posts feed)
+- wants_json / page_response: serve further pages as JSON for infinite scroll
+The cursor is the ordering values of the last item on the page, so each page costs
+the same index range scan however deep the user scrolls, unlike OFFSET.
+"""
+
+import base64
+import datetime
+import json
+from bisect import bisect_right
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+
+PAGE_SIZE = 20
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder cuts datetimes to milliseconds, which loses rows in the same millisecond
+    as the page boundary; cursors keep the exact value
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    payload = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the list of ordering values in a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_filter(ordering, values):
+    """Q matching rows strictly after `values` in `ordering` (mixed directions allowed)"""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def parse_cursor_values(model, ordering, values):
+    """Turn decoded cursor values back into field values (ISO strings into datetimes etc.), None if invalid"""
+    if values is None or len(values) != len(ordering):
+        return None
+    parsed = []
+    for field, value in zip(ordering, values):
+        try:
+            value = model._meta.get_field(field.lstrip('-')).to_python(value)
+        except FieldDoesNotExist:
+            pass  # Annotations such as priority are plain numbers already
+        except ValidationError:
+            return None
+        parsed.append(value)
+    return parsed
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=PAGE_SIZE, after=None):
+    """
+    One page of `queryset` in `ordering`, plus the cursor of the next page (None on the last page)
+    Fields may be model fields or annotations, but not related lookups
+    `after` takes values already parsed with parse_cursor_values in place of `cursor`
+    """
+    values = after if after is not None else parse_cursor_values(queryset.model, ordering, decode_cursor(cursor))
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    items = list(queryset.order_by(*ordering)[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field.lstrip('-')) for field in ordering)
+    return items, next_cursor
+
+
+def sorted_page(rows, key, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of `rows`, already sorted ascending by key(row), plus the next cursor
+    key must return a unique tuple of numbers (negate them for descending order)
+    """
+    keys = [tuple(key(row)) for row in rows]
+    values = decode_cursor(cursor)
+    start = 0
+    if values is not None:
+        try:
+            start = bisect_right(keys, tuple(values))
+        except TypeError:
+            pass  # Malformed cursor, start over
+    items = rows[start:start + page_size]
+    next_cursor = None
+    if start + page_size < len(rows):
+        next_cursor = encode_cursor(keys[start + page_size - 1])
+    return items, next_cursor
+
+
+def wants_json(request):
+    """Infinite scroll asks for the next page with ?format=json"""
+    return request.GET.get('format') == 'json'
+
+
+def page_response(request, template_name, context, next_cursor):
+    """Render the list's items template for one page and return it with the next cursor"""
+    html = render_to_string(template_name, context, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
@@ -0,0 +1,103 @@
+"""
+Query plan audit
+Registry of the platform's canonical (hot path) querysets and an EXPLAIN QUERY PLAN
+check that flags full table scans, run by `manage.py audit_query_plans`
+- Each entry builds its queryset from the same helpers the views use where they exist,
+  so a view change that loses its index shows up here
+- Sample ids only shape the SQL, the plan does not depend on the rows existing
+"""
+
+from django.db import connection
+from chat_system.inbox import inbox_queryset
+from chat_system.models import ChatRoom, ChatParticipant, Message
+from event_creation.models import LanguageExchangePost, PartnerRequest, CafeLocation, PartnerInteraction, VietnamesePhrase
+from event_search import feeds, matching
+from user_profile.models import CustomUser
+
+SAMPLE_ID = 1
+SAMPLE_USERS = {
+    'japanese': CustomUser(id=SAMPLE_ID, nationality='japanese', city='hanoi'),
+    'vietnamese': CustomUser(id=SAMPLE_ID, nationality='vietnamese', city='hanoi'),
+}
+
+
+def sample_room():
+    return ChatRoom(id=SAMPLE_ID)
+
+
+# name -> (queryset builder, tables that may be scanned, e.g. tiny lookup tables)
+CANONICAL_QUERIES = {
+    # Available posts feed and the dashboard's "available posts" block
+    'available_feed_japanese': (lambda: feeds.feed_queryset('hanoi', 'japanese').values_list(
+        'id', 'created_at', 'japanese_user', 'cafe_location'), ()),
+    'available_feed_vietnamese': (lambda: feeds.feed_queryset('hanoi', 'vietnamese').values_list(
+        'id', 'created_at', 'vietnamese_user', 'cafe_location'), ()),
+    'dashboard_available_posts': (lambda: LanguageExchangePost.objects.filter(
+        japanese_user__nationality='japanese', user_type='japanese', status='active',
+        cafe_location__city='hanoi',
+    ).select_related('japanese_user', 'phrase', 'cafe_location')[:6], ()),
+    'my_posts': (lambda: LanguageExchangePost.objects.filter(
+        japanese_user_id=SAMPLE_ID, user_type='japanese',
+    ).order_by('-created_at', '-id')[:21], ()),
+    'user_matched_posts_count': (lambda: LanguageExchangePost.objects.filter(
+        japanese_user_id=SAMPLE_ID, user_type='japanese', status='matched',
+    ).values('id'), ()),
+    # Partner matching
+    'partner_pool_japanese': (lambda: matching.pool_queryset(SAMPLE_USERS['japanese']), ()),
+    'partner_pool_vietnamese': (lambda: matching.pool_queryset(SAMPLE_USERS['vietnamese']), ()),
+    'own_partner_preferences': (lambda: matching.own_preferences_queryset(SAMPLE_USERS['japanese'])[:1], ()),
+    'my_partner_requests': (lambda: PartnerRequest.objects.filter(requester_id=SAMPLE_ID), ()),
+    'previous_partners': (lambda: PartnerInteraction.objects.filter(
+        user_id=SAMPLE_ID).values_list('partner_id', flat=True), ()),
+    # Chat
+    'chat_inbox': (lambda: inbox_queryset(SAMPLE_USERS['japanese'])[:21], ()),
+    'chat_room_for_post': (lambda: ChatRoom.objects.filter(post_id=SAMPLE_ID), ()),
+    'chat_messages_since': (lambda: sample_room().messages.select_related('sender').filter(
+        id__gt=SAMPLE_ID).order_by('id')[:51], ()),
+    'chat_messages_before': (lambda: sample_room().messages.select_related('sender').filter(
+        id__lt=SAMPLE_ID).order_by('-id')[:51], ()),
+    'chat_latest_message_id': (lambda: sample_room().messages.order_by('-id').values_list('id', flat=True)[:1], ()),
+    'chat_unread_messages': (lambda: Message.objects.filter(
+        chat_room_id=SAMPLE_ID, id__gt=SAMPLE_ID).exclude(sender_id=SAMPLE_ID).values('id'), ()),
+    'chat_unread_total': (lambda: ChatParticipant.in_matched_rooms(SAMPLE_ID).values('unread_count'), ()),
+    # Cafes and phrases
+    'cafes_in_city': (lambda: CafeLocation.objects.filter(city='hanoi'), ()),
+    'cafes_nearby': (lambda: CafeLocation.nearby_candidates(21.03, 105.85, 5), ()),
+    'phrase_same_text': (lambda: VietnamesePhrase.objects.same_text('Xin chào'), ()),
+    'phrase_prefix': (lambda: VietnamesePhrase.objects.text_prefix('xin ch'), ()),
+}
+
+
+def explain(queryset):
+    """EXPLAIN QUERY PLAN rows of a queryset as (id, parent, detail) tuples"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [(row[0], row[1], row[-1]) for row in cursor.fetchall()]
+
+
+def full_scans(plan, allowed_tables=()):
+    """
+    Plan steps that read a whole table: "SCAN <table>" (with or without an index, which
+    only changes the order) except constant rows and explicitly allowed tables
+    """
+    scans = []
+    for _, _, detail in plan:
+        if not detail.startswith('SCAN '):
+            continue
+        table = detail.split()[1]
+        if table == 'CONSTANT' or table in allowed_tables:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def audit(names=None):
+    """(name, plan, full scans) for each registered query, in registry order"""
+    results = []
+    for name, (build, allowed_tables) in CANONICAL_QUERIES.items():
+        if names and name not in names:
+            continue
+        plan = explain(build())
+        results.append((name, plan, full_scans(plan, allowed_tables)))
+    return results
@@ -19,6 +19,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import gettext_lazy as _
 LANGUAGES = [
     ('vi', _('Vietnamese')),
@@ -52,6 +53,9 @@ ALLOWED_HOSTS = ['127.0.0.1', 'localhost', '3b6bf207beed.ngrok-free.app', 'tests
 # - event_search: Finding and browsing available opportunities
 
 INSTALLED_APPS = [
+    # ASGI server (must come before staticfiles so runserver serves WebSockets)
+    'daphne',
+    
     # Django core apps
     'django.contrib.admin',
     'django.contrib.auth',
@@ -67,12 +71,16 @@ INSTALLED_APPS = [
     'event_search',      # Searching and browsing events
     'session',           # Session management and evaluations
     
+    # Real-time messaging over WebSockets
+    'channels',
+    
     # Third-party apps for UI enhancement
     'crispy_forms',      # Better form rendering
     'crispy_bootstrap5', # Bootstrap 5 integration
 ]
 
 MIDDLEWARE = [
+    'user_profile.middleware.RequestMetricsMiddleware',  # Per-view queries / latency, first to time everything
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -88,7 +96,7 @@ ROOT_URLCONF = 'vietnam_japan_connect.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'vietnam_japan_connect.metrics.InstrumentedDjangoTemplates',  # DjangoTemplates + render timing
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -105,6 +113,88 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'vietnam_japan_connect.wsgi.application'
+ASGI_APPLICATION = 'vietnam_japan_connect.asgi.application'
+
+# Channel layer used to push chat messages to connected WebSocket clients
+# The in-memory layer only works with a single server process; use channels_redis in production
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Chat presence (online / typing) store, see chat_system.presence
+# None keeps it in process; set a Redis URL when running more than one server process
+CHAT_PRESENCE_REDIS_URL = None
+
+# Cache backend, see vietnam_japan_connect.caching for the namespaced keys on top of it
+# 'locmem': in process (development, a single server process); refused outside DEBUG since
+#           room membership and session principals are cached, and invalidating them
+#           would only reach the process that handled the change
+# 'file': shared by the server processes of one machine (the default outside DEBUG)
+# 'redis': shared by every server; needs CACHE_REDIS_URL and the redis package,
+#          and falls back to the default backend while no URL is set
+CACHE_BACKEND = 'locmem' if DEBUG else 'file'
+CACHE_REDIS_URL = None
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vietnam-japan-connect',
+        'OPTIONS': {'MAX_ENTRIES': 10000},  # Django's default of 300 evicts per-user entries constantly
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    },
+}
+if CACHE_BACKEND == 'redis' and not CACHE_REDIS_URL:
+    CACHE_BACKEND = 'locmem' if DEBUG else 'file'
+if CACHE_BACKEND == 'locmem' and not DEBUG:
+    raise ImproperlyConfigured("CACHE_BACKEND 'locmem' is per process, use 'file' or 'redis' when DEBUG is off")
+
+CACHES = {
+    'default': {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'vjc',
+        'TIMEOUT': 300,
+    },
+}
+
+# Request metrics, see vietnam_japan_connect.metrics
+# /metrics is served to staff users and to requests with `Authorization: Bearer <METRICS_TOKEN>`
+# (the Prometheus scraper's bearer_token); None turns token access off
+METRICS_TOKEN = None
+# Raise instead of logging when a view goes over its @query_budget (the test runner turns it on)
+QUERY_BUDGETS_ENFORCED = False
+TEST_RUNNER = 'vietnam_japan_connect.test_runner.QueryBudgetTestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # One JSON line per request: view, status, queries, db_ms, template_ms, total_ms
+        'request_metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Content search backend, see event_search.search
+# None picks SQLite FTS5 on SQLite and the in-process scan elsewhere
+SEARCH_BACKEND = None
 
 
 # Database
@@ -181,6 +271,9 @@ LOGOUT_REDIRECT_URL = '/'
 # Custom User Model
 AUTH_USER_MODEL = 'user_profile.CustomUser'
 
+# request.user is rebuilt from a cached session principal, see user_profile.principal
+AUTHENTICATION_BACKENDS = ['user_profile.backends.PrincipalBackend']
+
 # Session Security Settings
 SESSION_COOKIE_AGE = 3600  # 1 hour in seconds
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
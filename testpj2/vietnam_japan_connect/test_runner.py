@@ -0,0 +1,24 @@
+"""
+Test runner that turns query budget overruns (vietnam_japan_connect.metrics.query_budget)
+into test failures instead of log warnings, and keeps the per-request metrics log lines
+out of the test output
+"""
+
+import logging
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_BUDGETS_ENFORCED = True
+        # Only the over-budget warnings of the 'request_metrics' logger
+        self.metrics_logger = logging.getLogger('request_metrics')
+        self.metrics_log_level = self.metrics_logger.level
+        self.metrics_logger.setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs):
+        self.metrics_logger.setLevel(self.metrics_log_level)
+        super().teardown_test_environment(**kwargs)
@@ -9,6 +9,7 @@ The URLs are organized by functionality:
 - /create/   -> event_creation.urls (creating posts, lessons, partner requests)
 - /search/   -> event_search.urls (finding and browsing opportunities)
 - /admin/    -> Django admin interface
+- /metrics   -> Prometheus text metrics (vietnam_japan_connect.metrics)
 - /         -> Redirects to dashboard
 
 The `urlpatterns` list routes URLs to views. For more information please see:
@@ -20,6 +21,7 @@ from django.views.i18n import set_language
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from vietnam_japan_connect.metrics import metrics_view
 
 urlpatterns = [
     # Django admin interface
@@ -36,6 +38,7 @@ urlpatterns = [
     path('search/', include('event_search.urls')),   # Finding & browsing opportunities
     path('session/', include('session.urls')), # Session management
     path('i18n/setlang/', set_language, name='set_language'),  # Language setting endpoint
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint (request metrics)
 ]
 
 if settings.DEBUG: